@@ -6,16 +6,23 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
+import copy
 import os
 import warnings
 
 import pandas as pd
+from numpy.random import default_rng
 
 from chronix2grid import constants
 from chronix2grid import utils
+from chronix2grid import chronics_io
+from chronix2grid import profiling
 from chronix2grid.generation import generation_utils
+from chronix2grid.stage_cache import StageCache, class_name, snapshot
 
 from chronix2grid.generation.dispatch import EconomicDispatch
+from chronix2grid.generation.consumption.ConsumptionGeneratorBackend import ConsumptionGeneratorBackend
+from chronix2grid.generation.renewable.RenewableBackend import RenewableBackend
 
 
 # MSG_PYPSA_DEPENDENCY = "Please install PypsaDispatchBackend dependency to launch chronix2grid with T mode. Chronix2grid stopped before dispatch computation. You should launch xithout letter T in mode"
@@ -54,8 +61,22 @@ class GeneratorBackend:
         A class that embeds a power loss generation backend such as :class:`chronix2grid.generation.loss.LossBackend`
     dispatch_backend_class
         A class that embeds a dispatch backend such as :class:`chronix2grid.generation.dispatch.DispatchBackend`
+    output_format: ``str``
+        Format in which all the chronics are written, one of :data:`chronix2grid.constants.OUTPUT_FORMATS`
+        (see :mod:`chronix2grid.chronics_io`)
+    profile: ``bool``
+        If True, the wall time, cpu time and memory of each stage (L, R, D, T) and sub stage of the generation are
+        written in profile.json in the folder of each scenario (see :mod:`chronix2grid.profiling`)
+    batch_size: ``int``
+        When several scenarios are generated by :func:`GeneratorBackend.run`, the loads (L) and renewables (R) of
+        ``batch_size`` scenarios are generated at once (see :func:`GeneratorBackend.do_l_batch`), each one with its
+        own seed. The L and R stages of a batch are profiled in the profile of its first scenario.
+    stage_cache: :class:`chronix2grid.stage_cache.StageCache` or ``None``
+        If a cache folder is given, the outputs of the L, R, D and T stages of each scenario are stored in it and
+        reloaded by the next runs with the same inputs: only the stages whose inputs (or upstream stages) changed are
+        run again (see :mod:`chronix2grid.stage_cache`)
     """
-    def __init__(self):
+    def __init__(self, output_format=constants.DEFAULT_OUTPUT_FORMAT, profile=False, batch_size=1, cache_folder=None):
         from chronix2grid import default_backend  # lazy import to avoid circular references
         self.general_config_manager = default_backend.GENERAL_CONFIG
         self.load_config_manager = default_backend.LOAD_GENERATION_CONFIG
@@ -71,13 +92,20 @@ class GeneratorBackend:
         self.renewable_backend_class = default_backend.RENEWABLE_GENERATION_BACKEND
         self.loss_backend_class = default_backend.LOSS_GENERATION_BACKEND
 
+        chronics_io.check_output_format(output_format)
+        self.output_format = output_format
+        self._case_config = None  # configuration of a case kept between runs, see GeneratorBackend.load_case
+        self.profile = profile
+        self.batch_size = max(int(batch_size), 1)
+        self.stage_cache = StageCache(cache_folder) if cache_folder is not None else None
+
     # Call generation scripts n_scenario times with dedicated random seeds
     def run(self, case, n_scenarios, input_folder, output_folder, scen_names,
             time_params, mode='LRTK', scenario_id=None,
             seed_for_loads=None, seed_for_res=None, seed_for_disp=None):
         """
         Main function for chronics generation. It works with four steps: load generation (L), renewable generation (R, solar and wind), loss generation (D)
-        and then dispatch computation (T) to get the whole energy mix. It writes the resulting chronics in the output_path in zipped csv format
+        and then dispatch computation (T) to get the whole energy mix. It writes the resulting chronics in the output_path in ``self.output_format`` (zipped csv by default)
 
         Parameters
         ----------
@@ -119,14 +147,200 @@ class GeneratorBackend:
         # in multiprocessing, n_scenarios=1 here
         if n_scenarios >= 2:
             seeds_for_loads, seeds_for_res, seeds_for_disp = generation_utils.generate_seeds(
-                n_scenarios, seed_for_loads, seed_for_res, seed_for_disp
+                default_rng(), n_scenarios, seed_for_loads, seed_for_res, seed_for_disp
             )
         else:
             seeds_for_loads = [seed_for_loads]
             seeds_for_res = [seed_for_res]
             seeds_for_disp = [seed_for_disp]
 
-        # dispatch_input_folder, dispatch_input_folder_case, dispatch_output_folder = gu.make_generation_input_output_directories(input_folder, case, year, output_folder)
+        case_config = self._case_config
+        if case_config is None or case_config['case'] != case or case_config['input_folder'] != input_folder:
+            case_config = self.read_case_configuration(case, input_folder, output_folder)
+
+        params, params_load, params_res = self.scenario_parameters(case_config, time_params)
+
+        load_config_manager = case_config['load_config_manager']
+        loads_charac = case_config['loads_charac'].copy()
+
+        res_config_manager = case_config['res_config_manager']
+        prods_charac = case_config['prods_charac'].copy()
+
+        grid_folder = os.path.join(input_folder, case)
+
+        loss = None
+
+        ## Launch proper scenarios generation, the loads and renewables of batch_size scenarios at once
+        n_runs = len(seeds_for_loads)
+        for batch_start in range(0, n_runs, self.batch_size):
+            batch_ids = list(range(batch_start, min(batch_start + self.batch_size, n_runs)))
+            if n_scenarios > 1:
+                scenario_names = [scen_names(i) for i in batch_ids]
+            else:
+                scenario_names = [scen_names(scenario_id)]
+            scenario_folder_paths = [os.path.join(output_folder, scenario_name) for scenario_name in scenario_names]
+            profilers = [profiling.StageProfiler() if self.profile else None for _ in batch_ids]
+            keys_l = [self._stage_key('L', input_folder, case, params=params_load, seed=seeds_for_loads[i],
+                                      backend=class_name(self.consumption_backend_class))
+                      for i in batch_ids]
+            keys_r = [self._stage_key('R', input_folder, case, params=params_res, seed=seeds_for_res[i],
+                                      backend=class_name(self.renewable_backend_class))
+                      for i in batch_ids]
+
+            batch_loads = None
+            batch_prods = None
+            if len(batch_ids) > 1:
+                print("================ Generating loads and renewables of " + ", ".join(scenario_names) + " ================")
+                with profiling.activated(profilers[0]):
+                    if 'L' in mode:
+                        with profiling.stage('L'):
+                            batch_loads = self._cached_batch(
+                                'L', keys_l, scenario_folder_paths,
+                                lambda ids: self.do_l_batch([scenario_folder_paths[j] for j in ids],
+                                                            [seeds_for_loads[batch_ids[j]] for j in ids],
+                                                            params_load, loads_charac, load_config_manager,
+                                                            load_weekly_pattern=case_config.get('load_weekly_pattern')))
+                        params.update(params_load)
+                    if 'R' in mode:
+                        with profiling.stage('R'):
+                            batch_prods = self._cached_batch(
+                                'R', keys_r, scenario_folder_paths,
+                                lambda ids: self.do_r_batch([scenario_folder_paths[j] for j in ids],
+                                                            [seeds_for_res[batch_ids[j]] for j in ids],
+                                                            params_res, prods_charac, res_config_manager,
+                                                            solar_pattern=case_config.get('solar_pattern')))
+                        params.update(params_res)
+
+            for batch_id, i in enumerate(batch_ids):
+                seed_load, seed_res, seed_disp = seeds_for_loads[i], seeds_for_res[i], seeds_for_disp[i]
+                scenario_name = scenario_names[batch_id]
+                scenario_folder_path = scenario_folder_paths[batch_id]
+                profiler = profilers[batch_id]
+                key_l = keys_l[batch_id] if 'L' in mode else None
+                key_r = keys_r[batch_id] if 'R' in mode else None
+                key_d = None
+
+                print("================ Generating " + scenario_name + " ================")
+                with profiling.activated(profiler):
+                    if 'L' in mode:
+                        if batch_loads is not None:
+                            load, load_forecasted = batch_loads[batch_id]
+                        else:
+                            with profiling.stage('L'):
+                                load, load_forecasted = self._cached(
+                                    'L', key_l, scenario_folder_path,
+                                    lambda: self.do_l(scenario_folder_path, seed_load, params_load, loads_charac, load_config_manager,
+                                                      load_weekly_pattern=case_config.get('load_weekly_pattern')))
+                            params.update(params_load)
+                    if 'R' in mode:
+                        if batch_prods is not None:
+                            prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = batch_prods[batch_id]
+                        else:
+                            with profiling.stage('R'):
+                                prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = self._cached(
+                                    'R', key_r, scenario_folder_path,
+                                    lambda: self.do_r(scenario_folder_path, seed_res, params_res,
+                                                      prods_charac,
+                                                      res_config_manager,
+                                                      solar_pattern=case_config.get('solar_pattern')))
+                            params.update(params_res)
+                    if 'D' in mode:
+                        loss_config_manager = self.loss_config_manager(
+                            name="Loss",
+                            root_directory=input_folder,
+                            output_directory=output_folder,
+                            input_directories=dict(params=case),
+                            required_input_files=dict(params=['params_loss.json'])
+                        )
+
+                        key_d = self._stage_key('D', input_folder, case, params=params, load=key_l, res=key_r,
+                                                backend=class_name(self.loss_backend_class))
+                        with profiling.stage('D'):
+                            loss_d = self._cached(
+                                'D', key_d, scenario_folder_path,
+                                lambda: self.do_d(input_folder, scenario_folder_path,
+                                                  load, prod_solar, prod_wind,
+                                                  params, loss_config_manager))
+                        # only the losses predicted by a loss surrogate replace losses_pct in the dispatch
+                        if loss_config_manager.read_configuration().get('loss_surrogate'):
+                            loss = loss_d
+                    if 'T' in mode:
+                        if self.dispatch_backend_class is None:
+                            warnings.warn(MSG_NO_DISPATCH_BACKEND, UserWarning)
+                        else:
+                            params_opf = case_config.get('params_opf')
+                            dispatcher = None
+                            if params_opf is None:
+                                params_opf = self.read_dispatch_configuration(case, input_folder, output_folder)
+                            else:
+                                params_opf = copy.deepcopy(params_opf)
+                                dispatcher = copy.deepcopy(case_config['dispatcher'])
+
+                            key_t = self._stage_key('T', input_folder, case, params=params, params_opf=params_opf,
+                                                    seed=seed_disp, load=key_l, res=key_r, loss=key_d,
+                                                    backend=class_name(self.dispatch_backend_class),
+                                                    dispatcher=class_name(self.dispatcher_class))
+                            with profiling.stage('T'):
+                                dispatch_results = self._cached(
+                                    'T', key_t, scenario_folder_path,
+                                    lambda: self.do_t(input_folder, scenario_name, load, prod_solar, prod_wind,
+                                                      grid_folder, scenario_folder_path, seed_disp, params, params_opf, loss,
+                                                      dispatcher=dispatcher))
+                if profiler is not None:
+                    profiler.save(scenario_folder_path)
+
+                print('\n')
+        return params, loads_charac, prods_charac
+
+    def _stage_key(self, stage, input_folder, case, **inputs):
+        """
+        Key of the output of ``stage`` in ``self.stage_cache`` (None without cache)
+        """
+        if self.stage_cache is None:
+            return None
+        return self.stage_cache.key(stage, input_folder, case, output_format=self.output_format, **inputs)
+
+    def _cached(self, stage, key, scenario_folder_path, compute):
+        """
+        Output of ``stage`` for one scenario: reloaded from ``self.stage_cache`` if it is there, else ``compute()``
+        """
+        if key is None:
+            return compute()
+        return self.stage_cache.cached(stage, key, scenario_folder_path, compute)
+
+    def _cached_batch(self, stage, keys, scenario_folder_paths, compute):
+        """
+        Outputs of ``stage`` for a batch of scenarios: the ones in ``self.stage_cache`` are reloaded and the others
+        are computed at once by ``compute(positions in the batch)``
+        """
+        if self.stage_cache is None or any(key is None for key in keys):
+            return compute(list(range(len(keys))))
+        results = [None] * len(keys)
+        missing = []
+        for batch_id, (key, scenario_folder_path) in enumerate(zip(keys, scenario_folder_paths)):
+            found, result = self.stage_cache.load(stage, key, scenario_folder_path)
+            if found:
+                results[batch_id] = result
+            else:
+                missing.append(batch_id)
+        if len(missing) < len(keys):
+            print(f'Stage {stage} of {len(keys) - len(missing)} scenarios loaded from the cache')
+        if missing:
+            before = [snapshot(scenario_folder_paths[batch_id]) for batch_id in missing]
+            for batch_id, result, folder_state in zip(missing, compute(missing), before):
+                results[batch_id] = result
+                self.stage_cache.store(stage, keys[batch_id], scenario_folder_paths[batch_id], result, folder_state)
+        return results
+
+    def read_case_configuration(self, case, input_folder, output_folder):
+        """
+        Validates and reads the general, load and renewable configurations of ``case``
+
+        Returns
+        -------
+        case_config: ``dict``
+            parameters, characteristics of loads and productions and config managers of ``case``
+        """
         general_config_manager = self.general_config_manager(
             name="Global Generation",
             root_directory=input_folder,
@@ -137,9 +351,6 @@ class GeneratorBackend:
         general_config_manager.validate_configuration()
         params = general_config_manager.read_configuration()
 
-        params.update(time_params)
-        params = generation_utils.updated_time_parameters_with_timestep(params, params['dt'])
-
         load_config_manager = self.load_config_manager(
             name="Loads Generation",
             root_directory=input_folder,
@@ -150,7 +361,6 @@ class GeneratorBackend:
         )
         load_config_manager.validate_configuration()
         params_load, loads_charac = load_config_manager.read_configuration()
-        params_load.update(params)
 
         res_config_manager = self.res_config_manager(
             name="Renewables Generation",
@@ -161,67 +371,76 @@ class GeneratorBackend:
             output_directory=output_folder
         )
         params_res, prods_charac = res_config_manager.read_configuration()
-        params_res.update(params)
 
+        return dict(case=case, input_folder=input_folder, params=params,
+                    load_config_manager=load_config_manager, params_load=params_load, loads_charac=loads_charac,
+                    res_config_manager=res_config_manager, params_res=params_res, prods_charac=prods_charac)
 
-        grid_folder = os.path.join(input_folder, case)
+    def scenario_parameters(self, case_config, time_params):
+        """
+        Parameters of a scenario of the period ``time_params`` (see :func:`generation_utils.time_parameters`), from the
+        configuration read by :func:`GeneratorBackend.read_case_configuration`
 
-        loss = None
+        Returns
+        -------
+        params, params_load, params_res: ``dict``
+            general parameters, and parameters of the load and renewable generation (including the general ones)
+        """
+        params = copy.deepcopy(case_config['params'])
+        params.update(time_params)
+        params = generation_utils.updated_time_parameters_with_timestep(params, params['dt'])
+        params['output_format'] = self.output_format
 
-        ## Launch proper scenarios generation
-        seeds_iterator = zip(seeds_for_loads, seeds_for_res, seeds_for_disp)
+        params_load = copy.deepcopy(case_config['params_load'])
+        params_load.update(params)
 
-        for i, (seed_load, seed_res, seed_disp) in enumerate(seeds_iterator):
+        params_res = copy.deepcopy(case_config['params_res'])
+        params_res.update(params)
+        return params, params_load, params_res
 
-            if n_scenarios > 1:
-                scenario_name = scen_names(i)
-            else:
-                scenario_name = scen_names(scenario_id)
-
-            scenario_folder_path = os.path.join(output_folder, scenario_name)
-
-            print("================ Generating " + scenario_name + " ================")
-            if 'L' in mode:
-                load, load_forecasted = self.do_l(scenario_folder_path, seed_load, params_load, loads_charac, load_config_manager)
-                params.update(params_load)
-            if 'R' in mode:
-                prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = self.do_r(scenario_folder_path, seed_res, params_res,
-                                                                                               prods_charac,
-                                                                                               res_config_manager)
-                params.update(params_res)
-            if 'D' in mode:
-                loss_config_manager = self.loss_config_manager(
-                    name="Loss",
-                    root_directory=input_folder,
-                    output_directory=output_folder,
-                    input_directories=dict(params=case),
-                    required_input_files=dict(params=['params_loss.json'])
-                )
-
-                self.do_d(input_folder, scenario_folder_path,
-                                     load, prod_solar, prod_wind,
-                                     params, loss_config_manager)
-            if 'T' in mode:
-                if self.dispatch_backend_class is None:
-                    warnings.warn(MSG_NO_DISPATCH_BACKEND, UserWarning)
-                else:
-                    dispath_config_manager = self.dispatch_config_manager(
-                        name="Dispatch",
-                        root_directory=input_folder,
-                        output_directory=output_folder,
-                        input_directories=dict(params=case),
-                        required_input_files=dict(params=['params_opf.json'])
-                    )
-                    dispath_config_manager.validate_configuration()
-                    params_opf = dispath_config_manager.read_configuration()
-
-                    dispatch_results = self.do_t(input_folder, scenario_name, load, prod_solar, prod_wind,
-                                                 grid_folder, scenario_folder_path, seed_disp, params, params_opf, loss)
-
-            print('\n')
-        return params, loads_charac, prods_charac
+    def read_dispatch_configuration(self, case, input_folder, output_folder):
+        """
+        Validates and reads the dispatch parameters of ``case`` (params_opf.json)
+        """
+        dispath_config_manager = self.dispatch_config_manager(
+            name="Dispatch",
+            root_directory=input_folder,
+            output_directory=output_folder,
+            input_directories=dict(params=case),
+            required_input_files=dict(params=['params_opf.json'])
+        )
+        dispath_config_manager.validate_configuration()
+        return dispath_config_manager.read_configuration()
+
+    def load_case(self, case, input_folder, output_folder, mode='LRTK'):
+        """
+        Reads and validates the whole configuration of ``case`` once: parameters, characteristics of loads and
+        productions, patterns and, if T is in ``mode``, dispatch parameters and dispatcher (with its hydro guide curves).
+        It is kept by this backend and reused by :func:`GeneratorBackend.run` for all the scenarios of ``case``
+        instead of being read again from disk. Each scenario works on its own copy of it.
 
-    def do_l(self, scenario_folder_path, seed_load, params, loads_charac, load_config_manager):
+        Parameters
+        ----------
+        case: ``str``
+        input_folder: ``str``
+        output_folder: ``str``
+        mode: ``str``
+        """
+        case_config = self.read_case_configuration(case, input_folder, output_folder)
+        if 'L' in mode and issubclass(self.consumption_backend_class, ConsumptionGeneratorBackend):
+            case_config['load_weekly_pattern'] = case_config['load_config_manager'].read_specific()
+        if 'R' in mode and issubclass(self.renewable_backend_class, RenewableBackend):
+            case_config['solar_pattern'] = case_config['res_config_manager'].read_specific()
+        if 'T' in mode and self.dispatch_backend_class is not None:
+            params_opf = self.read_dispatch_configuration(case, input_folder, output_folder)
+            grid_path = os.path.join(input_folder, case, constants.GRID_FILENAME)
+            case_config['params_opf'] = params_opf
+            case_config['dispatcher'] = EconomicDispatch.init_dispatcher_from_config_dataframe(
+                grid_path, input_folder, self.dispatcher_class, params_opf)
+        self._case_config = case_config
+
+    def do_l(self, scenario_folder_path, seed_load, params, loads_charac, load_config_manager,
+             load_weekly_pattern=None):
         """
         Generates load chronics thanks to the backend in ``self.consumption_backend_class``
 
@@ -232,6 +451,8 @@ class GeneratorBackend:
         params: ``dict``
         loads_charac: :class:`pandas.DataFrame`
         load_config_manager: :class:`chronix2grid.config.ConfigManager`
+        load_weekly_pattern: :class:`pandas.DataFrame` or ``None``
+            pattern already read by :func:`GeneratorBackend.load_case`, read by the backend if None
 
         Returns
         -------
@@ -242,10 +463,13 @@ class GeneratorBackend:
         """
         generator_loads = self.consumption_backend_class(scenario_folder_path, seed_load, params, loads_charac, load_config_manager,
                                                          write_results=True)
-        load, load_forecasted = generator_loads.run()
+        if load_weekly_pattern is None:
+            load, load_forecasted = generator_loads.run()
+        else:
+            load, load_forecasted = generator_loads.run(load_weekly_pattern)
         return load, load_forecasted
 
-    def do_r(self, scenario_folder_path, seed_res, params, prods_charac, res_config_manager):
+    def do_r(self, scenario_folder_path, seed_res, params, prods_charac, res_config_manager, solar_pattern=None):
         """
         Generates load chronics thanks to the backend in ``self.renewable_backend_class``
 
@@ -256,6 +480,8 @@ class GeneratorBackend:
         params: ``dict``
         prods_charac: :class:`pandas.DataFrame`
         res_config_manager: :class:`chronix2grid.config.ConfigManager`
+        solar_pattern: :class:`numpy.ndarray` or ``None``
+            pattern already read by :func:`GeneratorBackend.load_case`, read by the backend if None
 
         Returns
         -------
@@ -272,9 +498,69 @@ class GeneratorBackend:
                                                      prods_charac,
                                                      res_config_manager, write_results=True)
 
-        prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = generator_enr.run()
+        if solar_pattern is None:
+            prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = generator_enr.run()
+        else:
+            prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = generator_enr.run(solar_pattern)
         return prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted
 
+    def do_l_batch(self, scenario_folder_paths, seeds_load, params, loads_charac, load_config_manager,
+                   load_weekly_pattern=None):
+        """
+        Generates the load chronics of several scenarios at once thanks to the ``run_batch`` method of
+        ``self.consumption_backend_class`` (one scenario after the other with :func:`GeneratorBackend.do_l` if it has
+        none)
+
+        Parameters
+        ----------
+        scenario_folder_paths: ``list``
+            folder of each scenario
+        seeds_load: ``list``
+            seed of each scenario
+        params, loads_charac, load_config_manager, load_weekly_pattern:
+            see :func:`GeneratorBackend.do_l`
+
+        Returns
+        -------
+        ``list``
+            (loads, forecasted loads) of each scenario
+        """
+        if not hasattr(self.consumption_backend_class, 'run_batch'):
+            return [self.do_l(scenario_folder_path, seed_load, params, loads_charac, load_config_manager,
+                              load_weekly_pattern=load_weekly_pattern)
+                    for scenario_folder_path, seed_load in zip(scenario_folder_paths, seeds_load)]
+        return self.consumption_backend_class.run_batch(scenario_folder_paths, seeds_load, params, loads_charac,
+                                                        load_config_manager, write_results=True,
+                                                        load_weekly_pattern=load_weekly_pattern)
+
+    def do_r_batch(self, scenario_folder_paths, seeds_res, params, prods_charac, res_config_manager, solar_pattern=None):
+        """
+        Generates the solar and wind chronics of several scenarios at once thanks to the ``run_batch`` method of
+        ``self.renewable_backend_class`` (one scenario after the other with :func:`GeneratorBackend.do_r` if it has
+        none)
+
+        Parameters
+        ----------
+        scenario_folder_paths: ``list``
+            folder of each scenario
+        seeds_res: ``list``
+            seed of each scenario
+        params, prods_charac, res_config_manager, solar_pattern:
+            see :func:`GeneratorBackend.do_r`
+
+        Returns
+        -------
+        ``list``
+            (prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted) of each scenario
+        """
+        if not hasattr(self.renewable_backend_class, 'run_batch'):
+            return [self.do_r(scenario_folder_path, seed_res, params, prods_charac, res_config_manager,
+                              solar_pattern=solar_pattern)
+                    for scenario_folder_path, seed_res in zip(scenario_folder_paths, seeds_res)]
+        return self.renewable_backend_class.run_batch(scenario_folder_paths, seeds_res, params, prods_charac,
+                                                      res_config_manager, write_results=True,
+                                                      solar_pattern=solar_pattern)
+
     def do_d(self, input_folder, scenario_folder_path,
                                      load, prod_solar, prod_wind,
                                      params, loss_config_manager):
@@ -304,7 +590,7 @@ class GeneratorBackend:
         return loss
 
     def do_t(self, input_folder, scenario_name, load, prod_solar, prod_wind, grid_folder,
-             scenario_folder_path, seed_disp, params, params_opf, loss):
+             scenario_folder_path, seed_disp, params, params_opf, loss, dispatcher=None, agent_results_path=None):
         """
         Computes production chronics based on a dispatch computation. It uses a dispatcher object as an environment for simulation and
         ``self.dispatch_backend_class`` for computation
@@ -322,6 +608,10 @@ class GeneratorBackend:
         params: ``dict``
         params_opf: ``dict``
         loss: :class:`pandas.DataFrame`
+        dispatcher: :class:`chronix2grid.dispatch.EconomicDispatch.Dispatcher` or ``None``
+            dispatcher already initialized for this grid (see :func:`GeneratorBackend.load_case`), created if None
+        agent_results_path: ``str`` or ``None``
+            folder of the results of the loss simulation (if any), two levels above ``scenario_folder_path`` if None
 
         Returns
         -------
@@ -333,11 +623,13 @@ class GeneratorBackend:
         res_names = dict(wind=prod_wind.columns, solar=prod_solar.columns)
         grid_path = os.path.join(grid_folder, constants.GRID_FILENAME)
         # grid_path = grid_folder
-        dispatcher = EconomicDispatch.init_dispatcher_from_config_dataframe(grid_path, input_folder,self.dispatcher_class, params_opf)
+        if dispatcher is None:
+            dispatcher = EconomicDispatch.init_dispatcher_from_config_dataframe(grid_path, input_folder,self.dispatcher_class, params_opf)
         dispatcher.chronix_scenario = EconomicDispatch.ChroniXScenario(load, prods, res_names,
                                                                        scenario_name, loss)
 
         generator_dispatch = self.dispatch_backend_class(dispatcher, scenario_folder_path,
-                                                 grid_folder, seed_disp, params, params_opf)
+                                                 grid_folder, seed_disp, params, params_opf,
+                                                 agent_results_path=agent_results_path)
         dispatch_results = generator_dispatch.run()
         return dispatch_results
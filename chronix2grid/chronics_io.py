@@ -0,0 +1,282 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Reading and writing of the generated chronics in the different output formats supported by chronix2grid.
+
+All the generation steps refer to their outputs with their historical name (*e.g.* ``prod_p.csv.bz2``). The functions
+of this module map this name to the file actually written for the chosen output format (*e.g.* ``prod_p.parquet``),
+so that readers do not have to know which format was used.
+
+.. note::
+    ``parquet`` and ``arrow`` formats require pyarrow, which is an optional dependency of chronix2grid.
+    grid2op only reads the ``csv.bz2`` format: see :func:`export_to_csv`.
+"""
+
+import bz2
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid import constants as cst
+from chronix2grid import profiling
+
+CSV_FORMAT = 'csv.bz2'
+MSG_PYARROW_DEPENDENCY = "Please install pyarrow to read or write chronics in {} format"
+
+# number of processes of the pool this process is a worker of (see set_n_workers)
+_n_workers = None
+
+
+def check_output_format(output_format):
+    if output_format not in cst.OUTPUT_FORMATS:
+        raise RuntimeError(f"Unknown output format \"{output_format}\", "
+                           f"available formats are: {', '.join(cst.OUTPUT_FORMATS)}")
+
+
+def chronics_file_path(path, output_format=cst.DEFAULT_OUTPUT_FORMAT):
+    """
+    Path of the file that stores the chronics ``path`` (given with any supported extension) in ``output_format``
+    """
+    check_output_format(output_format)
+    return _strip_extension(path) + '.' + output_format
+
+
+def find_chronics_file(path):
+    """
+    Returns the path of the existing file storing the chronics ``path`` whatever its format, or None if there is none.
+    If the chronics were written in several formats (*e.g.* by successive runs), the most recently written file is
+    returned, ``path`` itself if they were written at the same time.
+    """
+    stem = _strip_extension(path)
+    candidates = dict.fromkeys([path] + [stem + '.' + output_format for output_format in cst.OUTPUT_FORMATS])
+    found_path, found_mtime = None, None
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            mtime = os.stat(candidate).st_mtime_ns
+            if found_mtime is None or mtime > found_mtime:
+                found_path, found_mtime = candidate, mtime
+    return found_path
+
+
+def chronics_format(path):
+    """
+    Output format of the file ``path``, or None if it is not a chronics file
+    """
+    for output_format in cst.OUTPUT_FORMATS:
+        if path.endswith('.' + output_format):
+            return output_format
+    return None
+
+
+def write_chronics(df, path, output_format=cst.DEFAULT_OUTPUT_FORMAT, index=False, sep=';',
+                   float_format=cst.FLOATING_POINT_PRECISION_FORMAT, compression=None):
+    """
+    Writes the chronics ``df`` in ``output_format``.
+
+    Parameters
+    ----------
+    df: :class:`pandas.DataFrame` or :class:`pandas.Series`
+        chronics to write
+    path: ``str`` or ``None``
+        path of the chronics file, its extension is replaced by the one of ``output_format``. If None, the chronics
+        are returned as a csv string (as :meth:`pandas.DataFrame.to_csv` does), which is only possible in csv format
+    output_format: ``str``
+        one of :data:`chronix2grid.constants.OUTPUT_FORMATS`
+    index: ``bool``
+        whether to write the index of ``df``. For binary formats it is written as a first column, as it would be
+        read back from a csv file
+    sep: ``str``
+        separator of the csv format
+    float_format: ``str``
+        precision of the csv format. Binary formats keep the full precision
+    compression: ``str`` or ``None``
+        compression codec of parquet and arrow formats, see :data:`chronix2grid.constants.OUTPUT_COMPRESSION`
+
+    Returns
+    -------
+    path: ``str``
+        path of the written file (the csv string if ``path`` is None)
+    """
+    if path is None:
+        if output_format != CSV_FORMAT:
+            raise RuntimeError(f"A path is needed to write chronics in {output_format} format")
+        return df.to_csv(None, sep=sep, index=index, float_format=float_format)
+    with profiling.stage('write'):
+        return _write_chronics(df, path, output_format, index, sep, float_format, compression)
+
+
+def _write_chronics(df, path, output_format, index, sep, float_format, compression):
+    path = chronics_file_path(path, output_format)
+    if output_format == CSV_FORMAT:
+        write_csv_bz2(df, path, sep=sep, index=index, float_format=float_format)
+        return path
+
+    if isinstance(df, pd.Series):
+        df = df.to_frame(name=df.name if df.name is not None else '0')
+    if index:
+        df = df.reset_index()
+    elif not isinstance(df.index, pd.RangeIndex) or df.index.start != 0:
+        df = df.reset_index(drop=True)
+    df = df.rename(columns=str, copy=False)
+    if compression is None:
+        compression = cst.OUTPUT_COMPRESSION.get(output_format)
+
+    if output_format == 'parquet':
+        _check_pyarrow(output_format)
+        df.to_parquet(path, index=False, compression=compression)
+    elif output_format == 'arrow':
+        _check_pyarrow(output_format)
+        df.to_feather(path, compression=compression)
+    elif output_format == 'npz':
+        arrays = {f'col_{i}': _to_numpy(df[col]) for i, col in enumerate(df.columns)}
+        np.savez(path, columns=np.array(df.columns, dtype=str), **arrays)
+    return path
+
+
+def set_n_workers(n_workers):
+    """
+    Declares that the current process is one of the ``n_workers`` worker processes of a pool, so that the csv writer
+    only uses its share of the cpus (see :func:`csv_writer_n_threads`). Meant to be called by the pool initializers.
+    """
+    global _n_workers
+    _n_workers = n_workers
+
+
+def csv_writer_n_threads():
+    """
+    Default number of threads of :func:`write_csv_bz2`: :data:`chronix2grid.constants.CSV_WRITER_N_THREADS` if set,
+    one thread per cpu in the main process and, in a worker process of a pool, the cpus divided by the number of
+    workers declared with :func:`set_n_workers` (a single thread if it was not declared)
+    """
+    if cst.CSV_WRITER_N_THREADS:
+        return cst.CSV_WRITER_N_THREADS
+    n_cpus = os.cpu_count() or 1
+    if multiprocessing.current_process().daemon:
+        return max(1, n_cpus // _n_workers) if _n_workers else 1
+    return n_cpus
+
+
+def write_csv_bz2(df, path, sep=';', index=False, float_format=cst.FLOATING_POINT_PRECISION_FORMAT,
+                  n_threads=None, block_rows=None):
+    """
+    Writes ``df`` in a bz2 compressed csv file, formatting and compressing blocks of rows in parallel threads.
+
+    Each block of ``block_rows`` rows is compressed as an independent bz2 stream. The streams are concatenated in
+    one file, which is read as a single csv by pandas (and thus grid2op). Small data frames are written directly
+    by pandas.
+
+    Parameters
+    ----------
+    df: :class:`pandas.DataFrame` or :class:`pandas.Series`
+    path: ``str``
+    sep: ``str``
+    index: ``bool``
+    float_format: ``str``
+    n_threads: ``int`` or ``None``
+        number of threads, :func:`csv_writer_n_threads` if None
+    block_rows: ``int`` or ``None``
+        number of rows of each compressed stream, :data:`chronix2grid.constants.CSV_WRITER_BLOCK_ROWS` if None
+    """
+    if n_threads is None:
+        n_threads = csv_writer_n_threads()
+    if block_rows is None:
+        block_rows = cst.CSV_WRITER_BLOCK_ROWS
+    if n_threads <= 1 or len(df) <= block_rows:
+        df.to_csv(path, sep=sep, index=index, float_format=float_format)
+        return
+
+    def format_and_compress(start):
+        text = df.iloc[start:start + block_rows].to_csv(sep=sep, index=index, float_format=float_format,
+                                                        header=start == 0)
+        return bz2.compress(text.encode('utf-8'))
+
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        streams = executor.map(format_and_compress, range(0, len(df), block_rows))
+        with open(path, 'wb') as f:
+            for stream in streams:
+                f.write(stream)
+
+
+def read_chronics(path, sep=';', **kwargs):
+    """
+    Reads the chronics ``path`` whatever the format they were written in (see :func:`write_chronics`).
+    ``kwargs`` are passed to :func:`pandas.read_csv` for the csv format.
+    """
+    found_path = find_chronics_file(path)
+    if found_path is None:
+        raise FileNotFoundError(f"No chronics file found for {path}")
+    output_format = chronics_format(found_path)
+    if output_format == 'parquet':
+        _check_pyarrow(output_format)
+        return pd.read_parquet(found_path)
+    if output_format == 'arrow':
+        _check_pyarrow(output_format)
+        return pd.read_feather(found_path)
+    if output_format == 'npz':
+        with np.load(found_path) as npz:
+            columns = list(npz['columns'])
+            return pd.DataFrame({col: npz[f'col_{i}'] for i, col in enumerate(columns)}, columns=columns)
+    return pd.read_csv(found_path, sep=sep, **kwargs)
+
+
+def export_to_csv(folder, remove_source=False, recursive=True):
+    """
+    Converts all the chronics of ``folder`` written in a binary format into the grid2op compatible ``csv.bz2`` format.
+
+    Parameters
+    ----------
+    folder: ``str``
+        folder of a scenario (or of several scenarios if ``recursive``)
+    remove_source: ``bool``
+        whether to remove the binary files once converted
+    recursive: ``bool``
+        whether to convert the chronics of the sub folders too (chunks, scenarios)
+
+    Returns
+    -------
+    exported: ``list``
+        paths of the written csv files
+    """
+    exported = []
+    for root, dirs, files in os.walk(folder):
+        for file_name in sorted(files):
+            output_format = chronics_format(file_name)
+            if output_format is None or output_format == CSV_FORMAT:
+                continue
+            source = os.path.join(root, file_name)
+            exported.append(write_chronics(read_chronics(source), source, CSV_FORMAT))
+            if remove_source:
+                os.remove(source)
+        if not recursive:
+            break
+    return exported
+
+
+def _strip_extension(path):
+    output_format = chronics_format(path)
+    if output_format is not None:
+        return path[:-len(output_format) - 1]
+    return os.path.splitext(path)[0]
+
+
+def _to_numpy(series):
+    values = series.values
+    if values.dtype == object:
+        values = values.astype(str)
+    return values
+
+
+def _check_pyarrow(output_format):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError(MSG_PYARROW_DEPENDENCY.format(output_format))
@@ -177,6 +177,7 @@ class LoadsConfigManager(ConfigManager):
         * *dx_corr* - x granularity of coarse grid for spatially correlated noise
         * *dy_corr* - y granularity of coarse grid for spatially correlated noise
         * *temperature_corr* - noise level for spatially correlated noise
+        * *lazy_noise* - (optional) draw the coarse noise only where it is used, see :class:`chronix2grid.generation.generation_utils.CoarseNoiseField`
         * *std_temperature_noise* - noise level for temporally autocorrelated noise
 
     Returns
@@ -245,6 +246,7 @@ class ResConfigManager(ConfigManager):
             * *dx_corr* - x granularity of coarse grid for spatially correlated noise
             * *dy_corr* - y granularity of coarse grid for spatially correlated noise
             * *solar_corr*, *short_wind_corr*, *medium_wind_corr*, *long_wind_corr* - noise levels for spatially correlated noises
+            * *lazy_noise* - (optional) draw the coarse noises only where they are used, see :class:`chronix2grid.generation.generation_utils.CoarseNoiseField`
             * *std_solar_noise*, *std_short_wind_noise*, *std_medium_wind_noise*, *std_long_wind_noise* - noise levels for temporally autocorrelated noises
             * *smoothdist* - independent noise level
             * *year_solar_pattern* - year of provided solar pattern
@@ -318,6 +320,10 @@ class DispatchConfigManager(ConfigManager):
             * *solver_name* - name of solver, that you should have installed in your environment and added in your environment variables.
             * *hydro_ramp_reduction_factor* - optional factor which will divide max ramp up and down to all hydro generators
             * *losses_pct**- if D mode is deactivate, losses are estimated as a percentage of load.
+            * *n_jobs_opf* - optional number of processes solving the OPF windows (days, weeks or months of *mode_opf*) concurrently. Default is 1
+            * *stitch_steps_opf* - optional number of steps re-optimized on each side of a window boundary where ramps are violated, 0 (default) to keep windows independent
+            * *opf_engine* - optional, *pypsa* (default) to solve the OPF with PyPSA, *lp* to solve it with a copper plate LP assembled once per window length and solved by HiGHS (scipy)
+            * *lp_solver* - optional, solver of the *lp* engine (and of LPDispatcher): *highs* (default) for scipy's HiGHS or the name of a cvxpy solver
 
         Optional parameters can be set for grid2op simulation of loss as a final step.
         The production is updated on a slack generator and warnings or errors are returned if this update violates generator constraints
@@ -405,6 +411,9 @@ class LossConfigManager(ConfigManager):
     """
             Checks parameters for :class:`chronix2grid.generation.loss.LossBackend`
                 * *loss_pattern* - name of loss pattern to read
+                * *loss_surrogate* - optional, name of a file of the case written by
+                  :meth:`chronix2grid.generation.loss.loss_surrogate.LossSurrogate.save`. If given, the losses are
+                  predicted by this surrogate from the load and the renewable productions instead of read in *loss_pattern*
 
             Returns
             -------
@@ -424,6 +433,11 @@ class LossConfigManager(ConfigManager):
             'params_loss.json')
         with open(params_filepath, 'r') as loss_param_json:
             params_loss = json.load(loss_param_json)
+        if params_loss.get('loss_surrogate'):
+            params_loss['loss_surrogate'] = os.path.join(self.root_directory,
+                                                         self.input_directories['params'],
+                                                         params_loss['loss_surrogate'])
+            return params_loss
         try:
             if params_loss['loss_pattern'] == '':
                 params_loss['loss_pattern'] = 'loss_pattern.csv'
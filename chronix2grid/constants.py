@@ -33,8 +33,27 @@ SCENARIO_FOLDER_BASE_NAME = 'Scenario'
 
 SEEDS_FILE_NAME = 'seeds_info.json'
 
+RUN_MANIFEST_FILE_NAME = 'run_manifest.jsonl'
+
+PROFILE_FILE_NAME = 'profile.json'
+PROFILE_SUMMARY_FILE_NAME = 'profile_summary.csv'
+
+SWEEP_FOLDER_NAME = 'dispatch_sweep'
+SWEEP_SUMMARY_FILE_NAME = 'sweep_summary.csv'
+SWEEP_COMPARISON_FILE_NAME = 'sweep_comparison.csv'
+
 FLOATING_POINT_PRECISION_FORMAT = '%.1f'
 
+# Formats in which the chronics can be written (see chronix2grid.chronics_io). Only csv.bz2 can be read by grid2op
+OUTPUT_FORMATS = ('csv.bz2', 'parquet', 'arrow', 'npz')
+DEFAULT_OUTPUT_FORMAT = 'csv.bz2'
+OUTPUT_COMPRESSION = {'parquet': 'zstd', 'arrow': 'lz4'}
+
+# csv.bz2 files are formatted and compressed by blocks of rows in parallel threads (None: one thread per cpu, shared
+# between the workers of a pool, see chronics_io.csv_writer_n_threads)
+CSV_WRITER_N_THREADS = None
+CSV_WRITER_BLOCK_ROWS = 10000
+
 TIME_STEP_FILE_NAME = 'time_interval.info'
 
 REFERENCE_ZONE = 'France'
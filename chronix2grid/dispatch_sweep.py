@@ -0,0 +1,327 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Sweep of the dispatch (T) parameters over load and renewable scenarios already generated.
+
+The load, renewable (and loss) chronics of each scenario are read once, and one dispatcher is built for each distinct
+set of the parameters used at its creation (:data:`DISPATCHER_PARAMS`). Each variant of params_opf.json is then
+dispatched on each scenario, in parallel, and its results are written in <sweep folder>/<variant>/<scenario>, with
+a copy of the load chronics of the scenario (for the grid2op simulation of the losses, if activated).
+The summary of all the dispatches (energy by type of generator, curtailment, cost, prices...) is written in
+:data:`chronix2grid.constants.SWEEP_SUMMARY_FILE_NAME` and its mean by variant in
+:data:`chronix2grid.constants.SWEEP_COMPARISON_FILE_NAME`.
+
+The variants are given as a dictionary (or a json file) variant name -> values of params_opf.json overriding the ones
+of the case, with an optional *marginal_costs* key (carrier -> marginal cost, see
+:meth:`chronix2grid.generation.dispatch.EconomicDispatch.Dispatcher.modify_marginal_costs`)::
+
+    {
+        "reference": {},
+        "easy_ramps": {"ramp_mode": "easy"},
+        "hydro_ramps_halved": {"hydro_ramp_reduction_factor": 2.0},
+        "cheap_gas": {"marginal_costs": {"gas": 40.0}}
+    }
+"""
+
+import copy
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid import constants as cst
+from chronix2grid.chronics_io import find_chronics_file, read_chronics, set_n_workers
+from chronix2grid.generation.dispatch import EconomicDispatch
+
+# parameters of params_opf.json used when the dispatcher is created (the other ones are used by each dispatch)
+DISPATCHER_PARAMS = ('hydro_ramp_reduction_factor', 'slack_p_max_reduction', 'slack_ramp_max_reduction', 'nameSlack')
+
+MARGINAL_COSTS_KEY = 'marginal_costs'
+
+# files of a generated scenario copied in the folder of each of its variants: the dispatch does not write them, but the
+# grid2op simulation of the losses reads them
+SCENARIO_CHRONICS = ('load_p.csv.bz2', 'load_q.csv.bz2', 'load_p_forecasted.csv.bz2', 'load_q_forecasted.csv.bz2')
+SCENARIO_INFO_FILES = ('start_datetime.info', cst.TIME_STEP_FILE_NAME)
+
+# state of a worker process of sweep_dispatch, see init_sweep_worker
+_sweep_state = None
+
+
+def read_variants(variants):
+    """
+    Variants of the sweep, from a dictionary or the path of a json file (see :mod:`chronix2grid.dispatch_sweep`)
+    """
+    if isinstance(variants, (str, os.PathLike)):
+        with open(variants, 'r', encoding='utf-8') as f:
+            variants = json.load(f)
+    if not variants:
+        raise RuntimeError('The dispatch sweep needs at least one variant')
+    for name, overrides in variants.items():
+        if not isinstance(overrides, dict):
+            raise RuntimeError(f'The variant "{name}" should be a dictionary of parameters, found {overrides}')
+    return {str(name): dict(overrides) for name, overrides in variants.items()}
+
+
+def variant_parameters(params_opf, overrides):
+    """
+    params_opf of a variant and the marginal costs it modifies (None if it does not)
+    """
+    overrides = dict(overrides)
+    marginal_costs = overrides.pop(MARGINAL_COSTS_KEY, None)
+    variant_params_opf = copy.deepcopy(params_opf)
+    variant_params_opf.update(overrides)
+    return variant_params_opf, marginal_costs
+
+
+def dispatcher_key(params_opf):
+    """
+    Identifier of the dispatcher needed by params_opf: variants with the same key share it
+    """
+    return json.dumps({name: params_opf.get(name) for name in DISPATCHER_PARAMS}, sort_keys=True, default=str)
+
+
+def read_scenario(scenario_folder_path, params):
+    """
+    Load, solar, wind and loss (None if the scenario has none) chronics of a scenario generated with L and R
+    (and D), indexed by the time steps of ``params``
+    """
+    load = read_chronics(os.path.join(scenario_folder_path, 'load_p.csv.bz2'), sep=';')
+    prod_solar = read_chronics(os.path.join(scenario_folder_path, 'solar_p.csv.bz2'), sep=';')
+    prod_wind = read_chronics(os.path.join(scenario_folder_path, 'wind_p.csv.bz2'), sep=';')
+    datetime_index = pd.date_range(
+        start=params['start_date'],
+        end=params['end_date'],
+        freq=str(params['dt']) + 'min')[:len(load)]
+    for chronics in (load, prod_solar, prod_wind):
+        chronics.index = datetime_index
+    loss = None
+    if find_chronics_file(os.path.join(scenario_folder_path, 'loss.csv.bz2')) is not None:
+        loss_frame = read_chronics(os.path.join(scenario_folder_path, 'loss.csv.bz2'), sep=';')
+        loss = pd.Series(loss_frame.iloc[:, -1].values, index=datetime_index)
+    return load, prod_solar, prod_wind, loss
+
+
+def copy_scenario_files(scenario_folder_path, folder):
+    """
+    Copies the load chronics (in their format) and the time info files of a generated scenario in ``folder``
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = [find_chronics_file(os.path.join(scenario_folder_path, file_name)) for file_name in SCENARIO_CHRONICS]
+    paths += [os.path.join(scenario_folder_path, file_name) for file_name in SCENARIO_INFO_FILES]
+    for path in paths:
+        if path is not None and os.path.isfile(path):
+            shutil.copy2(path, os.path.join(folder, os.path.basename(path)))
+
+
+def read_dispatch_seed(scenario_folder_path):
+    """
+    Seed of the dispatch written by the generation of the scenario (None if there is none)
+    """
+    seeds_path = os.path.join(scenario_folder_path, '_' + cst.SEEDS_FILE_NAME)
+    if not os.path.exists(seeds_path):
+        return None
+    with open(seeds_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('dispatch')
+
+
+def dispatch_summary(folder, prods_charac, dt):
+    """
+    Summary of the dispatch written in ``folder``: energy (MWh) by type of generator, renewable curtailment (MWh),
+    production cost (with the marginal costs of prods_charac) and mean and max marginal price
+    """
+    prod_p = read_chronics(os.path.join(folder, 'prod_p.csv.bz2'), sep=';')
+    step_hours = dt / 60.
+    gen_types = prods_charac.set_index('name')['type']
+    summary = {}
+    for gen_type in sorted(gen_types.unique()):
+        names = [name for name in gen_types.index[gen_types == gen_type] if name in prod_p.columns]
+        summary[f'energy_{gen_type}_mwh'] = float(prod_p[names].values.sum() * step_hours)
+    if find_chronics_file(os.path.join(folder, 'prod_p_renew_orig.csv.bz2')) is not None:
+        renew_orig = read_chronics(os.path.join(folder, 'prod_p_renew_orig.csv.bz2'), sep=';')
+        names = [name for name in renew_orig.columns if name in prod_p.columns]
+        summary['curtailment_mwh'] = float((renew_orig[names].values - prod_p[names].values).sum() * step_hours)
+    if 'marginal_cost' in prods_charac.columns:
+        costs = prods_charac.set_index('name')['marginal_cost'].reindex(prod_p.columns).fillna(0.).values
+        summary['cost'] = float((prod_p.values * costs).sum() * step_hours)
+    if find_chronics_file(os.path.join(folder, 'prices.csv.bz2')) is not None:
+        prices = read_chronics(os.path.join(folder, 'prices.csv.bz2'), sep=';').select_dtypes(include=np.number)
+        summary['price_mean'] = float(np.nanmean(prices.values))
+        summary['price_max'] = float(np.nanmax(prices.values))
+    return summary
+
+
+def init_sweep_worker(state):
+    """
+    Initializer of the worker processes of :func:`sweep_dispatch`: keeps the scenarios, dispatchers and variants
+    sent once to each worker
+    """
+    global _sweep_state
+    _sweep_state = state
+    set_n_workers(state['nb_core'])
+
+
+def run_variant_task(task):
+    """
+    Dispatch of the variant on the scenario of ``task`` (variant name, scenario name), with the state given to
+    :func:`init_sweep_worker`. Exceptions are caught and reported in the returned record.
+    """
+    variant_name, scenario_name = task
+    state = _sweep_state
+    generator = state['generator']
+    variant_params_opf, marginal_costs, variant_dispatcher_key = state['variants'][variant_name]
+    load, prod_solar, prod_wind, loss, seed_disp = state['scenarios'][scenario_name]
+    folder = os.path.join(state['sweep_folder'], variant_name, scenario_name)
+    copy_scenario_files(os.path.join(state['generation_output_folder'], scenario_name), folder)
+
+    record = dict(variant=variant_name, scenario=scenario_name, pid=os.getpid())
+    wall_start = time.perf_counter()
+    try:
+        dispatcher = copy.deepcopy(state['dispatchers'][variant_dispatcher_key])
+        if marginal_costs:
+            dispatcher.modify_marginal_costs(marginal_costs)
+        generator.do_t(state['input_folder'], scenario_name, load, prod_solar, prod_wind, state['grid_folder'],
+                       folder, seed_disp, copy.deepcopy(state['params']), copy.deepcopy(variant_params_opf), loss,
+                       dispatcher=dispatcher, agent_results_path=os.path.join(state['sweep_folder'], variant_name))
+        if os.path.exists(os.path.join(folder, 'DISPATCH_FAILED')):
+            raise RuntimeError('The dispatch has failed')
+        record.update(dispatch_summary(folder, state['prods_charac'], state['params']['dt']))
+        record['success'] = True
+        record['error'] = None
+    except Exception:
+        record['success'] = False
+        record['error'] = traceback.format_exc().strip().splitlines()[-1]
+    record['wall_time'] = time.perf_counter() - wall_start
+    return record
+
+
+def sweep_dispatch(generator, case, input_folder, generation_output_folder, time_params, variants,
+                   scenario_names=None, sweep_folder=None, nb_core=1):
+    """
+    Dispatches each variant of params_opf.json on the scenarios already generated in ``generation_output_folder``
+
+    Parameters
+    ----------
+    generator: :class:`chronix2grid.GeneratorBackend.GeneratorBackend`
+        backend giving the dispatcher and dispatch classes and the output format
+    case: ``str``
+        name of the case (folder in ``input_folder``)
+    input_folder: ``str``
+        folder of the generation inputs (with the case and patterns folders)
+    generation_output_folder: ``str``
+        folder of the generated scenarios (one sub folder per scenario, with at least load_p, solar_p and wind_p)
+    time_params: ``dict``
+        period of the scenarios, see :func:`chronix2grid.generation.generation_utils.time_parameters`
+    variants: ``dict`` or ``str``
+        variants of params_opf.json (or json file of the variants, see :mod:`chronix2grid.dispatch_sweep`)
+    scenario_names: ``list`` or ``None``
+        scenarios of the sweep, all the sub folders of ``generation_output_folder`` with a load_p file if None
+    sweep_folder: ``str`` or ``None``
+        folder of the results, *dispatch_sweep* in ``generation_output_folder`` by default
+    nb_core: ``int``
+        number of worker processes
+
+    Returns
+    -------
+    summary: :class:`pandas.DataFrame`
+        one row per (variant, scenario), see :func:`dispatch_summary`
+    """
+    if generator.dispatch_backend_class is None:
+        raise RuntimeError('The dispatch sweep needs a dispatch backend (pypsa)')
+    variants = read_variants(variants)
+    if sweep_folder is None:
+        sweep_folder = os.path.join(generation_output_folder, cst.SWEEP_FOLDER_NAME)
+    if scenario_names is None:
+        scenario_names = sorted(
+            name for name in os.listdir(generation_output_folder)
+            if find_chronics_file(os.path.join(generation_output_folder, name, 'load_p.csv.bz2')) is not None)
+    if not scenario_names:
+        raise RuntimeError(f'No generated scenario found in {generation_output_folder}')
+
+    case_config = generator.read_case_configuration(case, input_folder, generation_output_folder)
+    params, params_load, params_res = generator.scenario_parameters(case_config, time_params)
+    params.update(params_load)
+    params.update(params_res)
+    params_opf = generator.read_dispatch_configuration(case, input_folder, generation_output_folder)
+    grid_folder = os.path.join(input_folder, case)
+    grid_path = os.path.join(grid_folder, cst.GRID_FILENAME)
+
+    # each scenario is read once, and each distinct dispatcher built once
+    scenarios = {}
+    for scenario_name in scenario_names:
+        scenario_folder_path = os.path.join(generation_output_folder, scenario_name)
+        scenarios[scenario_name] = read_scenario(scenario_folder_path, params) + (
+            read_dispatch_seed(scenario_folder_path),)
+    dispatchers = {}
+    variant_states = {}
+    for variant_name, overrides in variants.items():
+        variant_params_opf, marginal_costs = variant_parameters(params_opf, overrides)
+        key = dispatcher_key(variant_params_opf)
+        if key not in dispatchers:
+            dispatchers[key] = EconomicDispatch.init_dispatcher_from_config_dataframe(
+                grid_path, input_folder, generator.dispatcher_class, variant_params_opf)
+        variant_states[variant_name] = (variant_params_opf, marginal_costs, key)
+        os.makedirs(os.path.join(sweep_folder, variant_name), exist_ok=True)
+        with open(os.path.join(sweep_folder, variant_name, 'params_opf.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(variant_params_opf, **{MARGINAL_COSTS_KEY: marginal_costs}), f, indent=1, default=str)
+    print(f'Dispatch sweep of {len(variants)} variants on {len(scenarios)} scenarios '
+          f'({len(dispatchers)} dispatchers) in {sweep_folder}')
+
+    state = dict(generator=generator, input_folder=input_folder, grid_folder=grid_folder, sweep_folder=sweep_folder,
+                 generation_output_folder=generation_output_folder,
+                 params=params, prods_charac=case_config['prods_charac'], scenarios=scenarios,
+                 dispatchers=dispatchers, variants=variant_states, nb_core=nb_core)
+    tasks = [(variant_name, scenario_name) for variant_name in variants for scenario_name in scenario_names]
+    records = []
+    if nb_core <= 1:
+        init_sweep_worker(state)
+        iterable = map(run_variant_task, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(nb_core, initializer=init_sweep_worker, initargs=(state,))
+        iterable = pool.imap_unordered(run_variant_task, tasks, chunksize=1)
+    try:
+        for n_done, record in enumerate(iterable, start=1):
+            status = 'done' if record['success'] else 'FAILED'
+            print(f"[{n_done}/{len(tasks)}] {record['variant']} / {record['scenario']} {status} "
+                  f"in {record['wall_time']:.1f} seconds")
+            if not record['success']:
+                print(record['error'])
+            records.append(record)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    summary = pd.DataFrame(records).sort_values(['variant', 'scenario'], kind='stable').reset_index(drop=True)
+    summary.to_csv(os.path.join(sweep_folder, cst.SWEEP_SUMMARY_FILE_NAME), index=False)
+    comparison = compare_variants(summary)
+    comparison.to_csv(os.path.join(sweep_folder, cst.SWEEP_COMPARISON_FILE_NAME), index=False)
+    print(f'Summary of the dispatch sweep written in {sweep_folder}')
+    return summary
+
+
+def compare_variants(summary):
+    """
+    Comparison of the variants of a sweep: number of successful dispatches and mean of each indicator of
+    :func:`dispatch_summary` over the successful dispatches of each variant
+    """
+    successful = summary[summary['success'].astype(bool)]
+    indicators = [column for column in summary.columns
+                  if column not in ('variant', 'scenario', 'pid', 'success', 'error')]
+    comparison = successful.groupby('variant', sort=True)[indicators].mean()
+    comparison.insert(0, 'n_success', successful.groupby('variant').size())
+    comparison = comparison.reindex(sorted(summary['variant'].unique()))
+    comparison['n_success'] = comparison['n_success'].fillna(0).astype(int)
+    comparison.insert(0, 'n_scenarios', summary.groupby('variant').size())
+    return comparison.reset_index()
@@ -0,0 +1,200 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""Economic dispatch solved as a copper plate LP assembled with numpy and scipy.sparse, without PyPSA"""
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation._dispatch._PypsaDispatchBackend._EDispatch_L2RPN2020.run_economic_dispatch import \
+    main_run_disptach
+
+## Dépendances à Chronix2Grid
+from chronix2grid.generation.dispatch.EconomicDispatch import Dispatcher, DispatchResults
+from chronix2grid.generation.dispatch.utils import RampMode
+
+GENERATOR_ATTRIBUTES = ['carrier', 'p_nom', 'marginal_cost', 'ramp_limit_up', 'ramp_limit_down',
+                        'p_min_pu', 'p_max_pu']
+
+
+class LPDispatcher(Dispatcher):
+    """
+    Inheriting from Dispatcher to implement abstract methods without PyPSA.
+    Generators are described in the same ``generators`` table as a pypsa.Network (p_nom, carrier,
+    marginal_cost, ramp_limit_up, ramp_limit_down, p_min_pu, p_max_pu) and each window of the dispatch
+    is solved by a :class:`CopperPlateLP`, with HiGHS (scipy) or the cvxpy solver given by *lp_solver*
+    in params_opf.
+
+    It can replace :class:`PypsaDispatcher` in :mod:`chronix2grid.default_backend`
+    """
+
+    # same correcting factors as PypsaDispatcher
+    PmaxCorrectingFactor = 1
+    RampCorrectingFactor = 0.1
+
+    def __init__(self):
+        super().__init__()
+        self.generators = pd.DataFrame(columns=GENERATOR_ATTRIBUTES, index=pd.Index([], name='Generator'))
+        self.loads = pd.DataFrame(index=pd.Index(['agg_load'], name='Load'))
+        self._env = None  # The grid2op environment when instanciated with from_gri2dop_env
+        self._df = None
+        self._chronix_scenario = None
+        self._simplified_chronix_scenario = None
+        self._has_results = False
+        self._has_simplified_results = False
+        self._hydro_file_path = None
+
+        self._pmax_solar = None
+        self._pmax_wind = None
+
+    def add_generator(self, name, p_nom, carrier, marginal_cost, ramp_limit_up=np.nan, ramp_limit_down=np.nan):
+        """
+        Adds a generator, unconstrained in ramps by default (as in PyPSA)
+        """
+        self.generators.loc[name, GENERATOR_ATTRIBUTES] = [carrier, float(p_nom), float(marginal_cost),
+                                                           float(ramp_limit_up), float(ramp_limit_down), 0., 1.]
+        self.generators = self.generators.astype({attr: float for attr in GENERATOR_ATTRIBUTES if attr != 'carrier'})
+
+    @classmethod
+    def from_gri2op_env(cls, grid2op_env):
+        """
+        Implements the abstract method of *Dispatcher*
+
+        Parameters
+        ----------
+        grid2op_env
+
+        Returns
+        -------
+        net: :class:`LPDispatcher`
+        """
+        env_df = pd.DataFrame({'name': grid2op_env.name_gen,
+                               'type': grid2op_env.gen_type,
+                               'pmax': grid2op_env.gen_pmax,
+                               'max_ramp_up': grid2op_env.gen_max_ramp_up,
+                               'max_ramp_down': grid2op_env.gen_max_ramp_down,
+                               'cost_per_mw': grid2op_env.gen_cost_per_MW})
+        net = cls.from_dataframe(env_df)
+        net._df = None
+        net._env = grid2op_env
+        return net
+
+    @classmethod
+    def from_dataframe(cls, env_df):
+        """
+        Implements the abstract method of *Dispatcher*
+
+        Parameters
+        ----------
+        env_df: :class:`pandas.DataFrame`
+            name, type, pmax, max_ramp_up, max_ramp_down and cost_per_mw of the generators
+
+        Returns
+        -------
+        net: :class:`LPDispatcher`
+        """
+        net = cls()
+        net._df = env_df
+
+        carrier_types_to_exclude = ['wind', 'solar']
+        for generator, gen_type, p_max, ramp_up, ramp_down, gen_cost_per_MW in zip(env_df['name'],
+                                                                                   env_df['type'],
+                                                                                   env_df['pmax'],
+                                                                                   env_df['max_ramp_up'],
+                                                                                   env_df['max_ramp_down'],
+                                                                                   env_df['cost_per_mw']):
+            if gen_type not in carrier_types_to_exclude:
+                net.add_generator(generator,
+                                  p_nom=p_max - cls.PmaxCorrectingFactor,
+                                  carrier=gen_type,
+                                  marginal_cost=gen_cost_per_MW,
+                                  ramp_limit_up=(ramp_up - cls.RampCorrectingFactor) / p_max,
+                                  ramp_limit_down=(ramp_down - cls.RampCorrectingFactor) / p_max)
+
+        # add total wind and solar (for curtailment)
+        net._pmax_solar = np.sum([p_max for gen_type, p_max in zip(env_df['type'], env_df['pmax'])
+                                  if gen_type == "solar"])
+        net.add_generator('agg_solar', p_nom=net._pmax_solar, carrier="solar", marginal_cost=0.)
+        net._pmax_wind = np.sum([p_max for gen_type, p_max in zip(env_df['type'], env_df['pmax'])
+                                 if gen_type == "wind"])
+        # we prefer to curtail the wind if we have the choice, solar should be distributed on the grid
+        net.add_generator('agg_wind', p_nom=net._pmax_wind, carrier="wind", marginal_cost=0.1)
+        return net
+
+    def run(self,
+            load,
+            total_solar,
+            total_wind,
+            params,
+            gen_constraints=None,
+            ramp_mode=RampMode.hard,
+            by_carrier=False,
+            gen_min_pu_t=None,
+            gen_max_pu_t=None,
+            **kwargs):
+        """
+        Implements the abstract method of *Dispatcher*. PyPSA options (*pyomo*, *solver_name*) are ignored
+
+        Returns
+        -------
+        results: :class:`DispatchResults`
+        """
+        if total_solar is not None:
+            total_solar = total_solar / self._pmax_solar
+        if total_wind is not None:
+            total_wind = total_wind / self._pmax_wind
+        params = dict(params, opf_engine='lp')
+        prods_dispatch, terminal_conditions, marginal_prices = \
+            main_run_disptach(
+                self if not by_carrier else self.simplify_net(),
+                load, total_solar, total_wind,
+                params, gen_constraints, ramp_mode,
+                gen_min_pu_t=gen_min_pu_t, gen_max_pu_t=gen_max_pu_t,
+                **kwargs)
+        if prods_dispatch is None or marginal_prices is None:
+            return None
+
+        if by_carrier:
+            self._simplified_chronix_scenario = self._chronix_scenario.simplify_chronix()
+            self._simplified_chronix_scenario.prods_dispatch = prods_dispatch
+            self._simplified_chronix_scenario.marginal_prices = marginal_prices
+            results = self._simplified_chronix_scenario
+            self._has_simplified_results = True
+            self._has_results = False
+        else:
+            self._chronix_scenario.prods_dispatch = prods_dispatch
+            self._chronix_scenario.marginal_prices = marginal_prices
+            results = self._chronix_scenario
+            self._has_results = True
+            self._has_simplified_results = False
+        if self._env is None:
+            self.reset_ramps_from_dataframe()
+        else:
+            self.reset_ramps_from_grid2op_env()
+
+        return DispatchResults(chronix=results, terminal_conditions=terminal_conditions)
+
+    def simplify_net(self):
+        """
+        Implements the abstract method of *Dispatcher*
+        """
+        simplified_net = LPDispatcher()
+        for carrier in self.generators.carrier.unique():
+            gens = self.generators[self.generators.carrier == carrier]
+            p_nom = gens['p_nom'].sum()
+            simplified_net.add_generator(
+                carrier, p_nom=p_nom, carrier=carrier,
+                marginal_cost=gens['marginal_cost'].mean(),
+                ramp_limit_up=(gens['p_nom'] * gens['ramp_limit_up']).sum() / p_nom,
+                ramp_limit_down=(gens['p_nom'] * gens['ramp_limit_down']).sum() / p_nom,
+            )
+        simplified_net._hydro_file_path = self._hydro_file_path
+        simplified_net._min_hydro_pu = self._min_hydro_pu.iloc[:, 0]
+        simplified_net._max_hydro_pu = self._max_hydro_pu.iloc[:, 0]
+        print('simplified dispatch by carrier')
+        return simplified_net
@@ -11,16 +11,14 @@ an economic dispatch based on RES and consumption time series"""
 
 import numpy as np
 import pandas as pd
-from collections import namedtuple
 import pypsa
 
 from ._EDispatch_L2RPN2020.run_economic_dispatch import main_run_disptach
 
 ## Dépendances à Chronix2Grid
-from chronix2grid.generation.dispatch.EconomicDispatch import Dispatcher
+from chronix2grid.generation.dispatch.EconomicDispatch import Dispatcher, DispatchResults
 from chronix2grid.generation.dispatch.utils import RampMode
 
-DispatchResults = namedtuple('DispatchResults', ['chronix', 'terminal_conditions'])
 
 
 class PypsaDispatcher(Dispatcher, pypsa.Network):
@@ -0,0 +1,239 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import cvxpy as cp
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+from .utils import opf_limits, window_pu_constraints
+
+
+class CopperPlateLP:
+    """ Linear economic dispatch of a copper plate grid, the problem
+    :func:`run_opf` builds with PyPSA: minimize the marginal cost of
+    the production, subject to the balance with the demand at each
+    step, the min and max production and the ramps between steps.
+
+    Its constraint matrices only depend on the number of steps of the
+    window. They are assembled once for each window length, solving
+    a window only sets the bounds of the variables and the demand.
+    Problems are solved by HiGHS through :func:`scipy.optimize.linprog`,
+    which does not take a starting basis: each window is solved from
+    scratch, only the model building is saved. They can also be solved
+    by a cvxpy solver, the problem of each window length being then
+    compiled once with the demand and the bounds as parameters.
+
+    Parameters
+    ----------
+    gen_names : list
+        Names of the generators
+    p_nom : array
+        Nominal power of the generators (MW)
+    marginal_cost : array
+        Marginal cost of the generators
+    ramp_up, ramp_down : array
+        Max ramps of the generators (MW per step), NaN if unconstrained
+    p_min_pu, p_max_pu : array
+        Static bounds (pu) of the generators, used when no time series is given
+    solver : str, optional
+        *highs* (default) for scipy's HiGHS, otherwise the name of a cvxpy solver
+    """
+    def __init__(self, gen_names, p_nom, marginal_cost, ramp_up, ramp_down, p_min_pu, p_max_pu, solver='highs'):
+        self.gen_names = [str(name) for name in gen_names]
+        self.p_nom = np.asarray(p_nom, dtype=float)
+        self.marginal_cost = np.asarray(marginal_cost, dtype=float)
+        self.ramp_up = np.asarray(ramp_up, dtype=float)
+        self.ramp_down = np.asarray(ramp_down, dtype=float)
+        self.p_min_pu = np.asarray(p_min_pu, dtype=float)
+        self.p_max_pu = np.asarray(p_max_pu, dtype=float)
+        self.solver = solver
+        self._models = {}
+        self._cvxpy_problems = {}
+
+    def __getstate__(self):
+        # compiled cvxpy problems are not sent to other processes, they are compiled again there
+        state = self.__dict__.copy()
+        state['_cvxpy_problems'] = {}
+        return state
+
+    @classmethod
+    def from_network(cls, net, params, slack_name=None):
+        """ Model of a preprocessed PyPSA grid (see :func:`preprocess_net`),
+        with the error correction ratios of ``params`` applied as in :func:`run_opf`
+        """
+        p_nom, ramp_up, ramp_down = opf_limits(net, params, slack_name)
+        return cls(net.generators.index, p_nom.values, net.generators.marginal_cost.values,
+                   ramp_up.values, ramp_down.values,
+                   net.generators.p_min_pu.values, net.generators.p_max_pu.values,
+                   solver=params.get('lp_solver', 'highs'))
+
+    @property
+    def n_gen(self):
+        return len(self.gen_names)
+
+    def model(self, n_steps):
+        """ Objective and constraint matrices of a window of ``n_steps`` steps.
+        Variables are the productions, step by step: p[t, g] is at t * n_gen + g
+
+        Returns
+        -------
+        array, sparse matrix, array, sparse matrix
+            Costs, ramp constraints (A_ub p <= b_ub) and balance constraints (A_eq p = demand)
+        """
+        if n_steps not in self._models:
+            cost = np.tile(self.marginal_cost, n_steps)
+            balance = sparse.kron(sparse.identity(n_steps, format='csr'),
+                                  np.ones((1, self.n_gen)), format='csr')
+            # p[t + 1, g] - p[t, g]
+            step_diff = sparse.diags([-np.ones(n_steps - 1), np.ones(n_steps - 1)], [0, 1],
+                                     shape=(n_steps - 1, n_steps), format='csr')
+            gens = sparse.identity(self.n_gen, format='csr')
+            has_ramp_up = np.isfinite(self.ramp_up)
+            has_ramp_down = np.isfinite(self.ramp_down)
+            ramps = sparse.vstack([sparse.kron(step_diff, gens[has_ramp_up]),
+                                   -sparse.kron(step_diff, gens[has_ramp_down])], format='csr')
+            ramp_limits = np.concatenate([np.tile(self.ramp_up[has_ramp_up], n_steps - 1),
+                                          np.tile(self.ramp_down[has_ramp_down], n_steps - 1)])
+            self._models[n_steps] = (cost, ramps, ramp_limits, balance)
+        return self._models[n_steps]
+
+    def solve(self, demand, p_min, p_max, return_prices=False):
+        """ Solves the dispatch of one window
+
+        Parameters
+        ----------
+        demand : array
+            Demand at each step (MW)
+        p_min, p_max : array
+            Bounds of each generator at each step (MW), of shape (n_steps, n_gen)
+        return_prices : bool, optional
+            Whether to also return the duals of the balance constraints
+
+        Returns
+        -------
+        array, str
+            Production of each generator at each step (None if the problem
+            could not be solved) and termination condition
+        array, optional
+            If ``return_prices``, marginal price at each step: cost of one
+            more MW of demand, ramps included (None if not available)
+        """
+        demand = np.asarray(demand, dtype=float)
+        if self.solver != 'highs':
+            dispatch, termination_condition, prices = self._solve_cvxpy(demand, p_min, p_max)
+        else:
+            cost, ramps, ramp_limits, balance = self.model(demand.shape[0])
+            bounds = np.column_stack([np.ravel(p_min), np.ravel(p_max)])
+            res = linprog(cost,
+                          A_ub=ramps if ramps.shape[0] else None,
+                          b_ub=ramp_limits if ramps.shape[0] else None,
+                          A_eq=balance, b_eq=demand,
+                          bounds=bounds, method='highs')
+            if res.status != 0:
+                dispatch, termination_condition, prices = None, res.message, None
+            else:
+                dispatch, termination_condition = res.x.reshape(demand.shape[0], self.n_gen), 'optimal'
+                prices = np.asarray(res.eqlin.marginals, dtype=float)
+        if return_prices:
+            return dispatch, termination_condition, prices
+        return dispatch, termination_condition
+
+    def _solve_cvxpy(self, demand, p_min, p_max):
+        n_steps = demand.shape[0]
+        if n_steps not in self._cvxpy_problems:
+            cost, ramps, ramp_limits, balance = self.model(n_steps)
+            p = cp.Variable(n_steps * self.n_gen)
+            parameters = dict(demand=cp.Parameter(n_steps),
+                              p_min=cp.Parameter(n_steps * self.n_gen),
+                              p_max=cp.Parameter(n_steps * self.n_gen))
+            constraints = [balance @ p == parameters['demand'],
+                           p >= parameters['p_min'],
+                           p <= parameters['p_max']]
+            if ramps.shape[0]:
+                constraints.append(ramps @ p <= ramp_limits)
+            problem = cp.Problem(cp.Minimize(cost @ p), constraints)
+            self._cvxpy_problems[n_steps] = (problem, p, parameters)
+        problem, p, parameters = self._cvxpy_problems[n_steps]
+        parameters['demand'].value = demand
+        parameters['p_min'].value = np.ravel(p_min).astype(float)
+        parameters['p_max'].value = np.ravel(p_max).astype(float)
+        try:
+            problem.solve(solver=self.solver, warm_start=True)
+        except cp.error.SolverError as exc_:
+            return None, str(exc_), None
+        if problem.status not in [cp.OPTIMAL, cp.OPTIMAL_INACCURATE] or p.value is None:
+            return None, problem.status, None
+        # cvxpy's dual of the balance (its first constraint) is the opposite of the price
+        balance_dual = problem.constraints[0].dual_value
+        prices = -np.asarray(balance_dual, dtype=float) if balance_dual is not None else None
+        return p.value.reshape(n_steps, self.n_gen), problem.status, prices
+
+
+def run_lp_opf(lp_model,
+               demand,
+               gen_max,
+               gen_min,
+               params,
+               total_solar=None,
+               total_wind=None,
+               slack_name=None,
+               slack_pmin=None,
+               slack_pmax=None,
+               gen_min_pu_t=None,
+               gen_max_pu_t=None,
+               return_prices=False,
+               **kwargs):
+    """ Same as :func:`run_opf`, the window being solved with a
+    :class:`CopperPlateLP` instead of a PyPSA network. Solver options
+    of PyPSA in ``kwargs`` are ignored.
+
+    Returns
+    -------
+    dataframe, str
+        Results of OPF dispatch (None if it failed) and termination condition
+    Series, optional
+        If ``return_prices``, duals of the balance constraints (None if not available)
+    """
+    mode = params['mode_opf']
+    if mode is None:
+        print(f'\n--> LP OPF formulation by => full chronix - Analyzing ')
+    else:
+        print(f'\n--> LP OPF formulation by => {mode} - Analyzing window starting {demand.index[0]}')
+    gen_max, gen_min = window_pu_constraints(gen_max, gen_min,
+                                             total_solar=total_solar,
+                                             total_wind=total_wind,
+                                             slack_name=slack_name,
+                                             slack_pmin=slack_pmin,
+                                             slack_pmax=slack_pmax,
+                                             gen_min_pu_t=gen_min_pu_t,
+                                             gen_max_pu_t=gen_max_pu_t)
+    n_steps = demand.shape[0]
+    p_max_pu = pd.DataFrame(np.tile(lp_model.p_max_pu, (n_steps, 1)), columns=lp_model.gen_names)
+    p_min_pu = pd.DataFrame(np.tile(lp_model.p_min_pu, (n_steps, 1)), columns=lp_model.gen_names)
+    # time series override the static bounds, as in PyPSA
+    for p_pu, constraints in [(p_max_pu, gen_max), (p_min_pu, gen_min)]:
+        for gen_nm in constraints.columns:
+            if gen_nm in p_pu.columns:
+                p_pu[gen_nm] = np.asarray(constraints[gen_nm], dtype=float)
+
+    total_demand = demand.values.sum(axis=1) if isinstance(demand, pd.DataFrame) else demand.values
+    dispatch, termination_condition, prices = lp_model.solve(total_demand,
+                                                             p_min_pu.values * lp_model.p_nom,
+                                                             p_max_pu.values * lp_model.p_nom,
+                                                             return_prices=True)
+    if dispatch is None:
+        print('** OPF failed to find an optimal solution **')
+        return (None, termination_condition, None) if return_prices else (None, termination_condition)
+    print('-- opf succeeded  >Objective value (should be greater than zero!')
+    dispatch = pd.DataFrame(dispatch, index=demand.index, columns=lp_model.gen_names)
+    if return_prices:
+        prices = pd.Series(prices, index=demand.index) if prices is not None else None
+        return dispatch, termination_condition, prices
+    return dispatch, termination_condition
@@ -7,22 +7,26 @@
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
 import argparse
+import copy
+import multiprocessing
 import os
 import time
 
 import pandas as pd
-import pypsa
 
 from .utils import get_grouped_snapshots
 from .utils import interpolate_dispatch
 from .utils import preprocess_input_data
 from .utils import preprocess_net, filter_ramps
-from .utils import run_opf
+from .utils import run_opf, marginal_unit_prices
+from .utils import opf_limits, boundary_ramp_violations, pin_boundary_steps, refinement_bounds
 from .utils import update_gen_constrains, update_params
+from .lp_model import CopperPlateLP, run_lp_opf
 
 ## Dépendances Chronix2Grid !!
 from chronix2grid.generation.dispatch.utils import RampMode
 import chronix2grid.constants as cst
+from chronix2grid import profiling
 
 
 def main_run_disptach(pypsa_net, 
@@ -41,25 +45,42 @@ def main_run_disptach(pypsa_net,
     
     params = update_params(load.shape[0], load.index[0], params)
 
+    # Two-level dispatch: the OPF solved every step_opf_min minutes is solved
+    # again at 5 minutes around this coarse dispatch (see refine_dispatch)
+    refine = bool(params.get('refine_opf', False)) and params['step_opf_min'] > 5
+    if refine and (kwargs.get('gen_min_pu_t') is not None or kwargs.get('gen_max_pu_t') is not None):
+        print('The dispatch is not refined: gen_min_pu_t and gen_max_pu_t are already constrained')
+        refine = False
+    if refine:
+        fine_params = dict(params, step_opf_min=5)
+        fine_load, fine_gen_constraints = preprocess_input_data(load.copy(), copy.deepcopy(gen_constraints),
+                                                                fine_params)
+
     print ('Preprocessing input data..')    
     # Preprocess input data:
     #   - Add date range as index 
     #   - Check whether gen constraints has same lenght as load
     load_, gen_constraints_ = preprocess_input_data(load, gen_constraints, params)
-    if total_solar is not None:
-        solar_ = pd.DataFrame({"agg_solar": 1.0 * total_solar.values}, index=load_.index)
-    else:
-        solar_ = None
-    if total_wind is not None:
-        wind_ = pd.DataFrame({"agg_wind": 1.0 * total_wind.values}, index=load_.index)
-    else:
-        wind_ = None
+    renewables, fine_renewables = {}, {}
+    for gen_nm, total in [('agg_solar', total_solar), ('agg_wind', total_wind)]:
+        if total is None:
+            renewables[gen_nm] = fine_renewables[gen_nm] = None
+        elif len(total) == len(params['snapshots']):
+            # given every 5 minutes, as the load
+            fine_renewables[gen_nm] = pd.DataFrame({gen_nm: 1.0 * total.values}, index=params['snapshots'])
+            renewables[gen_nm] = fine_renewables[gen_nm].loc[load_.index]
+        else:
+            renewables[gen_nm] = pd.DataFrame({gen_nm: 1.0 * total.values}, index=load_.index)
+            fine_renewables[gen_nm] = None
+    solar_, wind_ = renewables['agg_solar'], renewables['agg_wind']
     tot_snap = load_.index
 
     print('Filter generators ramps up/down')
     # Preprocess pypsa net ramps according to
     # the level specified
     pypsa_net = filter_ramps(pypsa_net, ramp_mode)
+    if refine:
+        fine_net = preprocess_net(copy.deepcopy(pypsa_net), 5)
 
     print('Adapting PyPSA grid with parameters..')
     # Preprocess net parameters:
@@ -84,11 +105,23 @@ def main_run_disptach(pypsa_net,
             slack_name = str(params["slack_name"])
             slack_pmax = float(params["slack_pmax"]) / float(pypsa_net.generators.loc[slack_name].p_nom)
         
+    # The copper plate LP is assembled once for all the windows of the same length
+    lp_model = None
+    if params['opf_engine'] == 'lp':
+        lp_model = CopperPlateLP.from_network(pypsa_net, params, slack_name)
+
+    n_jobs = int(params.get('n_jobs_opf', 1))
+    if n_jobs > 1 and multiprocessing.current_process().daemon:
+        print('OPF windows are solved sequentially: a scenario generated in a worker process '
+              'can not start its own pool')
+        n_jobs = 1
+
     error_ = False
     start = time.time()
-    results, termination_conditions = [], []
+    results, termination_conditions, window_prices = [], [], []
     if (params['mode_opf'] is not None):
         print(f'mode_opf is not None: {params["mode_opf"]}')
+        windows = []
         for month in months:
             # Get snapshots per month
             snap_per_month = tot_snap[tot_snap.month == month]
@@ -107,56 +140,63 @@ def main_run_disptach(pypsa_net,
             g_max_pu_per_month = g_max_pu.loc[snap_per_month]
             g_min_pu_per_month = g_min_pu.loc[snap_per_month]
             # Get grouped snapsshots given monthly snapshots
-            if (params['mode_opf'] is not None):
-                snap_per_mode = get_grouped_snapshots(snap_per_month, params['mode_opf'])
-                for snap_id, snaps in enumerate(snap_per_mode):
-                    # Truncate input data per mode (day, week, month)
-                    load_per_mode = load_per_month.loc[snaps]
-                    if total_solar_per_month is not None:
-                        total_solar_per_mode = total_solar_per_month.loc[snaps]
-                    else:
-                        total_solar_per_mode = None
-                    if total_wind_per_month is not None:
-                        total_wind_per_mode = total_wind_per_month.loc[snaps]
-                    else:
-                        total_wind_per_mode = None
-                    gen_max_pu_per_mode = g_max_pu_per_month.loc[snaps]
-                    gen_min_pu_per_mode = g_min_pu_per_month.loc[snaps]
-                    # Run opf given in specified mode
-                    dispatch, termination_condition = run_opf(
-                        pypsa_net,
-                        load_per_mode,
-                        gen_max_pu_per_mode,
-                        gen_min_pu_per_mode, params, 
-                        total_solar=total_solar_per_mode,
-                        total_wind=total_wind_per_mode,
-                        slack_name=slack_name,
-                        slack_pmin=slack_pmin,
-                        slack_pmax=slack_pmax,
-                        **kwargs)
-                    if dispatch is None:
-                        print(f"ERROR: dispatch failed for 'month' {month} (snap {snap_id})")
-                        error_ = True
-                        break
-                    results.append(dispatch)
-                    termination_conditions.append(termination_condition)
+            snap_per_mode = get_grouped_snapshots(snap_per_month, params['mode_opf'])
+            for snap_id, snaps in enumerate(snap_per_mode):
+                # Truncate input data per mode (day, week, month)
+                windows.append(dict(
+                    month=month,
+                    snap_id=snap_id,
+                    demand=load_per_month.loc[snaps],
+                    gen_max=g_max_pu_per_month.loc[snaps],
+                    gen_min=g_min_pu_per_month.loc[snaps],
+                    total_solar=total_solar_per_month.loc[snaps] if total_solar_per_month is not None else None,
+                    total_wind=total_wind_per_month.loc[snaps] if total_wind_per_month is not None else None,
+                ))
+
+        # Run opf given in specified mode, the windows being independent
+        if n_jobs > 1:
+            with profiling.stage('opf_windows'):
+                window_results = solve_windows_in_pool(pypsa_net, windows, params, n_jobs,
+                                                       slack_name, slack_pmin, slack_pmax,
+                                                       lp_model=lp_model, **kwargs)
+        else:
+            window_results = []
+            for window in windows:
+                with profiling.stage(f'opf_month_{window["month"]}'):
+                    window_results.append(_run_opf_window(pypsa_net, params, slack_name, slack_pmin, slack_pmax,
+                                                          window, lp_model=lp_model, **kwargs))
+                if window_results[-1][0] is None:
+                    break
+
+        for window, (dispatch, termination_condition, prices) in zip(windows, window_results):
+            if dispatch is None:
+                print(f"ERROR: dispatch failed for 'month' {window['month']} (snap {window['snap_id']})")
+                error_ = True
+                break
+            results.append(dispatch)
+            termination_conditions.append(termination_condition)
+            window_prices.append(prices)
+
+        n_stitch_steps = int(params.get('stitch_steps_opf', 0))
+        if not error_ and n_stitch_steps > 0:
+            with profiling.stage('opf_stitching'):
+                results = stitch_windows(pypsa_net, windows, results, params, n_stitch_steps,
+                                         slack_name, slack_pmin, slack_pmax, lp_model=lp_model,
+                                         prices=window_prices, **kwargs)
     else:
         g_max_pu, g_min_pu = gen_constraints_['p_max_pu'], gen_constraints_['p_min_pu']
-        dispatch, termination_condition = run_opf(
-               pypsa_net, load_, g_max_pu,
-               g_min_pu, params,
-               total_solar=solar_,
-               total_wind=wind_,
-               slack_name=slack_name,
-               slack_pmin=slack_pmin,
-               slack_pmax=slack_pmax,
-               **kwargs)
+        with profiling.stage('opf'):
+            dispatch, termination_condition, prices = _run_opf_window(
+                pypsa_net, params, slack_name, slack_pmin, slack_pmax,
+                dict(demand=load_, gen_max=g_max_pu, gen_min=g_min_pu, total_solar=solar_, total_wind=wind_),
+                lp_model=lp_model, **kwargs)
 
         if dispatch is None:
             error_ = True
             print(f"ERROR: dispatch failed.")
         results.append(dispatch)
         termination_conditions.append(termination_condition)
+        window_prices.append(prices)
 
     if error_:
         return None, termination_condition, None
@@ -174,12 +214,28 @@ def main_run_disptach(pypsa_net,
     if params['step_opf_min'] > 5:
         print ('\n => Interpolating dispatch into 5 minutes resolution..')
         prod_p = interpolate_dispatch(prod_p)
+    fine_prices = None
+    if refine:
+        fine_lp_model = CopperPlateLP.from_network(fine_net, fine_params, slack_name) if lp_model is not None else None
+        fine_windows = dict(demand=fine_load, gen_max=fine_gen_constraints['p_max_pu'],
+                            gen_min=fine_gen_constraints['p_min_pu'],
+                            total_solar=fine_renewables['agg_solar'], total_wind=fine_renewables['agg_wind'])
+        with profiling.stage('opf_refinement'):
+            prod_p, fine_prices = refine_dispatch(fine_net, opf_prod, prod_p, fine_windows, fine_params, n_jobs,
+                                                  slack_name, slack_pmin, slack_pmax, lp_model=fine_lp_model,
+                                                  **kwargs)
 
-    # Get the prices of the marginal generator at each timestep
-    marginal_costs = pypsa_net.generators.marginal_cost
-    marginal_prices = prod_p.apply(
-        lambda row: marginal_costs[row[row > 0].index].max(),
-        axis=1)
+    # Prices from the duals of the balance constraints (held over the steps
+    # of each OPF step), else from the marginal generator at each timestep
+    if params['price_mode'] == 'duals' and all(prices is not None for prices in window_prices):
+        marginal_prices = pd.concat(window_prices).sort_index()
+        marginal_prices = marginal_prices.reindex(prod_p.index, method='ffill')
+        if fine_prices is not None:
+            marginal_prices = fine_prices.reindex(prod_p.index).fillna(marginal_prices)
+    else:
+        if params['price_mode'] == 'duals':
+            print('Duals of the balance constraints not available, prices of the marginal generators are used')
+        marginal_prices = marginal_unit_prices(prod_p, pypsa_net.generators.marginal_cost)
 
     # Add noise to results
     # gen_cap = pypsa_net.generators.p_nom
@@ -191,6 +247,230 @@ def main_run_disptach(pypsa_net,
     # at this stage prod_p contains the renewable agg_solar and agg_wind
     return prod_p, termination_conditions, marginal_prices
 
+def _run_opf_window(pypsa_net, params, slack_name, slack_pmin, slack_pmax, window, lp_model=None, **kwargs):
+    # (dispatch, termination_condition, prices) of the window, whose own
+    # gen_min_pu_t and gen_max_pu_t (if any) replace the ones of kwargs
+    for key in ['gen_min_pu_t', 'gen_max_pu_t']:
+        if window.get(key) is not None:
+            kwargs[key] = window[key]
+    if lp_model is not None:
+        return run_lp_opf(
+            lp_model,
+            window['demand'],
+            window['gen_max'],
+            window['gen_min'], params,
+            total_solar=window['total_solar'],
+            total_wind=window['total_wind'],
+            slack_name=slack_name,
+            slack_pmin=slack_pmin,
+            slack_pmax=slack_pmax,
+            return_prices=True,
+            **kwargs)
+    return run_opf(
+        pypsa_net,
+        window['demand'],
+        window['gen_max'],
+        window['gen_min'], params,
+        total_solar=window['total_solar'],
+        total_wind=window['total_wind'],
+        slack_name=slack_name,
+        slack_pmin=slack_pmin,
+        slack_pmax=slack_pmax,
+        return_prices=True,
+        **kwargs)
+
+
+# grid and options of the OPF, sent once to each worker process of solve_windows_in_pool
+_window_context = None
+
+
+def _init_window_worker(pypsa_net, params, slack_name, slack_pmin, slack_pmax, lp_model, kwargs):
+    global _window_context
+    _window_context = (pypsa_net, params, slack_name, slack_pmin, slack_pmax, lp_model, kwargs)
+
+
+def _run_opf_window_in_worker(window):
+    pypsa_net, params, slack_name, slack_pmin, slack_pmax, lp_model, kwargs = _window_context
+    return _run_opf_window(pypsa_net, params, slack_name, slack_pmin, slack_pmax, window, lp_model=lp_model,
+                           **kwargs)
+
+
+def solve_windows_in_pool(pypsa_net, windows, params, n_jobs, slack_name=None, slack_pmin=None, slack_pmax=None,
+                          lp_model=None, **kwargs):
+    """ Solves the OPF of independent time windows (days, weeks or months)
+    concurrently in a pool of ``n_jobs`` processes. The grid is sent once
+    to each process
+
+    Returns
+    -------
+    list
+        (dispatch, termination_condition, prices) of each window, in the order of ``windows``
+    """
+    print(f'Solving {len(windows)} OPF windows with {n_jobs} processes')
+    with multiprocessing.Pool(n_jobs, initializer=_init_window_worker,
+                              initargs=(pypsa_net, params, slack_name, slack_pmin, slack_pmax, lp_model,
+                                        kwargs)) as pool:
+        return pool.map(_run_opf_window_in_worker, windows, chunksize=1)
+
+
+def stitch_windows(pypsa_net, windows, results, params, n_steps, slack_name=None, slack_pmin=None, slack_pmax=None,
+                   lp_model=None, prices=None, **kwargs):
+    """ Restores the ramp feasibility between windows solved independently.
+
+    At each boundary where a ramp is violated, the last ``n_steps`` steps of
+    the window and the first ``n_steps`` steps of the next one are solved
+    again together, their outer steps being fixed to their current dispatch
+    so that the junction with the rest of the windows is kept.
+    If this OPF fails the boundary is left as it is.
+    The ``prices`` of the windows, if given, are updated in place with
+    the ones of the steps solved again (the fixed outer steps keep theirs)
+
+    Returns
+    -------
+    list
+        Dispatch of each window
+    """
+    if kwargs.get('gen_min_pu_t') is not None or kwargs.get('gen_max_pu_t') is not None:
+        print('Windows are not stitched: gen_min_pu_t and gen_max_pu_t are already constrained')
+        return results
+    kwargs = {key: value for key, value in kwargs.items() if key not in ['gen_min_pu_t', 'gen_max_pu_t']}
+    p_nom, ramp_up, ramp_down = opf_limits(pypsa_net, params, slack_name)
+    n_stitched = 0
+    for k in range(len(results) - 1):
+        previous, following = results[k], results[k + 1]
+        violations = boundary_ramp_violations(previous.iloc[-1], following.iloc[0], ramp_up, ramp_down)
+        if not violations:
+            continue
+        n_previous = min(n_steps, previous.shape[0])
+        n_following = min(n_steps, following.shape[0])
+        boundary_window = {
+            key: (pd.concat([windows[k][key].iloc[-n_previous:], windows[k + 1][key].iloc[:n_following]])
+                  if windows[k][key] is not None else None)
+            for key in ['demand', 'gen_max', 'gen_min', 'total_solar', 'total_wind']
+        }
+        current = pd.concat([previous.iloc[-n_previous:], following.iloc[:n_following]])
+        gen_min_pu_t, gen_max_pu_t = pin_boundary_steps(current, p_nom,
+                                                        pypsa_net.generators.p_min_pu,
+                                                        pypsa_net.generators.p_max_pu)
+        dispatch, _, boundary_prices = _run_opf_window(pypsa_net, params, slack_name, slack_pmin, slack_pmax,
+                                                       boundary_window, lp_model=lp_model,
+                                                       gen_min_pu_t=gen_min_pu_t, gen_max_pu_t=gen_max_pu_t,
+                                                       **kwargs)
+        if dispatch is None:
+            print(f"WARNING: ramps of {violations} could not be restored between {previous.index[-1]} "
+                  f"and {following.index[0]}")
+            continue
+        dispatch = dispatch[previous.columns]
+        results[k] = pd.concat([previous.iloc[:-n_previous], dispatch.iloc[:n_previous]])
+        results[k + 1] = pd.concat([dispatch.iloc[n_previous:], following.iloc[n_following:]])
+        if prices is not None:
+            if boundary_prices is None or prices[k] is None or prices[k + 1] is None:
+                prices[k] = prices[k + 1] = None
+            else:
+                boundary_prices = boundary_prices.copy()
+                boundary_prices.iloc[0] = prices[k].iloc[-n_previous]
+                boundary_prices.iloc[-1] = prices[k + 1].iloc[n_following - 1]
+                prices[k] = pd.concat([prices[k].iloc[:-n_previous], boundary_prices.iloc[:n_previous]])
+                prices[k + 1] = pd.concat([boundary_prices.iloc[n_previous:], prices[k + 1].iloc[n_following:]])
+        n_stitched += 1
+    print(f'{n_stitched} window boundaries stitched to restore ramp feasibility')
+    return results
+
+def refine_dispatch(fine_net, coarse_dispatch, interpolated_dispatch, fine_data, params, n_jobs=1,
+                    slack_name=None, slack_pmin=None, slack_pmax=None, lp_model=None, **kwargs):
+    """ Second level of the two-level dispatch: the dispatch solved every
+    step_opf_min minutes is solved again every 5 minutes, in windows of
+    *refine_window_min* minutes (a multiple of step_opf_min) solved
+    independently (in ``n_jobs`` processes).
+
+    In each window the generators stay within *refine_band_pu* of the
+    coarse dispatch linearly interpolated (see :func:`refinement_bounds`),
+    so that the commitment and the energy of the coarse dispatch are
+    roughly kept. A window that can not be solved in the band is solved
+    again without it, and keeps the interpolated dispatch if it still
+    fails. The ramps between the windows are then restored with
+    :func:`stitch_windows`, over *refine_stitch_min* minutes on each side
+
+    Parameters
+    ----------
+    fine_net : PyPSA instance
+        Grid preprocessed for 5 minutes steps (see :func:`preprocess_net`)
+    coarse_dispatch : dataframe
+        Dispatch of the OPF steps
+    interpolated_dispatch : dataframe
+        Coarse dispatch interpolated at 5 minutes (see :func:`interpolate_dispatch`)
+    fine_data : dict
+        demand, gen_max, gen_min, total_solar and total_wind at 5 minutes
+    params : dict
+        OPF parameters (with step_opf_min at 5)
+
+    Returns
+    -------
+    dataframe, Series
+        Refined dispatch, on the steps of ``interpolated_dispatch``, and
+        its prices (None if they are not all available)
+    """
+    coarse_steps = coarse_dispatch.index
+    if len(coarse_steps) < 2:
+        return interpolated_dispatch, None
+    coarse_step_min = int((coarse_steps[1] - coarse_steps[0]) / pd.Timedelta(minutes=1))
+    n_coarse = max(1, int(params.get('refine_window_min', 360)) // coarse_step_min)
+    band_pu = float(params.get('refine_band_pu', 0.1))
+    p_nom, _, _ = opf_limits(fine_net, params, slack_name)
+    p_min_pu, p_max_pu = fine_net.generators.p_min_pu, fine_net.generators.p_max_pu
+    fine_index = interpolated_dispatch.index
+    # linear between the coarse steps (the interpolated dispatch is held
+    # after the last one)
+    linear = coarse_dispatch.reindex(fine_index).interpolate(method='linear')
+
+    window_starts = list(coarse_steps[::n_coarse]) + [fine_index[-1] + pd.Timedelta(minutes=5)]
+    windows = []
+    for start, end in zip(window_starts[:-1], window_starts[1:]):
+        steps = fine_index[(fine_index >= start) & (fine_index < end)]
+        window = {key: fine_data[key].loc[steps] if fine_data[key] is not None else None
+                  for key in ['demand', 'gen_max', 'gen_min', 'total_solar', 'total_wind']}
+        window['gen_min_pu_t'], window['gen_max_pu_t'] = refinement_bounds(linear.loc[steps], p_nom,
+                                                                           p_min_pu, p_max_pu, band_pu)
+        windows.append(window)
+    print(f'Refining the dispatch at 5 minutes in {len(windows)} windows of {n_coarse * coarse_step_min} minutes')
+
+    kwargs = {key: value for key, value in kwargs.items() if key not in ['gen_min_pu_t', 'gen_max_pu_t']}
+    if n_jobs > 1:
+        window_results = solve_windows_in_pool(fine_net, windows, params, n_jobs, slack_name, slack_pmin,
+                                               slack_pmax, lp_model=lp_model, **kwargs)
+    else:
+        window_results = [_run_opf_window(fine_net, params, slack_name, slack_pmin, slack_pmax, window,
+                                          lp_model=lp_model, **kwargs)
+                          for window in windows]
+
+    results, prices, n_relaxed, n_failed = [], [], 0, 0
+    for window, (dispatch, _, window_prices) in zip(windows, window_results):
+        steps = window['demand'].index
+        if dispatch is None:
+            window['gen_min_pu_t'], window['gen_max_pu_t'] = refinement_bounds(linear.loc[steps], p_nom,
+                                                                               p_min_pu, p_max_pu)
+            dispatch, _, window_prices = _run_opf_window(fine_net, params, slack_name, slack_pmin, slack_pmax,
+                                                         window, lp_model=lp_model, **kwargs)
+            n_relaxed += 1
+        if dispatch is None:
+            print(f"WARNING: the dispatch could not be refined between {steps[0]} and {steps[-1]}, "
+                  f"it is interpolated")
+            n_failed += 1
+            dispatch, window_prices = interpolated_dispatch.loc[steps], None
+        results.append(dispatch[interpolated_dispatch.columns])
+        prices.append(window_prices)
+    print(f'{len(windows) - n_failed} windows refined ({n_relaxed} without band), {n_failed} interpolated')
+
+    for window in windows:
+        del window['gen_min_pu_t'], window['gen_max_pu_t']
+    n_stitch_steps = int(params.get('refine_stitch_min', 120)) // 5
+    results = stitch_windows(fine_net, windows, results, params, n_stitch_steps, slack_name,
+                             slack_pmin, slack_pmax, lp_model=lp_model, prices=prices, **kwargs)
+    refined = pd.concat(results)
+    if any(window_prices is None for window_prices in prices):
+        return refined, None
+    return refined, pd.concat(prices)
+
 # In case to launch by the terminal
 # ++  ++  ++  ++  ++  ++  ++  ++  +
 # Vars to set up...
@@ -228,6 +508,7 @@ if __name__ == "__main__":
 
     # **  **  **  **  ** 
     # Load the PyPSA grid
+    import pypsa
     net = pypsa.Network(import_name=args.grid_path)
 
     # Load consumption data without index
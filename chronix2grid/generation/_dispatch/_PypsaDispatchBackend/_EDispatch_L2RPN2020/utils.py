@@ -9,7 +9,7 @@
 import numpy as np
 import pandas as pd
 import copy 
-import pypsa
+import sys
 
 from chronix2grid.generation.dispatch.utils import RampMode
 
@@ -93,6 +93,12 @@ def update_params(num, start_date, params_user):
             mode_opf      : Mode OPF formulates as single optimization problem
             reactive_comp : Factor applied to consumption to compensate reactive
                             part not modelled by linear opf
+            opf_engine    : pypsa to solve the windows with PyPSA, lp to solve
+                            them with a copper plate LP built once (see lp_model)
+            price_mode    : duals for prices read from the duals of the balance
+                            constraints, marginal_unit for the marginal cost of
+                            the most expensive generator running (used anyway
+                            when the solver gives no duals)
     Returns
     -------
     dict
@@ -104,6 +110,8 @@ def update_params(num, start_date, params_user):
             'step_opf_min': 5,
             'mode_opf': 'day',
             'reactive_comp': 1.025,
+            'opf_engine': 'pypsa',
+            'price_mode': 'duals',
     }
     params.update(params_user)
     # Get user params
@@ -117,6 +125,10 @@ def update_params(num, start_date, params_user):
         print('mode_opf is not None')
         if not mode_opf.lower() in ['day', 'week', 'month']:
             raise RuntimeError("Please provide a valid opf mode (day, week, month")
+    if params['opf_engine'] not in ['pypsa', 'lp']:
+        raise RuntimeError("Please provide a valid opf engine (pypsa, lp)")
+    if params['price_mode'] not in ['duals', 'marginal_unit']:
+        raise RuntimeError("Please provide a valid price mode (duals, marginal_unit)")
     # Create temporary date range to be load to input data
     if snaps == []:
         snapshots = pd.date_range(start=start_date, periods=num, freq='5min')
@@ -246,15 +258,19 @@ def preprocess_net(net, every_min, input_data_resolution=5):
         Modified PyPSA grid
     """      
     # Remove all loads modelled in PyPSA
-    # and create one single agg_load.
-    net.mremove('Load', names=net.loads.index)  
-    net.add('Load', name='agg_load', bus=net.buses.index.tolist()[0])
+    # and create one single agg_load (other
+    # dispatchers only model the generators).
+    # (pypsa is only imported by the PyPSA dispatcher, so that the other ones work without it)
+    pypsa = sys.modules.get('pypsa')
+    if pypsa is not None and isinstance(net, pypsa.Network):
+        net.mremove('Load', names=net.loads.index)  
+        net.add('Load', name='agg_load', bus=net.buses.index.tolist()[0])
     # Adapt ramps according to the skipping time
     # configured to run the OPF. 
     steps = every_min / input_data_resolution
     net.generators.loc[:, ['ramp_limit_up', 'ramp_limit_down']] *= steps
     # Change commitable as false
-    net.generators.commitable = False
+    net.generators['commitable'] = False
     return net
 
 def get_grouped_snapshots(snapshot, mode): 
@@ -273,6 +289,79 @@ def get_grouped_snapshots(snapshot, mode):
     }
     return periods[mode]
 
+def window_pu_constraints(gen_max,
+                          gen_min,
+                          total_solar=None,
+                          total_wind=None,
+                          slack_name=None,
+                          slack_pmin=None,
+                          slack_pmax=None,
+                          gen_min_pu_t=None,
+                          gen_max_pu_t=None):
+    """ Time varying min and max constraints (pu) of the generators
+    for one OPF window: gen constraints completed with the renewable
+    availability, the slack limits and the additional constraints
+    *gen_min_pu_t* and *gen_max_pu_t*
+
+    Parameters
+    ----------
+    gen_max : dataframe
+        Generator max constraints in pu
+    gen_min : dataframe
+        Generator min constraints in pu
+
+    Returns
+    -------
+    dataframe, dataframe
+        Updated max and min constraints
+    """
+    if total_solar is not None or total_wind is not None:
+        # allow to curtail the solar and wind (to avoid infeasibility)
+        gen_max = copy.deepcopy(gen_max)
+        if total_solar is not None:
+            gen_max["agg_solar"] = total_solar
+        if total_wind is not None:
+            gen_max["agg_wind"] = total_wind
+    
+    if total_solar is None:
+        # I did not specify any solar time series, i should tell the network they are all 0.
+        gen_max = copy.deepcopy(gen_max)
+        gen_max["agg_solar"] = 0.
+    if total_wind is None:
+        # I did not specify any wind time series, i should tell the network they are all 0.
+        gen_max = copy.deepcopy(gen_max)
+        gen_max["agg_wind"] = 0.
+        
+    if slack_name is not None and slack_pmin is not None:
+        # add pmin to the slack bus, to avoid negative production when losses
+        # are added
+        gen_min = copy.deepcopy(gen_min)
+        gen_min[slack_name] = slack_pmin
+            
+    if slack_name is not None and slack_pmax is not None:
+        # add pmin to the slack bus, to avoid negative production when losses
+        # are added
+        gen_max = copy.deepcopy(gen_max)
+        gen_max[slack_name] = slack_pmax
+    
+    if gen_max_pu_t is not None:
+        # addition contraint on the max_pu, used for example when splitting the loss
+        for gen_nm, max_val in gen_max_pu_t.items():
+            if gen_nm in gen_max:
+                gen_max[str(gen_nm)] = np.minimum(gen_max[str(gen_nm)], max_val)
+            else:
+                gen_max[str(gen_nm)] = max_val
+    
+    if gen_min_pu_t is not None:
+        # addition contraint on the min_pu, used for example when splitting the loss
+        for gen_nm, min_val in gen_min_pu_t.items():
+            if gen_nm in gen_min:
+                gen_min[str(gen_nm)] = np.maximum(gen_min[str(gen_nm)], min_val)
+            else:
+                gen_min[str(gen_nm)] = min_val
+    return gen_max, gen_min
+
+
 def run_opf(net,
             demand,
             gen_max,
@@ -285,6 +374,7 @@ def run_opf(net,
             slack_pmax=None,
             gen_min_pu_t=None,  # used when splitting the losses, to remember, for each generators / steps the setpoint
             gen_max_pu_t=None,  # used when splitting the losses, to remember, for each generators / steps the setpoint
+            return_prices=False,
             **kwargs):
     """ Run linear OPF problem in PyPSA considering
     only marginal costs and ramps as LP problem.
@@ -300,11 +390,17 @@ def run_opf(net,
         Generator min constraints in pu
     params : dict
         OPF set up parameters
+    return_prices : bool, optional
+        Whether to also return the marginal prices of the balance
+        constraints (duals kept by PyPSA in buses_t.marginal_price)
     
     Returns
     -------
     dataframe
         Results of OPF dispatch
+    Series, optional
+        If ``return_prices``, marginal price at each snapshot (None if the
+        solver gave no duals)
     """    
     to_disp = {'day': demand.index.day.unique().values[0],
                'week': demand.index.week.unique().values[0],
@@ -356,55 +452,19 @@ def run_opf(net,
     
     # ++  ++  ++  ++  ++  ++  ++  ++  ++  ++  ++ 
     # Fill load and gen constraints to PyPSA grid
-    if total_solar is not None or total_wind is not None:
-        # allow to curtail the solar and wind (to avoid infeasibility)
-        gen_max = copy.deepcopy(gen_max)
-        if total_solar is not None:
-            gen_max["agg_solar"] = total_solar
-        if total_wind is not None:
-            gen_max["agg_wind"] = total_wind
-    
-    if total_solar is None:
-        # I did not specify any solar time series, i should tell the network they are all 0.
-        gen_max = copy.deepcopy(gen_max)
-        gen_max["agg_solar"] = 0.
-    if total_wind is None:
-        # I did not specify any wind time series, i should tell the network they are all 0.
-        gen_max = copy.deepcopy(gen_max)
-        gen_max["agg_wind"] = 0.
-        
-    if slack_name is not None and slack_pmin is not None:
-        # add pmin to the slack bus, to avoid negative production when losses
-        # are added
-        gen_min = copy.deepcopy(gen_min)
-        gen_min[slack_name] = slack_pmin
-            
-    if slack_name is not None and slack_pmax is not None:
-        # add pmin to the slack bus, to avoid negative production when losses
-        # are added
-        gen_max = copy.deepcopy(gen_max)
-        gen_max[slack_name] = slack_pmax
-    
+    gen_max, gen_min = window_pu_constraints(gen_max, gen_min,
+                                             total_solar=total_solar,
+                                             total_wind=total_wind,
+                                             slack_name=slack_name,
+                                             slack_pmin=slack_pmin,
+                                             slack_pmax=slack_pmax,
+                                             gen_min_pu_t=gen_min_pu_t,
+                                             gen_max_pu_t=gen_max_pu_t)
+
     if slack_name is not None and "slack_ramp_limit_ratio" in params:
         net.generators.ramp_limit_up[slack_name] *= float(params["slack_ramp_limit_ratio"])
         net.generators.ramp_limit_down[slack_name] *= float(params["slack_ramp_limit_ratio"])
     
-    if gen_max_pu_t is not None:
-        # addition contraint on the max_pu, used for example when splitting the loss
-        for gen_nm, max_val in gen_max_pu_t.items():
-            if gen_nm in gen_max:
-                gen_max[str(gen_nm)] = np.minimum(gen_max[str(gen_nm)], max_val)
-            else:
-                gen_max[str(gen_nm)] = max_val
-    
-    if gen_min_pu_t is not None:
-        # addition contraint on the min_pu, used for example when splitting the loss
-        for gen_nm, min_val in gen_min_pu_t.items():
-            if gen_nm in gen_min:
-                gen_min[str(gen_nm)] = np.maximum(gen_min[str(gen_nm)], min_val)
-            else:
-                gen_min[str(gen_nm)] = min_val
-    
     net.loads_t.p_set = pd.concat([demand])
     net.generators_t.p_max_pu = pd.concat([gen_max], axis=1)
     net.generators_t.p_min_pu = pd.concat([gen_min], axis=1)
@@ -414,12 +474,188 @@ def run_opf(net,
     status, termination_condition = net.lopf(net.snapshots, **kwargs)
     if status != 'ok':
         print('** OPF failed to find an optimal solution **')
-        return None, termination_condition
+        return (None, termination_condition, None) if return_prices else (None, termination_condition)
     else:
         print('-- opf succeeded  >Objective value (should be greater than zero!')
+        if return_prices:
+            return net.generators_t.p.copy(), termination_condition, bus_marginal_prices(net)
         return net.generators_t.p.copy(), termination_condition
 
 
+def bus_marginal_prices(net):
+    """ Marginal price at each snapshot of a solved copper plate grid
+    (mean over its buses), None if the solver did not give the duals
+    of the balance constraints
+    """
+    prices = net.buses_t.marginal_price.reindex(net.snapshots)
+    if prices.shape[1] == 0 or prices.isnull().values.any():
+        return None
+    return prices.mean(axis=1).rename(None)
+
+
+def opf_limits(net, params, slack_name=None):
+    """ Nominal power and ramps of the generators as they are
+    seen by the LP of :func:`run_opf` (after the error correction
+    ratios of params are applied)
+
+    Parameters
+    ----------
+    net : PyPSA instance
+        Preprocessed grid (see :func:`preprocess_net`)
+    params : dict
+        OPF parameters
+    slack_name : str, optional
+        Name of the slack generator
+
+    Returns
+    -------
+    Series, Series, Series
+        Nominal power, max ramp up and max ramp down (MW per OPF step)
+        of each generator. Ramps are NaN for unconstrained generators
+    """
+    renewables = [name for name in ['agg_solar', 'agg_wind'] if name in net.generators.index]
+    p_nom = net.generators.p_nom.astype(float).copy()
+    ramp_ratio = pd.Series(1., index=net.generators.index)
+    if "PmaxErrorCorrRatio" in params:
+        p_nom.loc[~p_nom.index.isin(renewables)] *= float(params["PmaxErrorCorrRatio"])
+    if "RampErrorCorrRatio" in params:
+        ramp_ratio.loc[~ramp_ratio.index.isin(renewables)] *= float(params["RampErrorCorrRatio"])
+    if slack_name is not None and "slack_ramp_limit_ratio" in params:
+        ramp_ratio[slack_name] *= float(params["slack_ramp_limit_ratio"])
+    ramp_up = net.generators.ramp_limit_up * ramp_ratio * p_nom
+    ramp_down = net.generators.ramp_limit_down * ramp_ratio * p_nom
+    return p_nom, ramp_up, ramp_down
+
+
+def boundary_ramp_violations(last_dispatch, first_dispatch, ramp_up, ramp_down, tol=1e-3):
+    """ Generators whose ramp constraints are violated between
+    two consecutive steps solved in different OPF windows
+
+    Parameters
+    ----------
+    last_dispatch : Series
+        Dispatch (MW) at the last step of a window
+    first_dispatch : Series
+        Dispatch (MW) at the first step of the next window
+    ramp_up, ramp_down : Series
+        Max ramps (MW per OPF step), NaN if unconstrained (see :func:`opf_limits`)
+    tol : float, optional
+        Tolerance in MW
+
+    Returns
+    -------
+    list
+        Names of the generators violating their ramps
+    """
+    delta = first_dispatch - last_dispatch
+    violated = (delta > ramp_up.reindex(delta.index) + tol) | (-delta > ramp_down.reindex(delta.index) + tol)
+    return violated[violated].index.tolist()
+
+
+def pin_boundary_steps(dispatch, p_nom, p_min_pu, p_max_pu, tol=1e-3):
+    """ Per unit constraints that fix the first and the last steps
+    of a window to ``dispatch`` and leave the steps in between free.
+    They are meant to be passed as *gen_min_pu_t* and *gen_max_pu_t*
+    to :func:`run_opf`, so that the window can be solved again
+    without changing its junction with the neighbouring steps
+
+    Parameters
+    ----------
+    dispatch : dataframe
+        Current dispatch (MW) of the window
+    p_nom : Series
+        Nominal power of the generators (see :func:`opf_limits`)
+    p_min_pu, p_max_pu : Series
+        Static bounds (pu) of the generators, applied to the free steps
+    tol : float, optional
+        Tolerance in MW around the fixed values
+
+    Returns
+    -------
+    dict, dict
+        Min and max constraints in pu, by generator name
+    """
+    gen_min_pu_t, gen_max_pu_t = {}, {}
+    for gen_nm in dispatch.columns:
+        if p_nom[gen_nm] <= 0.:
+            continue
+        min_pu = np.full(dispatch.shape[0], float(p_min_pu[gen_nm]))
+        max_pu = np.full(dispatch.shape[0], float(p_max_pu[gen_nm]))
+        for step in [0, dispatch.shape[0] - 1]:
+            value = float(dispatch[gen_nm].iloc[step])
+            min_pu[step] = (value - tol) / p_nom[gen_nm]
+            max_pu[step] = (value + tol) / p_nom[gen_nm]
+        gen_min_pu_t[gen_nm] = min_pu
+        gen_max_pu_t[gen_nm] = max_pu
+    return gen_min_pu_t, gen_max_pu_t
+
+
+def refinement_bounds(coarse, p_nom, p_min_pu, p_max_pu, band_pu=None):
+    """ Per unit constraints of a window solved again at a finer
+    resolution around a coarse dispatch: each generator stays within
+    ``band_pu`` of it. A generator off in the coarse dispatch can thus
+    only start up to ``band_pu``, which keeps the commitment of the coarse
+    dispatch without commitment variables. They are meant to be passed as
+    *gen_min_pu_t* and *gen_max_pu_t* to :func:`run_opf`
+
+    Parameters
+    ----------
+    coarse : dataframe
+        Coarse dispatch (MW) linearly interpolated on the steps of the window
+    p_nom : Series
+        Nominal power of the generators (see :func:`opf_limits`)
+    p_min_pu, p_max_pu : Series
+        Static bounds (pu) of the generators
+    band_pu : float, optional
+        Max distance (pu) to the coarse dispatch, only the static bounds
+        if None
+
+    Returns
+    -------
+    dict, dict
+        Min and max constraints in pu, by generator name
+    """
+    gen_min_pu_t, gen_max_pu_t = {}, {}
+    for gen_nm in coarse.columns:
+        if p_nom[gen_nm] <= 0.:
+            continue
+        min_pu = np.full(coarse.shape[0], float(p_min_pu[gen_nm]))
+        max_pu = np.full(coarse.shape[0], float(p_max_pu[gen_nm]))
+        if band_pu is not None:
+            values_pu = coarse[gen_nm].values.astype(float) / p_nom[gen_nm]
+            min_pu = np.maximum(min_pu, values_pu - band_pu)
+            max_pu = np.minimum(max_pu, values_pu + band_pu)
+            # a coarse dispatch beyond the static bounds keeps the bound
+            min_pu = np.minimum(min_pu, max_pu)
+        gen_min_pu_t[gen_nm] = min_pu
+        gen_max_pu_t[gen_nm] = max_pu
+    return gen_min_pu_t, gen_max_pu_t
+
+
+def marginal_unit_prices(dispatch, marginal_costs):
+    """ Marginal cost of the most expensive generator running at each step,
+    computed on the whole dispatch at once. It is the price of the step
+    when no ramp constraint is binding
+
+    Parameters
+    ----------
+    dispatch : dataframe
+        OPF dispatch result
+    marginal_costs : Series
+        Marginal cost of the generators, by name
+
+    Returns
+    -------
+    Series
+        Price at each step (NaN when no generator runs)
+    """
+    costs = marginal_costs.reindex(dispatch.columns).values.astype(float)
+    running = (dispatch.values > 0) & ~np.isnan(costs)
+    prices = np.where(running, costs, -np.inf).max(axis=1)
+    prices[~running.any(axis=1)] = np.nan
+    return pd.Series(prices, index=dispatch.index)
+
+
 def interpolate_dispatch(dispatch, method='quadratic'):
     """Function to interpolate in case opf in running for 
     steps greater than 5 min.
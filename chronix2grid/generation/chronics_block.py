@@ -0,0 +1,121 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import numpy as np
+import pandas as pd
+
+from . import generation_utils as utils
+
+
+class ChronicsBlock:
+    """
+    Columnar container for the chronics of one scenario.
+
+    All the time series are stored in a single preallocated 2D array (one row per time step, one column per
+    element of the grid) that shares one datetime index. Columns are kept in a fixed order (by default the
+    "natural" order of the element names, see :func:`chronix2grid.generation.generation_utils.natural_keys`),
+    so that no reordering, sorting or copy is needed when the data are written or passed to another stage.
+    :class:`pandas.DataFrame` are only built at the edges, as views on the underlying array.
+
+    Attributes
+    ----------
+    index: :class:`pandas.DatetimeIndex`
+        time steps of the chronics
+    columns: ``list``
+        names of the elements, in the order of the columns of ``values``
+    values: :class:`numpy.ndarray`
+        2D array of shape (len(index), len(columns))
+    """
+    def __init__(self, index, columns, values=None, dtype=np.float64):
+        self.index = index
+        self.columns = list(columns)
+        self._col_ids = {name: col_id for col_id, name in enumerate(self.columns)}
+        if values is None:
+            values = np.zeros((len(index), len(self.columns)), dtype=dtype)
+        if values.shape != (len(index), len(self.columns)):
+            raise RuntimeError(f"The values of the chronics must be of shape {(len(index), len(self.columns))}, "
+                               f"found {values.shape}")
+        self.values = values
+
+    @classmethod
+    def from_names(cls, index, names, reordering=True, dtype=np.float64):
+        """
+        Preallocates a block for the elements ``names``, sorted in their natural order if ``reordering`` is True
+        """
+        names = list(names)
+        if reordering:
+            names = natural_ordering(names)
+        return cls(index, names, dtype=dtype)
+
+    @classmethod
+    def from_dict(cls, dict_, reordering=True, dtype=np.float64):
+        """
+        Builds a block from a dictionary of time series with a 'datetime' key, as produced by the generation
+        functions before this container existed
+        """
+        index = pd.DatetimeIndex(dict_['datetime'], name='datetime')
+        order = np.argsort(index.values, kind='stable')
+        block = cls.from_names(index[order], [name for name in dict_ if name != 'datetime'],
+                               reordering=reordering, dtype=dtype)
+        for name in block.columns:
+            block[name] = np.asarray(dict_[name])[order]
+        return block
+
+    def __setitem__(self, name, series):
+        self.values[:, self._col_ids[name]] = series
+
+    def __getitem__(self, name):
+        return self.values[:, self._col_ids[name]]
+
+    def __contains__(self, name):
+        return name in self._col_ids
+
+    def __len__(self):
+        return len(self.index)
+
+    def select(self, names):
+        """
+        Returns a new block restricted to the elements ``names`` (kept in the order of this block)
+        """
+        names = set(names)
+        col_ids = [col_id for col_id, name in enumerate(self.columns) if name in names]
+        return ChronicsBlock(self.index, [self.columns[col_id] for col_id in col_ids],
+                             values=self.values[:, col_ids])
+
+    def is_naturally_ordered(self):
+        return self.columns == natural_ordering(self.columns)
+
+    def reordered(self):
+        """
+        Returns this block with its columns sorted in their natural order (itself if it is already the case)
+        """
+        if self.is_naturally_ordered():
+            return self
+        return self.reorder_like(natural_ordering(self.columns))
+
+    def reorder_like(self, names):
+        """
+        Returns a new block with its columns in the order given by ``names``
+        """
+        col_ids = [self._col_ids[name] for name in names]
+        return ChronicsBlock(self.index, names, values=self.values[:, col_ids])
+
+    def to_frame(self, values=None, index=None):
+        """
+        Wraps ``values`` (by default the values of this block) in a :class:`pandas.DataFrame` without copying them
+        """
+        if values is None:
+            values = self.values
+        if index is None:
+            index = self.index
+        return pd.DataFrame(values, index=index, columns=self.columns, copy=False)
+
+
+def natural_ordering(names):
+    value = [utils.natural_keys(name) for name in names]
+    return [x for _, x in sorted(zip(value, names))]
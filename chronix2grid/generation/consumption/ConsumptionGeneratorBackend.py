@@ -6,7 +6,7 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
-from .generate_load import main
+from .generate_load import main, main_batch
 
 
 class ConsumptionGeneratorBackend:
@@ -46,3 +46,19 @@ class ConsumptionGeneratorBackend:
             load_weekly_pattern = self.load_config_manager.read_specific()
         return main(self.out_path, self.seed, self.params, self.loads_charac, load_weekly_pattern, self.write_results,
                     day_lag=self.day_lag)
+
+    @classmethod
+    def run_batch(cls, out_paths, seeds, params, loads_charac, load_config_manager, write_results,
+                  load_weekly_pattern=None, day_lag=0):
+        """
+        Runs the generation model of several scenarios at once (one out_path and one seed per scenario) with
+        ``chronix2grid.generation.consumption.generate_load.main_batch`` and writes the chronics of each scenario
+
+        Returns
+        -------
+        ``list``
+            (load, load_forecasted) of each scenario
+        """
+        if load_weekly_pattern is None:
+            load_weekly_pattern = load_config_manager.read_specific()
+        return main_batch(out_paths, seeds, params, loads_charac, load_weekly_pattern, write_results, day_lag=day_lag)
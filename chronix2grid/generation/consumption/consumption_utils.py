@@ -14,46 +14,103 @@ import pandas as pd
 from scipy.interpolate import interp1d
 
 from .. import generation_utils as utils
+from ..chronics_block import ChronicsBlock
 import chronix2grid.constants as cst
+from chronix2grid.chronics_io import write_chronics
+from chronix2grid import profiling
+from chronix2grid.generation.pattern_cache import PATTERN_CACHE, pattern_source, period_key
 
 def compute_loads(loads_charac, temperature_noise, params, load_weekly_pattern, start_day, add_dim, day_lag=0):
     #6  # this is only TRUE if you simulate 2050 !!! formula does not really work
     
-    # Compute active part of loads
-    weekly_pattern = load_weekly_pattern['test'].values
-    
     # start_day_of_week = start_day.weekday()
     # first_dow_chronics = datetime.strptime(load_weekly_pattern["datetime"].iloc[1], "%Y-%m-%d %H:%M:%S").weekday()
     # + (calendar.isleap(start_day.year) if start_day.month >= 3 else 0)
     # day_lag = (first_dow_chronics - start_day_of_week) % 7
     # day_lag = 0
-    loads_series = {}
-    for i, name in enumerate(loads_charac['name']):
-        mask = (loads_charac['name'] == name)
-        if loads_charac[mask]['type'].values == 'residential':
-            locations = [loads_charac[mask]['x'].values[0], loads_charac[mask]['y'].values[0]]
-            Pmax = loads_charac[mask]['Pmax'].values[0]
-            loads_series[name] = compute_residential(locations, Pmax, temperature_noise, params, weekly_pattern, index=i, day_lag=day_lag, add_dim=add_dim)
-
-        if loads_charac[mask]['type'].values == 'industrial':
-            raise NotImplementedError("Impossible to generate industrial loads for now.")
-            Pmax = loads_charac[mask]['Pmax'].values[0]
-            loads_series[name] = compute_industrial(Pmax, params)
-    return loads_series
-
-def compute_residential(locations, Pmax, temperature_noise, params, weekly_pattern, index, day_lag=None, add_dim=0):
-
-
-    # Compute refined signals
-    temperature_signal = utils.interpolate_noise(
-        temperature_noise,
-        params,
-        locations,
-        time_scale=params['temperature_corr'],
-        add_dim=add_dim)
+    return compute_loads_batch(loads_charac, [temperature_noise], params, load_weekly_pattern, add_dim,
+                               day_lag=day_lag)[0]
+
+def compute_loads_batch(loads_charac, temperature_noises, params, load_weekly_pattern, add_dim, day_lag=0):
+    """
+    Loads of several scenarios at once (one temperature noise per scenario): the noises are interpolated and the
+    patterns applied with a leading scenario axis, the loads of each scenario being the ones of :func:`compute_loads`
+    with its noise.
+
+    Returns
+    -------
+    list of :class:`chronix2grid.generation.chronics_block.ChronicsBlock`
+        loads of each scenario
+    """
+    if np.any(loads_charac['type'] == 'industrial'):
+        raise NotImplementedError("Impossible to generate industrial loads for now.")
+
+    # Compute active part of loads
+    weekly_pattern = load_weekly_pattern['test'].values
+    pattern_id = pattern_source(weekly_pattern)
+
+    # Interpolate the temperature noise at every residential load of every scenario in one pass
+    is_residential = (loads_charac['type'] == 'residential').values
+    with profiling.stage('interpolation'):
+        temperature_signals = utils.interpolate_noises(
+            temperature_noises,
+            params,
+            loads_charac.loc[is_residential, ['x', 'y']].values,
+            time_scale=params['temperature_corr'],
+            add_dim=add_dim).astype(float)
+
+    # Patterns of the residential loads (the same for all the scenarios)
+    seasonal_pattern = PATTERN_CACHE.get(('load_seasonal',) + period_key(params),
+                                         lambda: compute_seasonal_pattern(params))
+    weekly_patterns = np.stack([compute_load_pattern(params, weekly_pattern, index, day_lag, pattern_id=pattern_id)
+                                for index in np.flatnonzero(is_residential)])
+    Pmax = loads_charac.loc[is_residential, 'Pmax'].values.reshape(-1, 1)
+    std_temperature_noise = params['std_temperature_noise']
+    residential_series = Pmax * weekly_patterns * (std_temperature_noise * temperature_signals + seasonal_pattern)
+
+    datetime_index = pd.date_range(
+        start=params['start_date'],
+        end=params['end_date'],
+        freq=str(params['dt']) + 'min',
+        name='datetime')
+    residential_names = loads_charac.loc[is_residential, 'name']
+    all_loads_series = []
+    for scenario_series in residential_series:
+        loads_series = ChronicsBlock.from_names(datetime_index, loads_charac['name'])
+        for name, series in zip(residential_names, scenario_series):
+            loads_series[name] = series
+        all_loads_series.append(loads_series)
+    return all_loads_series
+
+def compute_residential(locations, Pmax, temperature_noise, params, weekly_pattern, index, day_lag=None, add_dim=0,
+                        temperature_signal=None, pattern_id=None):
+
+
+    # Compute refined signals (unless they have already been interpolated for all the loads)
+    if temperature_signal is None:
+        temperature_signal = utils.interpolate_noise(
+            temperature_noise,
+            params,
+            locations,
+            time_scale=params['temperature_corr'],
+            add_dim=add_dim)
     temperature_signal = temperature_signal.astype(float)
     
-    # Compute seasonal pattern
+    # Compute seasonal pattern (the same for all the loads)
+    seasonal_pattern = PATTERN_CACHE.get(('load_seasonal',) + period_key(params),
+                                         lambda: compute_seasonal_pattern(params))
+
+    # Get weekly pattern
+    weekly_pattern = compute_load_pattern(params, weekly_pattern, index, day_lag, pattern_id=pattern_id)
+    std_temperature_noise = params['std_temperature_noise']
+    residential_series = Pmax * weekly_pattern * (std_temperature_noise * temperature_signal + seasonal_pattern)
+
+    return residential_series
+
+def compute_seasonal_pattern(params):
+    """
+    Yearly variation of the load (minimum mid-February) at each time step of the scenario
+    """
     Nt_inter = int(params['T'] // params['dt'] + 1)
     
     # t = np.linspace(0, params['T'], Nt_inter, endpoint=True)
@@ -65,17 +122,11 @@ def compute_residential(locations, Pmax, temperature_noise, params, weekly_patte
     nb_sec_per_year = (365. * nb_sec_per_day)
     year_pattern = 2. * np.pi / nb_sec_per_year
     seasonal_pattern = 1.5 / 7. * np.cos(year_pattern * (t + start_min - 45 * nb_sec_per_day))  # min of the load is 15 of February so 45 days after beginning of year
-    #seasonal_pattern = 1.5 / 7. * np.cos(year_pattern * (t - start_min - 30 * nb_sec_per_day)) #older version to be removed
     seasonal_pattern += 5.5 / 7.
+    return seasonal_pattern
 
-    # Get weekly pattern
-    weekly_pattern = compute_load_pattern(params, weekly_pattern, index, day_lag)
-    std_temperature_noise = params['std_temperature_noise']
-    residential_series = Pmax * weekly_pattern * (std_temperature_noise * temperature_signal + seasonal_pattern)
-
-    return residential_series
 
-def compute_load_pattern(params, weekly_pattern, index, day_lag):
+def compute_load_pattern(params, weekly_pattern, index, day_lag, pattern_id=None):
     """
     Loads a typical hourly pattern, and interpolates it to generate
     a smooth solar generation pattern between 0 and 1
@@ -98,24 +149,30 @@ def compute_load_pattern(params, weekly_pattern, index, day_lag):
     # Keep only one week of pattern
     index_weekly_perweek = 12 * 24 * 7
     index %= int((weekly_pattern.shape[0] - nb_step_lag_for_starting_day) / index_weekly_perweek - 1)
-    weekly_pattern = weekly_pattern[(nb_step_lag_for_starting_day + index * index_weekly_perweek):(nb_step_lag_for_starting_day + (index + 1) * index_weekly_perweek)]
-    weekly_pattern /= np.mean(weekly_pattern)
+
+    # the loads using the same week of the pattern share its interpolation
+    if pattern_id is None:
+        pattern_id = pattern_source(weekly_pattern)
+    key = ('load_weekly', pattern_id, nb_step_lag_for_starting_day, index) + period_key(params)
+    return PATTERN_CACHE.get(key, lambda: _interpolate_load_pattern(
+        params, weekly_pattern[(nb_step_lag_for_starting_day + index * index_weekly_perweek):(nb_step_lag_for_starting_day + (index + 1) * index_weekly_perweek)]))
+
+
+def _interpolate_load_pattern(params, weekly_pattern):
+    weekly_pattern = weekly_pattern / np.mean(weekly_pattern)
 
     start_year = pd.to_datetime(str(params['start_date'].year) + '/01/01', format='%Y-%m-%d')
     T_bis = int(pd.Timedelta(params['end_date'] - start_year).total_seconds() // (60))
 
     Nt_inter_hr = int(T_bis // 5 + 1)
     N_repet = int((Nt_inter_hr - 1) // len(weekly_pattern) + 1)
-    stacked_weekly_pattern = weekly_pattern
-    for i in range(N_repet - 1):
-        stacked_weekly_pattern = np.append(stacked_weekly_pattern, weekly_pattern)
+    stacked_weekly_pattern = np.tile(weekly_pattern, N_repet)
 
     # The time is in minutes
     t_pattern = np.linspace(0, 60 * 7 * 24 * N_repet, 12 * 7 * 24 * N_repet, endpoint=False)
     f2 = interp1d(t_pattern, stacked_weekly_pattern, kind='cubic')
 
     Nt_inter = int(params['T'] // params['dt'] + 1)
-    start_year = pd.to_datetime(str(params['start_date'].year) + '/01/01', format='%Y-%m-%d')
     start_min = int(pd.Timedelta(params['start_date'] - start_year).total_seconds() // 60)
     end_min = int(pd.Timedelta(params['end_date'] - start_year).total_seconds() // 60)
     t_inter = np.linspace(start_min, end_min, Nt_inter, endpoint=True)
@@ -126,37 +183,32 @@ def compute_load_pattern(params, weekly_pattern, index, day_lag):
 
 
 def create_csv(prng, dict_, path, forecasted=False, reordering=True, noise=None,
-               shift=False, write_results=True, index=False):
-    df = pd.DataFrame.from_dict(dict_)
-    df.set_index('datetime', inplace=True)
-    df = df.sort_index(ascending=True)
-    df = df.head(len(df)-1)  # Last value is lonely for another day
-    if reordering:
-        value = []
-        for name in list(df):
-            value.append(utils.natural_keys(name))
-        new_ordering = [x for _, x in sorted(zip(value, list(df)))]
-        df = df[new_ordering]
+               shift=False, write_results=True, index=False, output_format=cst.DEFAULT_OUTPUT_FORMAT):
+    if isinstance(dict_, ChronicsBlock):
+        block = dict_.reordered() if reordering else dict_
+    else:
+        block = ChronicsBlock.from_dict(dict_, reordering=reordering)
+    values = block.values[:-1]  # Last value is lonely for another day
+    datetime_index = block.index[:-1]
     if shift:
-        df = df.shift(-1)
-        df = df.fillna(0)
+        values = utils.shift_values(values)
 
-    df_reactive_power = 0.7 * df
+    reactive_power = 0.7 * values
     if noise is not None:
-        df *= prng.lognormal(mean=0.0,sigma=noise, size=df.shape)
+        values = values * prng.lognormal(mean=0.0,sigma=noise, size=values.shape)
         #df *= np.random.lognormal(mean=0.0, sigma=noise, size=df.shape) #older version to be removed
-        df_reactive_power *= prng.lognormal(mean=0.0, sigma=noise, size=df.shape)
+        reactive_power *= prng.lognormal(mean=0.0, sigma=noise, size=values.shape)
         #df_reactive_power *= np.random.lognormal(mean=0.0, sigma=noise,
         #                                         size=df.shape) #older version to be removed
+    df = block.to_frame(values, datetime_index)
 
     if write_results:
+        df_reactive_power = block.to_frame(reactive_power, datetime_index)
         file_extension = '_forecasted' if forecasted else ''
-        df.to_csv(
-            os.path.join(path, f'load_p{file_extension}.csv.bz2'),
-            index=index, sep=';', float_format=cst.FLOATING_POINT_PRECISION_FORMAT)
-        df_reactive_power.to_csv(
-            os.path.join(path, f'load_q{file_extension}.csv.bz2'),
-            index=False, sep=';', float_format=cst.FLOATING_POINT_PRECISION_FORMAT)
+        write_chronics(df, os.path.join(path, f'load_p{file_extension}.csv.bz2'),
+                       output_format, index=index)
+        write_chronics(df_reactive_power, os.path.join(path, f'load_q{file_extension}.csv.bz2'),
+                       output_format, index=False)
 
     return df
 
@@ -17,6 +17,8 @@ import numpy as np
 # Libraries developed for this module
 from . import consumption_utils as conso
 from .. import generation_utils as utils
+import chronix2grid.constants as cst
+from chronix2grid import profiling
 
 
 def main(scenario_destination_path, seed, params, loads_charac, load_weekly_pattern, write_results = True, day_lag=0):
@@ -48,7 +50,70 @@ def main(scenario_destination_path, seed, params, loads_charac, load_weekly_patt
         end=params['end_date'],
         freq=str(params['dt']) + 'min')
 
+    add_dim = compute_add_dim(params, loads_charac)
+    
+    # Generate GLOBAL temperature noise
+    print('Computing global auto-correlated spatio-temporal noise for thermosensible demand...') ## temperature is simply to reflect the fact that loads is correlated spatially, and so is the real "temperature". It is not the real temperature.
+    with profiling.stage('noise'):
+        temperature_noise = utils.generate_coarse_noise(prng, params, 'temperature', add_dim=add_dim)
+
+    print('Computing loads ...')
+    start_day = datetime_index[0]
+    with profiling.stage('loads'):
+        loads_series = conso.compute_loads(loads_charac,
+                                           temperature_noise,
+                                           params,
+                                           load_weekly_pattern,
+                                           start_day=start_day,
+                                           add_dim=add_dim,
+                                           day_lag=day_lag)
+
+    return save_loads(prng, loads_series, scenario_destination_path, params, write_results)
+
+
+def main_batch(scenario_destination_paths, seeds, params, loads_charac, load_weekly_pattern, write_results=True,
+               day_lag=0):
+    """
+    Load generation of several scenarios at once: same as :func:`main` for each (scenario_destination_path, seed),
+    but the interpolation of the noises and the patterns are computed for all the scenarios in one vectorized pass.
+    The noise of each scenario is drawn with its own seed, and its chronics are written at the end.
 
+    Parameters
+    ----------
+    scenario_destination_paths (list): where results of each scenario are written
+    seeds (list): random seed of each scenario
+    params, loads_charac, load_weekly_pattern, write_results, day_lag: see :func:`main`
+
+    Returns
+    -------
+    list: (load_p, load_p_forecasted) of each scenario
+    """
+    prngs = [default_rng(seed) for seed in seeds]
+    add_dim = compute_add_dim(params, loads_charac)
+
+    print(f'Computing global auto-correlated spatio-temporal noise for thermosensible demand of {len(prngs)} scenarios...')
+    with profiling.stage('noise'):
+        temperature_noises = [utils.generate_coarse_noise(prng, params, 'temperature', add_dim=add_dim)
+                              for prng in prngs]
+
+    print('Computing loads ...')
+    with profiling.stage('loads'):
+        all_loads_series = conso.compute_loads_batch(loads_charac,
+                                                     temperature_noises,
+                                                     params,
+                                                     load_weekly_pattern,
+                                                     add_dim=add_dim,
+                                                     day_lag=day_lag)
+
+    return [save_loads(prng, loads_series, scenario_destination_path, params, write_results)
+            for prng, loads_series, scenario_destination_path in zip(prngs, all_loads_series,
+                                                                     scenario_destination_paths)]
+
+
+def compute_add_dim(params, loads_charac):
+    """
+    Number of cells added to the coarse mesh of the noise so that every load is inside it
+    """
     add_dim = 0
     dx_corr = int(params['dx_corr'])
     dy_corr = int(params['dy_corr'])
@@ -58,38 +123,36 @@ def main(scenario_destination_path, seed, params, loads_charac, load_weekly_patt
         add_dim = max(y_plus, add_dim)
         add_dim = max(x_plus, add_dim)
         #add_dim=0 #to get back to when this parameter did not exist - to be removed
-    
-    # Generate GLOBAL temperature noise
-    print('Computing global auto-correlated spatio-temporal noise for thermosensible demand...') ## temperature is simply to reflect the fact that loads is correlated spatially, and so is the real "temperature". It is not the real temperature.
-    temperature_noise = utils.generate_coarse_noise(prng, params, 'temperature', add_dim=add_dim)
+    return add_dim
 
-    print('Computing loads ...')
-    start_day = datetime_index[0]
-    loads_series = conso.compute_loads(loads_charac,
-                                       temperature_noise,
-                                       params,
-                                       load_weekly_pattern,
-                                       start_day=start_day,
-                                       add_dim=add_dim,
-                                       day_lag=day_lag)
-    loads_series['datetime'] = datetime_index
-
-    # Save files
+
+def save_loads(prng, loads_series, scenario_destination_path, params, write_results=True):
+    """
+    Adds the noise of the realized loads (drawn with prng) and writes the chronics of a scenario
+
+    Returns
+    -------
+    pandas.DataFrame: loads chronics generated at every node with additional gaussian noise
+    pandas.DataFrame: loads chronics forecasted for the scenario without additional gaussian noise
+    """
+    output_format = params.get('output_format', cst.DEFAULT_OUTPUT_FORMAT)
     if scenario_destination_path is not None:
-        print('Saving files in zipped csv in "{}"'.format(scenario_destination_path))
+        print('Saving files in {} in "{}"'.format(output_format, scenario_destination_path))
         if not os.path.exists(scenario_destination_path):
             os.makedirs(scenario_destination_path)
             
     load_p_forecasted = conso.create_csv(prng, loads_series, scenario_destination_path,
                                         forecasted=True, reordering=True,
-                                        shift=True, write_results=write_results, index=False)
+                                        shift=True, write_results=write_results, index=False,
+                                        output_format=output_format)
     load_p = conso.create_csv(
         prng,
         loads_series, scenario_destination_path,
         reordering=True,
         noise=params['planned_std'],
         write_results=write_results,
-        index=False
+        index=False,
+        output_format=output_format
     )
     
     return load_p, load_p_forecasted
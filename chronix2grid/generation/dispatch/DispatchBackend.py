@@ -29,6 +29,8 @@ class DispatchBackend: # TODO - PypsaDispatchBackend - devra créer un PypsaDisp
         dictionnary with the model parameters. It needs to contain keys **"dt", "planned_std"**
     params_opf: ``dict``
         dictionnary with specific parameters concerning the dispatch optimization (Optimal Power Flow computation)
+    agent_results_path: ``str`` or ``None``
+        folder of the results of the loss simulation, two levels above ``scenario_folder_path`` if None
     """
     def __init__(self,
                  dispatcher,
@@ -36,13 +38,15 @@ class DispatchBackend: # TODO - PypsaDispatchBackend - devra créer un PypsaDisp
                  grid_folder,
                  seed_disp,
                  params,
-                 params_opf):
+                 params_opf,
+                 agent_results_path=None):
         self.dispatcher = dispatcher
         self.params = params
         self.params_opf = params_opf
         self.seed_disp = seed_disp
         self.scenario_folder_path = scenario_folder_path
         self.grid_folder = grid_folder
+        self.agent_results_path = agent_results_path
 
     def run(self):
         """
@@ -58,4 +62,5 @@ class DispatchBackend: # TODO - PypsaDispatchBackend - devra créer un PypsaDisp
 
         """
         return main(self.dispatcher, self.scenario_folder_path, self.scenario_folder_path,
-                    self.grid_folder, self.seed_disp, self.params, self.params_opf)
+                    self.grid_folder, self.seed_disp, self.params, self.params_opf,
+                    agent_results_path=self.agent_results_path)
@@ -20,11 +20,14 @@ from numpy.random import default_rng
 
 import grid2op
 from grid2op.Chronics import ChangeNothing
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
 from chronix2grid.generation.dispatch.utils import RampMode, add_noise_gen, modify_hydro_ramps, modify_slack_characs
+from chronix2grid.generation.dispatch.hydro_guide_curves import read_hydro_guide_curves
 import chronix2grid.constants as cst
+from chronix2grid.chronics_io import write_chronics, read_chronics
 
 DispatchResults = namedtuple('DispatchResults', ['chronix', 'terminal_conditions'])
 
@@ -193,17 +196,14 @@ class Dispatcher(ABC):
         hydro_file_path: ``str``
 
         """
-        dateparse = lambda x: dt.datetime.strptime(x, '%Y-%m-%d %H:%M')
-        hydro_pattern = pd.read_csv(hydro_file_path, usecols=[0, 2, 3],
-                                    parse_dates=[0], date_parser=dateparse)
-        hydro_pattern.set_index(hydro_pattern.columns[0], inplace=True)
+        guide_curves = read_hydro_guide_curves(hydro_file_path)
         hydro_names = self.generators[self.generators.carrier == 'hydro'].index
 
+        # curves by minute of year (see hydro_guide_curves), the lookup tables being kept by the process
         for extremum in ['min', 'max']:
-            hydro_pu = hydro_pattern[[f'p_{extremum}_u'] * len(hydro_names)]
-            hydro_pu.columns = hydro_names
-            hydro_pu.index = hydro_pu.index.map(
-                lambda x: (x.month, x.day, x.hour, x.minute, x.second))
+            hydro_pu = pd.DataFrame(
+                np.repeat(getattr(guide_curves, f'p_{extremum}_pu')[:, None], len(hydro_names), axis=1),
+                index=guide_curves.minutes, columns=hydro_names)
             setattr(self, f'_{extremum}_hydro_pu', hydro_pu)
 
         self._hydro_file_path = hydro_file_path
@@ -231,14 +231,14 @@ class Dispatcher(ABC):
             raise Exception('This method can only be applied when a Scenario for load'
                             'and renewables has been instantiated and hydro guide'
                             'curves have been read.')
-        index_slice = self._chronix_scenario.loads.index.map(
-            lambda x: (x.month, x.day, x.hour, x.minute, x.second)
-        )
-
-        self._min_hydro_pu = self._min_hydro_pu.reindex(index_slice).fillna(method='ffill')
-        self._max_hydro_pu = self._max_hydro_pu.reindex(index_slice).fillna(method='ffill')
+        index = self._chronix_scenario.loads.index
+        hydro_names = self.generators[self.generators.carrier == 'hydro'].index
+        p_min_pu, p_max_pu = read_hydro_guide_curves(self._hydro_file_path).lookup(index)
 
-        return {'p_max_pu': self._max_hydro_pu.copy(), 'p_min_pu': self._min_hydro_pu.copy()}
+        return {'p_max_pu': pd.DataFrame(np.repeat(p_max_pu[:, None], len(hydro_names), axis=1),
+                                         index=index, columns=hydro_names),
+                'p_min_pu': pd.DataFrame(np.repeat(p_min_pu[:, None], len(hydro_names), axis=1),
+                                         index=index, columns=hydro_names)}
 
     def modify_marginal_costs(self, new_costs):
         for carrier, new_cost in new_costs.items():
@@ -269,7 +269,8 @@ class Dispatcher(ABC):
 
     def save_results(self, params, output_folder, prng=None):
         """
-        Saves dispatch results in prod_p.csv.bz2, prod_p_forecasted.csv.bz2, load_p.csv.bz2, prices.csv
+        Saves dispatch results in prod_p, prod_p_forecasted, load_p, prices and prod_p_renew_orig files, in the format
+        given by ``params['output_format']`` (csv.bz2 by default)
 
         Parameters
         ----------
@@ -357,34 +358,16 @@ class Dispatcher(ABC):
                                                      gen_cap,
                                                      noise_factor=params['planned_std'])
 
-        # prod_p_forecasted_with_noise.to_csv(
-        prod_p_forecasted_with_noise.to_csv(
-            os.path.join(output_folder, "prod_p_forecasted.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-        # prod_p_with_noise.to_csv(
-        full_opf_dispatch.to_csv(
-            os.path.join(output_folder, "prod_p.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-        res_load_scenario.marginal_prices.to_csv(
-            os.path.join(output_folder, "prices.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-        res_load_scenario.loads.to_csv(
-            os.path.join(output_folder, "load_p.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
+        output_format = params.get('output_format', cst.DEFAULT_OUTPUT_FORMAT)
+        write_chronics(prod_p_forecasted_with_noise, os.path.join(output_folder, "prod_p_forecasted.csv.bz2"),
+                       output_format)
+        write_chronics(full_opf_dispatch, os.path.join(output_folder, "prod_p.csv.bz2"), output_format)
+        write_chronics(res_load_scenario.marginal_prices, os.path.join(output_folder, "prices.csv.bz2"),
+                       output_format)
+        write_chronics(res_load_scenario.loads, os.path.join(output_folder, "load_p.csv.bz2"), output_format)
         # save the origin time series        
-        pd.concat([res_load_scenario.wind_p, res_load_scenario.solar_p], axis=1).to_csv(
-            os.path.join(output_folder, "prod_p_renew_orig.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
+        write_chronics(pd.concat([res_load_scenario.wind_p, res_load_scenario.solar_p], axis=1),
+                       os.path.join(output_folder, "prod_p_renew_orig.csv.bz2"), output_format)
 
 class ChroniXScenario:
     def __init__(self, loads, prods, res_names, scenario_name, loss=None):
@@ -400,10 +383,10 @@ class ChroniXScenario:
     @classmethod
     def from_disk(cls, load_path_file, prod_path_file, res_names, scenario_name,
                   start_date, end_date, dt, loss_path_file=None):
-        loads = pd.read_csv(load_path_file, sep=';')
-        prods = pd.read_csv(prod_path_file, sep=';')
+        loads = read_chronics(load_path_file, sep=';')
+        prods = read_chronics(prod_path_file, sep=';')
         if loss_path_file is not None:
-            loss = pd.read_csv(loss_path_file, sep=';')
+            loss = read_chronics(loss_path_file, sep=';')
         else:
             loss = None
         datetime_index = pd.date_range(
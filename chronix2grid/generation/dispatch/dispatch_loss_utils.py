@@ -9,6 +9,7 @@
 import os
 import warnings
 import shutil
+import tempfile
 import numpy as np
 import pandas as pd
 import pathlib
@@ -20,18 +21,18 @@ from grid2op.Runner import Runner
 from grid2op.Chronics import GridStateFromFile
 
 import chronix2grid.constants as cst
+from chronix2grid.chronics_io import (write_chronics, read_chronics, find_chronics_file, chronics_format,
+                                      export_to_csv)
 
 def move_env_temporarily(scenario_output_folder, grid_path):
 
     scenario_name = pathlib.Path(scenario_output_folder).name
-    grid_temporary_path = grid_path+'_'+scenario_name
-
-    if os.path.exists(grid_temporary_path):
-        warnings.warn("Had to delete a previous scenario grid temporary path in input data", UserWarning)
-        shutil.rmtree(grid_temporary_path)
-    #os.makedirs(grid_temporary_path, exist_ok=True)
+    # unique, so that the dispatches of a scenario run concurrently (e.g. by a dispatch sweep) have their own copy
+    grid_path = os.path.normpath(grid_path)
+    grid_temporary_path = tempfile.mkdtemp(prefix=os.path.basename(grid_path) + '_' + scenario_name + '_',
+                                           dir=os.path.dirname(grid_path))
     print("temporary copy of grid in "+str(grid_temporary_path))
-    shutil.copytree(grid_path, grid_temporary_path)
+    shutil.copytree(grid_path, grid_temporary_path, dirs_exist_ok=True)
     return grid_temporary_path
 
 
@@ -47,6 +48,8 @@ def move_chronics_temporarily(scenario_output_folder, grid_path):
         shutil.rmtree(chronics_temporary_path)
     print("temporary copy of chronics in "+str(chronics_temporary_path))
     shutil.copytree(scenario_output_folder, chronics_temporary_path)
+    # grid2op only reads csv chronics
+    export_to_csv(chronics_temporary_path, remove_source=True)
 
 def remove_temporary_chronics(grid_path):
     chronics_temporary_path = os.path.join(grid_path, 'chronics')
@@ -131,10 +134,11 @@ def run_grid2op_simulation_donothing(grid_path, agent_result_path,  nb_core = 1,
         path_save=os.path.join(agent_results_path,'agent_results')
         os.makedirs(path_save, exist_ok=True)
 
-    name_chron, cum_reward, nb_time_step, episode_data =runner.run_one_episode(path_save=path_save,
+    # the episode data is the last output, whose number depends on the grid2op version
+    episode_data = runner.run_one_episode(path_save=path_save,
                              indx=scen_id,
                              pbar=True,
-                             detailed_output=True)
+                             detailed_output=True)[-1]
     #res = runner.run(nb_episode=nb_episode, nb_process=NB_CORE, pbar=True, add_detailed_output=True)
     #                 #path_save=simulation_data_folder
     #id_chron, name_chron, cum_reward, nb_timestep, max_ts, episode_data = res.pop()
@@ -165,8 +169,10 @@ def correct_scenario_loss(scenario_folder_path, params_opf, grid_path, data_this
     prodSlack = prods_p[id_slack]
 
     # Get dispatch prods before runner in chronix
-    OldProdsDf = pd.read_csv(os.path.join(scenario_folder_path, 'prod_p.csv.bz2'), sep=';')
-    OldProdsForecastDf = pd.read_csv(os.path.join(scenario_folder_path, 'prod_p_forecasted.csv.bz2'), sep=';')
+    prod_p_path = find_chronics_file(os.path.join(scenario_folder_path, 'prod_p.csv.bz2'))
+    output_format = chronics_format(prod_p_path)
+    OldProdsDf = read_chronics(prod_p_path, sep=';')
+    OldProdsForecastDf = read_chronics(os.path.join(scenario_folder_path, 'prod_p_forecasted.csv.bz2'), sep=';')
 
     ##correction term
     newProdsDf = OldProdsDf
@@ -183,7 +189,8 @@ def correct_scenario_loss(scenario_folder_path, params_opf, grid_path, data_this
 
     # Log the correction
     CorrectionLosses_df = pd.DataFrame({'adjusted_loss_p':CorrectionLosses})
-    CorrectionLosses_df.to_csv(os.path.join(scenario_folder_path, 'adjusted_loss.csv.bz2'), sep=';', index = False)
+    write_chronics(CorrectionLosses_df, os.path.join(scenario_folder_path, 'adjusted_loss.csv.bz2'), output_format,
+                   float_format=None)
 
     # Check constraints
     violations_message, bool = check_slack_constraints(newProdsDf[slack_name], pmax, pmin, ramp_up, ramp_down)
@@ -197,17 +204,9 @@ def correct_scenario_loss(scenario_folder_path, params_opf, grid_path, data_this
 
 
     # Serialization
-    newProdsDf.to_csv(
-            os.path.join(scenario_folder_path, "prod_p.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-
-    newProdsForecastDf.to_csv(
-        os.path.join(scenario_folder_path, "prod_p_forecasted.csv.bz2"),
-        sep=';', index=False,
-        float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-    )
+    write_chronics(newProdsDf, os.path.join(scenario_folder_path, "prod_p.csv.bz2"), output_format)
+    write_chronics(newProdsForecastDf, os.path.join(scenario_folder_path, "prod_p_forecasted.csv.bz2"),
+                   output_format)
 
     print('---- end of loss correction ')
     return newProdsDf, newProdsForecastDf
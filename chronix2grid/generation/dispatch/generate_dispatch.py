@@ -13,8 +13,11 @@ import shutil
 import os
 import pathlib
 
+from chronix2grid import profiling
 
-def main(dispatcher, input_folder, output_folder, grid_folder, seed, params, params_opf,renewable_in_OPF=False):
+
+def main(dispatcher, input_folder, output_folder, grid_folder, seed, params, params_opf,renewable_in_OPF=False,
+         agent_results_path=None):
     """
 
     Parameters
@@ -31,6 +34,8 @@ def main(dispatcher, input_folder, output_folder, grid_folder, seed, params, par
         Random seed for parallel execution
     params_opf : dict
         Options for the OPF
+    agent_results_path : str, optional
+        The path of the directory in which the results of the loss simulation are written (see :func:`simulate_loss`)
 
     Returns
     -------
@@ -87,7 +92,9 @@ def main(dispatcher, input_folder, output_folder, grid_folder, seed, params, par
 
     is_dispatch_successful=(dispatcher.chronix_scenario.prods_dispatch is not None) and (len(dispatcher.chronix_scenario.prods_dispatch.columns)>=1)
     if params_opf["loss_grid2op_simulation"] and is_dispatch_successful:
-        new_prod_p, new_prod_forecasted_p = simulate_loss(grid_folder, output_folder, params_opf, write_results = True)
+        with profiling.stage('loss_simulation'):
+            new_prod_p, new_prod_forecasted_p = simulate_loss(grid_folder, output_folder, params_opf, write_results = True,
+                                                              agent_results_path=agent_results_path)
         dispatch_results = update_results_loss(dispatch_results, new_prod_p, params_opf)
 
     return dispatch_results
@@ -96,7 +103,7 @@ def update_results_loss(dispatch_results, new_prod_p, params_opf):
     dispatch_results[0].prods_dispatch[params_opf['nameSlack']] = new_prod_p[params_opf['nameSlack']]
     return dispatch_results
 
-def simulate_loss(input_folder, output_folder, params_opf, write_results = True):
+def simulate_loss(input_folder, output_folder, params_opf, write_results = True, agent_results_path=None):
     scenario_folder_path = output_folder
     grid_folder_g2op = input_folder
 
@@ -105,7 +112,8 @@ def simulate_loss(input_folder, output_folder, params_opf, write_results = True)
     grid_temporary_path=move_env_temporarily(scenario_folder_path, grid_folder_g2op)
 
     move_chronics_temporarily(scenario_folder_path, grid_temporary_path)
-    agent_results_path = str(pathlib.Path(scenario_folder_path).parent.parent)
+    if agent_results_path is None:
+        agent_results_path = str(pathlib.Path(scenario_folder_path).parent.parent)
     # try:
 
     episode_data = run_grid2op_simulation_donothing(grid_temporary_path, scenario_folder_path,write_results=write_results,agent_results_path=agent_results_path)
@@ -0,0 +1,105 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Hydro guide curves (seasonal min and max production of the hydro generators, in pu) compiled into lookup tables.
+
+The curves of a file (*e.g.* patterns/hydro_french.csv) do not depend on the year: each of their rows gives the bounds
+from its month, day, hour and minute until the next row. They are compiled once per process into one value per minute
+of a leap year, so that the constraints of a scenario are a single gather of the minutes of year of its time steps.
+Steps between two rows (or before the first row of the year) take the values of the previous row (of the end of the
+year), and the 29th of February takes the ones of the 28th when the curves have no such day.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+# minutes of year are counted in a leap year, so that a date has the same minute whatever its year
+MINUTES_PER_YEAR = 366 * MINUTES_PER_DAY
+_FIRST_DAY_OF_MONTH = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+def minute_of_year(datetimes):
+    """
+    Minute of (leap) year of each date of ``datetimes``, as an array of integers
+    """
+    datetimes = pd.DatetimeIndex(datetimes)
+    days = _FIRST_DAY_OF_MONTH[datetimes.month.values - 1] + datetimes.day.values - 1
+    return (days * MINUTES_PER_DAY + datetimes.hour.values * 60 + datetimes.minute.values).astype(np.int64)
+
+
+def _lookup_table(minutes, values):
+    # value of each minute of the year, held from the previous defined one (wrapping around the end of the year)
+    table = np.full(MINUTES_PER_YEAR, np.nan)
+    table[minutes] = values
+    defined = ~np.isnan(table)
+    if not defined.any():
+        return table
+    last_defined = np.maximum.accumulate(np.where(defined, np.arange(MINUTES_PER_YEAR), -1))
+    last_defined[last_defined < 0] = np.flatnonzero(defined)[-1]
+    table = table[last_defined]
+    table.setflags(write=False)
+    return table
+
+
+class HydroGuideCurves:
+    """
+    Min and max hydro guide curves read from a file, with their lookup tables
+
+    Parameters
+    ----------
+    minutes: :class:`numpy.ndarray`
+        minute of year of each row of the file
+    p_min_pu, p_max_pu: :class:`numpy.ndarray`
+        min and max production (pu) of each row of the file
+    """
+    def __init__(self, minutes, p_min_pu, p_max_pu):
+        self.minutes = np.asarray(minutes, dtype=np.int64)
+        self.p_min_pu = np.asarray(p_min_pu, dtype=float)
+        self.p_max_pu = np.asarray(p_max_pu, dtype=float)
+        self.min_table = _lookup_table(self.minutes, self.p_min_pu)
+        self.max_table = _lookup_table(self.minutes, self.p_max_pu)
+
+    @classmethod
+    def from_csv(cls, hydro_file_path):
+        """
+        Reads the curves of a csv file whose first column is the date (%Y-%m-%d %H:%M) and third and fourth ones
+        the min and max production (pu)
+        """
+        hydro_pattern = pd.read_csv(hydro_file_path, usecols=[0, 2, 3])
+        dates = pd.to_datetime(hydro_pattern.iloc[:, 0], format='%Y-%m-%d %H:%M')
+        return cls(minute_of_year(dates), hydro_pattern['p_min_u'].values, hydro_pattern['p_max_u'].values)
+
+    def lookup(self, datetimes):
+        """
+        Min and max production (pu) at each date of ``datetimes``
+
+        Returns
+        -------
+        p_min_pu, p_max_pu: :class:`numpy.ndarray`
+        """
+        minutes = minute_of_year(datetimes)
+        return self.min_table[minutes], self.max_table[minutes]
+
+
+# curves read by this process, by file (each worker of a multi-processing run has its own)
+_GUIDE_CURVES = {}
+
+
+def read_hydro_guide_curves(hydro_file_path):
+    """
+    :class:`HydroGuideCurves` of ``hydro_file_path``, read and compiled once per process (again if the file changes)
+    """
+    stat = os.stat(hydro_file_path)
+    key = (os.path.abspath(hydro_file_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _GUIDE_CURVES:
+        _GUIDE_CURVES[key] = HydroGuideCurves.from_csv(hydro_file_path)
+    return _GUIDE_CURVES[key]
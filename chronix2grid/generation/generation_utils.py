@@ -32,6 +32,55 @@ def make_generation_input_output_directories(input_folder, case, year, output_fo
     return dispatch_input_folder, dispatch_input_folder_case, dispatch_output_folder
 
 
+class CoarseNoiseField:
+    """
+    Coarse noise of :func:`generate_coarse_noise` only materialised at the cells of the mesh that are read.
+
+    The time series of the cell (ix, iy) is drawn by a counter-based generator (Philox) whose key only depends on the
+    seed of the field and on (ix, iy): the noise is reproducible whatever the cells used before, and its memory and
+    computation time grow with the number of sites instead of the size of the mesh. It is indexed like the 3D array
+    of the dense noise (``noise[x_indices, y_indices, :]``) by :func:`interpolate_noise_batch`.
+
+    Attributes
+    ----------
+    seed: ``int``
+        seed of the field
+    shape: ``tuple``
+        shape of the equivalent dense noise (the last dimension being the time)
+    """
+    def __init__(self, seed, shape):
+        self.seed = int(seed)
+        self.shape = tuple(int(dim) for dim in shape)
+        self._cells = {}
+
+    @property
+    def n_cells(self):
+        """
+        Number of cells materialised
+        """
+        return len(self._cells)
+
+    def cell(self, ix, iy):
+        """
+        Time series of the cell (ix, iy)
+        """
+        key = (int(ix), int(iy))
+        values = self._cells.get(key)
+        if values is None:
+            # the cell is a 64 bits word of the key, coordinates are taken modulo 2**32
+            cell_word = ((key[0] & 0xFFFFFFFF) << 32) | (key[1] & 0xFFFFFFFF)
+            bit_generator = np.random.Philox(key=np.array([self.seed, cell_word], dtype=np.uint64))
+            values = np.random.Generator(bit_generator).standard_normal(self.shape[2])
+            self._cells[key] = values
+        return values
+
+    def __getitem__(self, index):
+        ix, iy, time_index = index
+        ix, iy = np.broadcast_arrays(np.atleast_1d(ix), np.atleast_1d(iy))
+        output = np.stack([self.cell(x, y) for x, y in zip(ix.ravel(), iy.ravel())])
+        return output.reshape(ix.shape + (self.shape[2],))[..., time_index]
+
+
 def generate_coarse_noise(prng, params, data_type, add_dim):
     """
     This function generates a spatially and temporally correlated noise.
@@ -39,12 +88,15 @@ def generate_coarse_noise(prng, params, data_type, add_dim):
     a too fine mesh, we recommend to first compute a correlated signal
     on a coarse mesh, and then use the interpolation function.
 
+    If *lazy_noise* is set (non zero) in params, the noise is a :class:`CoarseNoiseField` seeded by prng, whose cells
+    are only drawn when they are used. It does not give the same noise as the dense mesh for the same seed.
+
     Input:
         params: (dict) Defines the mesh dimensions and
             precision. Also define the correlation scales
 
     Output:
-        (np.array) 3D autocorrelated noise
+        (np.array or CoarseNoiseField) 3D autocorrelated noise
     """
 
     # Get computation domain size
@@ -62,6 +114,9 @@ def generate_coarse_noise(prng, params, data_type, add_dim):
     Ny_comp = int(Ly // dy_corr + 1) + add_dim
     Nt_comp = int(T // dt_corr + 1) + add_dim
 
+    if params.get('lazy_noise', 0):
+        return CoarseNoiseField(prng.integers(2**63), (Nx_comp, Ny_comp, Nt_comp))
+
     # Generate gaussian noise input·
     #output = np.random.normal(0, 1, (Nx_comp, Ny_comp, Nt_comp))
     output = prng.normal(0, 1, (Nx_comp, Ny_comp, Nt_comp))
@@ -81,6 +136,45 @@ def interpolate_noise(computation_noise, params, locations, time_scale, add_dim)
     Output:
         (dict of np.array) returns one time series per location mentioned in dict locations
     """
+    output = interpolate_noise_batch(computation_noise, params,
+                                     np.asarray(locations, dtype=float).reshape(1, 2),
+                                     time_scale, add_dim)
+    return output[0]
+
+
+def interpolate_noise_batch(computation_noise, params, locations, time_scale, add_dim):
+    """
+    Vectorized version of :func:`interpolate_noise` for several sites at once.
+
+    The spatial inverse-distance weighting is done with one gather on the coarse mesh for
+    all the sites, and a single temporal spline is then fitted along the time axis.
+
+    Input:
+        computation_noise: (np.array or CoarseNoiseField) Autocorrelated signal computed on a coarse mesh
+        params: (dict) Defines the mesh dimensions and
+            precision. Also define the correlation scales
+        locations: (np.array) (N, 2) array with the x and y coordinates of the N points of interest
+
+    Output:
+        (np.array) (N, Nt_inter) array with one time series per location
+    """
+    return interpolate_noises([computation_noise], params, locations, time_scale, add_dim)[0]
+
+
+def interpolate_noises(computation_noises, params, locations, time_scale, add_dim):
+    """
+    Version of :func:`interpolate_noise_batch` for the noises of several scenarios at once (the same sites in each
+    of them): the temporal spline of all the sites of all the scenarios is fitted in a single pass.
+
+    Input:
+        computation_noises: (list) B autocorrelated signals computed on a coarse mesh (np.array or CoarseNoiseField)
+        params: (dict) Defines the mesh dimensions and
+            precision. Also define the correlation scales
+        locations: (np.array) (N, 2) array with the x and y coordinates of the N points of interest
+
+    Output:
+        (np.array) (B, N, Nt_inter) array with one time series per noise and per location
+    """
 
     # Get computation domain size
     Lx = params['Lx']
@@ -104,40 +198,42 @@ def interpolate_noise(computation_noise, params, locations, time_scale, add_dim)
     Nt_inter = T // dt + 1
 
     # Get coordinates
-    x, y = locations
+    locations = np.asarray(locations, dtype=float).reshape(-1, 2)
+    x = locations[:, 0]
+    y = locations[:, 1]
 
     # Get coordinates of closest points in the coarse mesh
-    x_minus = int(x // dx_corr)
-    x_plus = int(x // dx_corr + 1)
-    y_minus = int(y // dy_corr)
-    y_plus = int(y // dy_corr + 1)
+    x_minus = (x // dx_corr).astype(int)
+    x_plus = (x // dx_corr + 1).astype(int)
+    y_minus = (y // dy_corr).astype(int)
+    y_plus = (y // dy_corr + 1).astype(int)
 
     # 1st step : spatial interpolation
 
     # Initialize output
-    output = np.zeros(Nt_comp)
-
-    # Initialize sum of distances
-    dist_tot = 0
+    n_noises = len(computation_noises)
+    output = np.zeros((n_noises, locations.shape[0], Nt_comp))
 
     # For every close point, add the corresponding time series, weighted by the inverse
     # of the distance between them
+    dist_tot = np.zeros(locations.shape[0])
     for x_neighbor in [x_minus, x_plus]:
         for y_neighbor in [y_minus, y_plus]:
             dist = 1 / (np.sqrt((x - dx_corr * x_neighbor) ** 2 + (y - dy_corr * y_neighbor) ** 2) + 1)
-            output += dist * computation_noise[x_neighbor, y_neighbor, :]
+            for noise_id, computation_noise in enumerate(computation_noises):
+                output[noise_id] += dist.reshape(-1, 1) * computation_noise[x_neighbor, y_neighbor, :]
             dist_tot += dist
-    output /= dist_tot
+    output /= dist_tot.reshape(1, -1, 1)
 
     # 2nd step : temporal quadratic interpolation
     t_comp = np.linspace(0, int(T), int(Nt_comp), endpoint=True)
     t_inter = np.linspace(0, int(T), int(Nt_inter), endpoint=True)
     if Nt_comp == 2:
-        f2 = interp1d(t_comp, output, kind='linear')
+        f2 = interp1d(t_comp, output, kind='linear', axis=2)
     elif Nt_comp == 3:
-        f2 = interp1d(t_comp, output, kind='quadratic')
+        f2 = interp1d(t_comp, output, kind='quadratic', axis=2)
     elif Nt_comp > 3:
-        f2 = interp1d(t_comp, output, kind='cubic')
+        f2 = interp1d(t_comp, output, kind='cubic', axis=2)
 
     if Nt_comp >= 2:
         output = f2(t_inter)
@@ -148,6 +244,16 @@ def natural_keys(text):
     return int([ c for c in re.split('(\d+)', text) ][1])
 
 
+def shift_values(values):
+    """
+    Shifts the chronics one step backward and fills the last step with 0.
+    """
+    shifted = np.zeros_like(values)
+    shifted[:-1] = values[1:]
+    shifted[np.isnan(shifted)] = 0.
+    return shifted
+
+
 def time_parameters(weeks, start_date):
     result = dict()
     start_date = pd.to_datetime(start_date, format='%Y-%m-%d')
@@ -12,7 +12,8 @@ from .generate_loss import main
 class LossBackend:
     """
     Backend that generates loss simply based on a provided yearly pattern.
-    The API provides user the ability to use power consumption, wind and solar productions as input for more complex loss modeling
+    The API provides user the ability to use power consumption, wind and solar productions as input for more complex loss modeling,
+    such as the :class:`chronix2grid.generation.loss.loss_surrogate.LossSurrogate` fitted on simulated losses of the grid
 
     Attributes
     ----------
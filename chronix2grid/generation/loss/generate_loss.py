@@ -11,6 +11,10 @@ import datetime as dt
 import pandas as pd
 import copy
 
+import chronix2grid.constants as cst
+from chronix2grid.chronics_io import write_chronics
+from .loss_surrogate import LossSurrogate
+
 def main(input_folder, output_folder, load, prod_solar, prod_wind, params, params_loss, write_results = True):
     """
     :param input_folder (str): input folder in which pattern folder can be found
@@ -24,10 +28,14 @@ def main(input_folder, output_folder, load, prod_solar, prod_wind, params, param
     :return: pandas.Series representing provided  loss chronic
     """
 
-    loss_pattern_path = os.path.join(input_folder, 'patterns', params_loss["loss_pattern"])
-    loss = generate_valid_loss(loss_pattern_path, params)
+    if params_loss.get("loss_surrogate"):
+        loss = LossSurrogate.load(params_loss["loss_surrogate"]).predict(load, prod_solar, prod_wind)
+    else:
+        loss_pattern_path = os.path.join(input_folder, 'patterns', params_loss["loss_pattern"])
+        loss = generate_valid_loss(loss_pattern_path, params)
     if write_results:
-        loss.to_csv(os.path.join(output_folder,'loss.csv.bz2'), sep = ';')
+        write_chronics(loss, os.path.join(output_folder, 'loss.csv.bz2'),
+                       params.get('output_format', cst.DEFAULT_OUTPUT_FORMAT), index=True, float_format=None)
     return loss
 
 def generate_valid_loss(loss_pattern_path, params):
@@ -0,0 +1,187 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Surrogate of the losses of a grid, fitted on simulated scenarios.
+
+Losses of a transmission grid are close to a quadratic function of the flows, which are linear in the injections.
+The surrogate is a ridge regression of the losses of each time step on the injections aggregated by group
+(load of each zone, total solar, total wind) and on their products two by two. It only needs the load and the renewable
+productions, so it gives the losses before the dispatch is computed.
+"""
+
+import itertools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.chronics_io import read_chronics
+
+LOSS_SURROGATE_FILE_NAME = 'loss_surrogate.json'
+
+
+class LossSurrogate:
+    """
+    Quadratic regression of the losses (MW) of a grid on its injections aggregated by group
+
+    Parameters
+    ----------
+    load_groups: ``dict``
+        name of each group of loads (*e.g.* zones) -> names of its loads. All the loads form one group if None
+    alpha: ``float``
+        ridge regularization of the (standardized) features
+
+    Attributes
+    ----------
+    coefficients: :class:`numpy.ndarray`
+        intercept then coefficients of the features
+    scores: ``dict``
+        mean absolute error and max absolute error (MW) of the fitted surrogate on its training data, and number of steps
+    """
+    def __init__(self, load_groups=None, alpha=1e-6):
+        self.load_groups = None if load_groups is None else {str(name): list(loads) for name, loads in load_groups.items()}
+        self.alpha = alpha
+        self.coefficients = None
+        self.feature_mean = None
+        self.feature_std = None
+        self.scores = {}
+
+    @classmethod
+    def from_loads_charac(cls, loads_charac, alpha=1e-6):
+        """
+        Surrogate with a group of loads per zone of ``loads_charac`` (columns *name* and *zone*)
+        """
+        load_groups = {zone: list(loads['name']) for zone, loads in loads_charac.groupby('zone')}
+        return cls(load_groups=load_groups, alpha=alpha)
+
+    def _injections(self, load, prod_solar, prod_wind):
+        if self.load_groups is None:
+            injections = {'load': load.sum(axis=1).values}
+        else:
+            injections = {f'load_{name}': load[loads].sum(axis=1).values for name, loads in self.load_groups.items()}
+        injections['solar'] = np.zeros(load.shape[0]) if prod_solar is None else prod_solar.sum(axis=1).values
+        injections['wind'] = np.zeros(load.shape[0]) if prod_wind is None else prod_wind.sum(axis=1).values
+        return injections
+
+    def feature_names(self):
+        names = ['load'] if self.load_groups is None else [f'load_{name}' for name in self.load_groups]
+        names += ['solar', 'wind']
+        return names + [f'{first}*{second}' for first, second in itertools.combinations_with_replacement(names, 2)]
+
+    def features(self, load, prod_solar, prod_wind):
+        """
+        Features of each time step: injections of each group and their products two by two (in GW)
+        """
+        injections = self._injections(load, prod_solar, prod_wind)
+        linear = [values / 1000. for values in injections.values()]
+        quadratic = [first * second for first, second in itertools.combinations_with_replacement(linear, 2)]
+        return np.column_stack(linear + quadratic)
+
+    def fit(self, load, prod_solar, prod_wind, loss):
+        """
+        Fits the surrogate on simulated losses
+
+        Parameters
+        ----------
+        load: :class:`pandas.DataFrame`
+            consumption of each load at each time step
+        prod_solar, prod_wind: :class:`pandas.DataFrame`
+            production of each solar and wind generator at each time step
+        loss: array
+            losses at each time step
+        """
+        features = self.features(load, prod_solar, prod_wind)
+        loss = np.asarray(loss, dtype=float)
+        valid = np.all(np.isfinite(features), axis=1) & np.isfinite(loss)
+        if not np.any(valid):
+            raise RuntimeError("No valid time step to fit the loss surrogate on")
+        features, loss = features[valid], loss[valid]
+        self.feature_mean = features.mean(axis=0)
+        self.feature_std = features.std(axis=0)
+        self.feature_std[self.feature_std == 0.] = 1.  # constant features (e.g. no solar)
+        standardized = np.column_stack([np.ones(features.shape[0]),
+                                        (features - self.feature_mean) / self.feature_std])
+        penalty = self.alpha * np.eye(standardized.shape[1])
+        penalty[0, 0] = 0.  # no regularization of the intercept
+        self.coefficients = np.linalg.solve(standardized.T @ standardized + features.shape[0] * penalty,
+                                            standardized.T @ loss)
+        errors = np.abs(standardized @ self.coefficients - loss)
+        self.scores = {'mae': float(errors.mean()), 'max_error': float(errors.max()), 'n_steps': int(loss.shape[0])}
+        return self
+
+    def predict(self, load, prod_solar=None, prod_wind=None):
+        """
+        Losses at each time step of ``load`` (:class:`pandas.Series` with the same index)
+        """
+        if self.coefficients is None:
+            raise RuntimeError("The loss surrogate has to be fitted before it can predict losses")
+        standardized = (self.features(load, prod_solar, prod_wind) - self.feature_mean) / self.feature_std
+        loss = self.coefficients[0] + standardized @ self.coefficients[1:]
+        return pd.Series(loss, index=load.index, name='loss')
+
+    def fit_scenarios(self, scenario_folders, prods_charac):
+        """
+        Fits the surrogate on scenarios whose losses have been simulated (by *loss_grid2op_simulation* or
+        :func:`chronix2grid.grid2op_utils.utils.handle_losses`): their losses are the difference between the
+        total production in *prod_p* and the total consumption in *load_p*
+
+        Parameters
+        ----------
+        scenario_folders: ``list``
+            folders of the scenarios
+        prods_charac: :class:`pandas.DataFrame`
+            characteristics of the generators of the grid (columns *name* and *type*)
+        """
+        solar_names = list(prods_charac.loc[prods_charac['type'] == 'solar', 'name'])
+        wind_names = list(prods_charac.loc[prods_charac['type'] == 'wind', 'name'])
+        loads, solars, winds, losses = [], [], [], []
+        for folder in scenario_folders:
+            load = read_chronics(os.path.join(folder, 'load_p.csv.bz2'), sep=';')
+            prod = read_chronics(os.path.join(folder, 'prod_p.csv.bz2'), sep=';')
+            loads.append(load)
+            solars.append(prod[[name for name in solar_names if name in prod.columns]])
+            winds.append(prod[[name for name in wind_names if name in prod.columns]])
+            losses.append(prod.sum(axis=1).values - load.sum(axis=1).values)
+        return self.fit(pd.concat(loads, ignore_index=True),
+                        pd.concat(solars, ignore_index=True),
+                        pd.concat(winds, ignore_index=True),
+                        np.concatenate(losses))
+
+    def save(self, path):
+        """
+        Writes the fitted surrogate in json at ``path`` (a folder of a case to use the default file name)
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, LOSS_SURROGATE_FILE_NAME)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'load_groups': self.load_groups,
+                       'alpha': self.alpha,
+                       'features': self.feature_names(),
+                       'coefficients': self.coefficients.tolist(),
+                       'feature_mean': self.feature_mean.tolist(),
+                       'feature_std': self.feature_std.tolist(),
+                       'scores': self.scores}, f, indent=1)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a surrogate written by :meth:`save` (``path`` can be the folder of the case)
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, LOSS_SURROGATE_FILE_NAME)
+        with open(path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+        surrogate = cls(load_groups=content['load_groups'], alpha=content['alpha'])
+        surrogate.coefficients = np.array(content['coefficients'])
+        surrogate.feature_mean = np.array(content['feature_mean'])
+        surrogate.feature_std = np.array(content['feature_std'])
+        surrogate.scores = content.get('scores', {})
+        return surrogate
@@ -0,0 +1,89 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Cache of the deterministic patterns of the load and renewable generation.
+
+The interpolated weekly load pattern, the interpolated yearly solar pattern and the seasonal patterns only depend
+on the pattern read in the case (its *source*), on the period of the scenario and, for the load, on the week of
+the pattern used by the node. They are computed once per process and shared (read-only) by all the nodes and all the
+scenarios of this process, the least recently used ones being dropped when there are more than
+:attr:`PatternCache.maxsize` of them.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+def pattern_source(pattern):
+    """
+    Identifier of the content of a pattern (:class:`numpy.ndarray`), to be used in the keys of the cache
+    """
+    pattern = np.ascontiguousarray(pattern)
+    return hashlib.blake2b(pattern.tobytes(), digest_size=16).hexdigest() + str(pattern.shape)
+
+
+def period_key(params):
+    """
+    Part of the keys of the cache describing the period of a scenario (start_date, end_date, dt, T)
+    """
+    return str(params['start_date']), str(params['end_date']), int(params['dt']), int(params['T'])
+
+
+class PatternCache:
+    """
+    Least recently used cache of read-only arrays
+
+    Parameters
+    ----------
+    maxsize: ``int``
+        maximum number of arrays kept
+
+    Attributes
+    ----------
+    hits, misses: ``int``
+        number of arrays found in the cache / computed
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._patterns = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def get(self, key, compute):
+        """
+        Returns the array of ``key``, computed by ``compute()`` if it is not in the cache. The array is read-only as it is
+        shared by all its users.
+        """
+        try:
+            pattern = self._patterns[key]
+        except KeyError:
+            self.misses += 1
+            pattern = np.asarray(compute())
+            pattern.setflags(write=False)
+            self._patterns[key] = pattern
+            while len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)
+        else:
+            self.hits += 1
+            self._patterns.move_to_end(key)
+        return pattern
+
+    def clear(self):
+        self._patterns.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# cache of the process (each worker of a multi-processing run has its own)
+PATTERN_CACHE = PatternCache()
@@ -6,7 +6,7 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
-from .generate_solar_wind import main
+from .generate_solar_wind import main, main_batch
 
 
 class RenewableBackend:
@@ -45,3 +45,18 @@ class RenewableBackend:
         if solar_pattern is None:
             solar_pattern = self.res_config_manager.read_specific()
         return main(self.out_path, self.seed, self.params, self.loads_charac, solar_pattern, self.write_results)
+
+    @classmethod
+    def run_batch(cls, out_paths, seeds, params, prods_charac, res_config_manager, write_results, solar_pattern=None):
+        """
+        Runs the generation model of several scenarios at once (one out_path and one seed per scenario) with
+        ``chronix2grid.generation.renewable.generate_solar_wind.main_batch`` and writes the chronics of each scenario
+
+        Returns
+        -------
+        ``list``
+            (prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted) of each scenario
+        """
+        if solar_pattern is None:
+            solar_pattern = res_config_manager.read_specific()
+        return main_batch(out_paths, seeds, params, prods_charac, solar_pattern, write_results)
@@ -17,7 +17,11 @@ from numpy.random import default_rng
 # Libraries developed for this module
 from . import solar_wind_utils as swutils
 from .. import generation_utils as utils
+from ..chronics_block import ChronicsBlock
 import chronix2grid.constants as cst
+from chronix2grid.chronics_io import write_chronics
+from chronix2grid import profiling
+from chronix2grid.generation.pattern_cache import pattern_source
 
 
 def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, write_results = True):
@@ -42,8 +46,28 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
     pandas.DataFrame: wind production chronics generated at every node with additional gaussian noise
     pandas.DataFrame: wind production chronics forecasted for the scenario without additional gaussian noise
     """
+    return main_batch([scenario_destination_path], [seed], params, prods_charac, solar_pattern, write_results)[0]
 
-    prng = default_rng(seed)
+
+def main_batch(scenario_destination_paths, seeds, params, prods_charac, solar_pattern, write_results=True):
+    """
+    Solar and wind generation of several scenarios at once: same as :func:`main` for each
+    (scenario_destination_path, seed), but the interpolation of the noises and the patterns are computed for all the
+    scenarios in one vectorized pass. The noises of each scenario are drawn with its own seed, and its chronics are
+    written at the end.
+
+    Parameters
+    ----------
+    scenario_destination_paths (list): Path of output directory of each scenario
+    seeds (list): random seed of each scenario
+    params, prods_charac, solar_pattern, write_results: see :func:`main`
+
+    Returns
+    -------
+    list: (prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted) of each scenario
+    """
+
+    prngs = [default_rng(seed) for seed in seeds]
     #np.random.seed(seed) #olver version - to be removed
     smoothdist = params['smoothdist']
 
@@ -51,11 +75,13 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
     datetime_index = pd.date_range(
         start=params['start_date'],
         end=params['end_date'],
-        freq=str(params['dt']) + 'min')
+        freq=str(params['dt']) + 'min',
+        name='datetime')
 
     # Solar_pattern management
     # Extra value (resolution 1H, 8761)
     solar_pattern = solar_pattern[:-1]
+    solar_pattern_id = pattern_source(solar_pattern)
 
     # Realistic first day of year: have to roll the pattern to fit first day of week
     # start_date = params['start_date']
@@ -69,6 +95,66 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
     # Generate GLOBAL temperature noise
     print('Computing global auto-correlated spatio-temporal noise for sun and wind...')
     scale_solar_coord_for_correlation = float(params["scale_solar_coord_for_correlation"]) if "scale_solar_coord_for_correlation" in params else None
+    add_dim = compute_add_dim(params, prods_charac, scale_solar_coord_for_correlation)
+
+    with profiling.stage('noise'):
+        solar_noises, long_scale_wind_noises, medium_scale_wind_noises, short_scale_wind_noises = [], [], [], []
+        for prng in prngs:
+            solar_noises.append(utils.generate_coarse_noise(prng, params, 'solar', add_dim=add_dim))
+            long_scale_wind_noises.append(utils.generate_coarse_noise(prng, params, 'long_wind', add_dim=add_dim))
+            medium_scale_wind_noises.append(utils.generate_coarse_noise(prng, params, 'medium_wind', add_dim=add_dim))
+            short_scale_wind_noises.append(utils.generate_coarse_noise(prng, params, 'short_wind', add_dim=add_dim))
+
+    # Interpolate the noises at every solar and wind generator of every scenario in one pass
+    is_solar = (prods_charac['type'] == 'solar').values
+    is_wind = (prods_charac['type'] == 'wind').values
+    solar_locations = prods_charac.loc[is_solar, ['x', 'y']].values.astype(float)
+    if scale_solar_coord_for_correlation is not None:
+        solar_locations = scale_solar_coord_for_correlation * solar_locations
+    wind_locations = prods_charac.loc[is_wind, ['x', 'y']].values
+    with profiling.stage('interpolation'):
+        solar_signals = utils.interpolate_noises(solar_noises, params, solar_locations,
+                                                 time_scale=params['solar_corr'], add_dim=add_dim)
+        long_scale_wind_signals = utils.interpolate_noises(long_scale_wind_noises, params, wind_locations,
+                                                           time_scale=params['long_wind_corr'], add_dim=add_dim)
+        medium_scale_wind_signals = utils.interpolate_noises(medium_scale_wind_noises, params, wind_locations,
+                                                             time_scale=params['medium_wind_corr'], add_dim=add_dim)
+        short_scale_wind_signals = utils.interpolate_noises(short_scale_wind_noises, params, wind_locations,
+                                                            time_scale=params['short_wind_corr'], add_dim=add_dim)
+
+    # Compute Wind and solar series of the scenarios, with a (scenario, generator, time) shape
+    print('Generating solar and wind production chronics')
+    solar_Pmax = prods_charac.loc[is_solar, 'Pmax'].values.reshape(-1, 1)
+    wind_Pmax = prods_charac.loc[is_wind, 'Pmax'].values.reshape(-1, 1)
+    all_solar_series = swutils.compute_solar_series_from_noise(solar_Pmax, solar_signals, params, solar_pattern,
+                                                               pattern_id=solar_pattern_id)
+    smooth_noises = np.stack([prng.uniform(0, smoothdist, long_scale_wind_signals.shape[1:]) for prng in prngs])
+    all_wind_series = swutils.compute_wind_series_from_signals(wind_Pmax,
+                                                               long_scale_wind_signals,
+                                                               medium_scale_wind_signals,
+                                                               short_scale_wind_signals,
+                                                               smooth_noises,
+                                                               params)
+
+    solar_names = prods_charac.loc[is_solar, 'name']
+    wind_names = prods_charac.loc[is_wind, 'name']
+    results = []
+    for prng, solar_series, wind_series, scenario_destination_path in zip(prngs, all_solar_series, all_wind_series,
+                                                                          scenario_destination_paths):
+        prods_series = ChronicsBlock.from_names(datetime_index, prods_charac.loc[is_solar | is_wind, 'name'])
+        for name, series in zip(solar_names, solar_series):
+            prods_series[name] = series
+        for name, series in zip(wind_names, wind_series):
+            prods_series[name] = series
+        results.append(save_prods(prng, prods_series, prods_charac, scenario_destination_path, params,
+                                  write_results))
+    return results
+
+
+def compute_add_dim(params, prods_charac, scale_solar_coord_for_correlation=None):
+    """
+    Number of cells added to the coarse mesh of the noises so that every generator is inside it
+    """
     add_dim = 0
     dx_corr = int(params['dx_corr'])
     dy_corr = int(params['dy_corr'])
@@ -80,61 +166,28 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
         y_plus = int(y // dy_corr + 1)
         add_dim = max(y_plus, add_dim)
         add_dim = max(x_plus, add_dim)
+    return add_dim
 
-    solar_noise = utils.generate_coarse_noise(prng, params, 'solar', add_dim=add_dim)
-    long_scale_wind_noise = utils.generate_coarse_noise(prng, params, 'long_wind', add_dim=add_dim)
-    medium_scale_wind_noise = utils.generate_coarse_noise(prng, params, 'medium_wind', add_dim=add_dim)
-    short_scale_wind_noise = utils.generate_coarse_noise(prng, params, 'short_wind', add_dim=add_dim)
 
-    # Compute Wind and solar series of scenario
-    print('Generating solar and wind production chronics')
-    prods_series = {}
-    for name in prods_charac['name']:
-        mask = (prods_charac['name'] == name)
-        if prods_charac[mask]['type'].values == 'solar':
-            locations = [prods_charac[mask]['x'].values[0], prods_charac[mask]['y'].values[0]]
-            Pmax = prods_charac[mask]['Pmax'].values[0]
-            prods_series[name] = swutils.compute_solar_series(
-                prng,
-                locations,
-                Pmax,
-                solar_noise,
-                params, solar_pattern, smoothdist,
-                time_scale=params['solar_corr'],
-                add_dim=add_dim,
-                scale_solar_coord_for_correlation=scale_solar_coord_for_correlation)
-
-        elif prods_charac[mask]['type'].values == 'wind':
-            locations = [prods_charac[mask]['x'].values[0], prods_charac[mask]['y'].values[0]]
-            Pmax = prods_charac[mask]['Pmax'].values[0]
-            prods_series[name] = swutils.compute_wind_series(
-                prng,
-                locations,
-                Pmax,
-                long_scale_wind_noise,
-                medium_scale_wind_noise,
-                short_scale_wind_noise,
-                params, smoothdist,
-                add_dim=add_dim)
+def save_prods(prng, prods_series, prods_charac, scenario_destination_path, params, write_results=True):
+    """
+    Adds the noise of the realized productions (drawn with prng) and writes the chronics of a scenario
 
+    Returns
+    -------
+    pandas.DataFrame: solar production chronics generated at every node with additional gaussian noise
+    pandas.DataFrame: solar production chronics forecasted for the scenario without additional gaussian noise
+    pandas.DataFrame: wind production chronics generated at every node with additional gaussian noise
+    pandas.DataFrame: wind production chronics forecasted for the scenario without additional gaussian noise
+    """
     # Séparation ds séries solaires et éoliennes
-    solar_series = {}
-    wind_series = {}
-    for name in prods_charac['name']:
-        mask = (prods_charac['name'] == name)
-        if prods_charac[mask]['type'].values == 'solar':
-            solar_series[name] = prods_series[name]
-        elif prods_charac[mask]['type'].values == 'wind':
-            wind_series[name] = prods_series[name]
-
-    # Time index
-    prods_series['datetime'] = datetime_index
-    solar_series['datetime'] = datetime_index
-    wind_series['datetime'] = datetime_index
+    solar_series = prods_series.select(prods_charac.loc[prods_charac['type'] == 'solar', 'name'])
+    wind_series = prods_series.select(prods_charac.loc[prods_charac['type'] == 'wind', 'name'])
 
     # Save files
+    output_format = params.get('output_format', cst.DEFAULT_OUTPUT_FORMAT)
     if scenario_destination_path is not None:
-        print('Saving files in zipped csv')
+        print('Saving files in {}'.format(output_format))
         if not os.path.exists(scenario_destination_path):
             os.makedirs(scenario_destination_path)
             
@@ -145,7 +198,8 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
         reordering=True,
         shift=True,
         write_results=write_results,
-        index=False
+        index=False,
+        output_format=output_format
     )
 
     prod_solar = swutils.create_csv(
@@ -154,7 +208,8 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
         os.path.join(scenario_destination_path, 'solar_p.csv.bz2') if scenario_destination_path is not None else None,
         reordering=True,
         noise=params['planned_std'],
-        write_results=write_results
+        write_results=write_results,
+        output_format=output_format
     )
 
     prod_wind_forecasted = swutils.create_csv(
@@ -164,7 +219,8 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
         reordering=True,
         shift=True,
         write_results=write_results,
-        index=False
+        index=False,
+        output_format=output_format
     )
 
     prod_wind = swutils.create_csv(
@@ -172,7 +228,8 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
         wind_series, os.path.join(scenario_destination_path, 'wind_p.csv.bz2') if scenario_destination_path is not None else None,
         reordering=True,
         noise=params['planned_std'],
-        write_results=write_results
+        write_results=write_results,
+        output_format=output_format
     )
 
     prod_p = swutils.create_csv(
@@ -180,21 +237,19 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern, w
         prods_series, os.path.join(scenario_destination_path, 'prod_p.csv.bz2') if scenario_destination_path is not None else None,
         reordering=True,
         noise=params['planned_std'],
-        write_results=write_results
+        write_results=write_results,
+        output_format=output_format
     )
 
-    prod_v = prods_charac[['name', 'V']].set_index('name')
-    prod_v = prod_v.T
-    prod_v.index = [0]
-    prod_v = prod_v.reindex(range(len(prod_p)))
-    prod_v = prod_v.fillna(method='ffill') * 1.04
+    prod_v = pd.DataFrame(np.repeat(prods_charac['V'].values.reshape(1, -1), len(prod_p), axis=0) * 1.04,
+                          columns=prods_charac['name'].values)
     
     if write_results:
-        prod_v.to_csv(
+        write_chronics(
+            prod_v,
             os.path.join(scenario_destination_path, 'prod_v.csv.bz2') if scenario_destination_path is not None else None,
-            sep=';',
-            index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
+            output_format,
+            index=False
         )
 
     return prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted
\ No newline at end of file
@@ -13,35 +13,51 @@ import pandas as pd
 from scipy.interpolate import interp1d
 
 from .. import generation_utils as utils
+from ..chronics_block import ChronicsBlock
 import chronix2grid.constants as cst
+from chronix2grid.chronics_io import write_chronics
+from chronix2grid.generation.pattern_cache import PATTERN_CACHE, pattern_source, period_key
+
+def compute_wind_series(prng, locations, Pmax, long_noise, medium_noise, short_noise, params, smoothdist, add_dim,
+                        long_scale_signal=None, medium_scale_signal=None, short_scale_signal=None):
+    # Compute refined signals (unless they have already been interpolated for all the generators)
+    if long_scale_signal is None:
+        long_scale_signal = utils.interpolate_noise(
+            long_noise,
+            params,
+            locations,
+            time_scale=params['long_wind_corr'],
+            add_dim=add_dim)
+    if medium_scale_signal is None:
+        medium_scale_signal = utils.interpolate_noise(
+            medium_noise,
+            params,
+            locations,
+            time_scale=params['medium_wind_corr'],
+            add_dim=add_dim)
+    if short_scale_signal is None:
+        short_scale_signal = utils.interpolate_noise(
+            short_noise,
+            params,
+            locations,
+            time_scale=params['short_wind_corr'],
+            add_dim=add_dim)
 
-def compute_wind_series(prng, locations, Pmax, long_noise, medium_noise, short_noise, params, smoothdist, add_dim):
-    # Compute refined signals
-    long_scale_signal = utils.interpolate_noise(
-        long_noise,
-        params,
-        locations,
-        time_scale=params['long_wind_corr'],
-        add_dim=add_dim)
-    medium_scale_signal = utils.interpolate_noise(
-        medium_noise,
-        params,
-        locations,
-        time_scale=params['medium_wind_corr'],
-        add_dim=add_dim)
-    short_scale_signal = utils.interpolate_noise(
-        short_noise,
-        params,
-        locations,
-        time_scale=params['short_wind_corr'],
-        add_dim=add_dim)
-
-    # Compute seasonal pattern
-    Nt_inter = int(params['T'] // params['dt'] + 1)
-    t = np.linspace(0, params['T'], Nt_inter, endpoint=True)
-    start_min = int(
-        pd.Timedelta(params['start_date'] - pd.to_datetime('2018/01/01', format='%Y-%m-%d')).total_seconds() // 60)
-    seasonal_pattern = np.cos((2 * np.pi / (365 * 24 * 60)) * (t - 30 * 24 * 60 - start_min))
+    #signal += prng.uniform(0, SMOOTHDIST/Pmax, signal.shape)
+    smooth_noise = prng.uniform(0, smoothdist, long_scale_signal.shape)
+    #signal += np.random.uniform(0, smoothdist, signal.shape) #older version - to be removed
+    return compute_wind_series_from_signals(Pmax, long_scale_signal, medium_scale_signal, short_scale_signal,
+                                            smooth_noise, params)
+
+def compute_wind_series_from_signals(Pmax, long_scale_signal, medium_scale_signal, short_scale_signal, smooth_noise,
+                                     params):
+    """
+    Wind production from the interpolated noises and the smoothing noise (see :func:`compute_wind_series`).
+    The signals may have leading (scenario, generator) axes, Pmax being broadcast against them.
+    """
+    # Compute seasonal pattern (the same for all the generators)
+    seasonal_pattern = PATTERN_CACHE.get(('wind_seasonal',) + period_key(params),
+                                         lambda: compute_wind_seasonal_pattern(params))
 
     # Combine signals
     std_short_wind_noise = float(params['std_short_wind_noise'])
@@ -50,26 +66,42 @@ def compute_wind_series(prng, locations, Pmax, long_noise, medium_noise, short_n
     signal = (0.7 + 0.3 * seasonal_pattern) * (0.3 + std_medium_wind_noise * medium_scale_signal + std_long_wind_noise * long_scale_signal)
     signal += std_short_wind_noise * short_scale_signal
     signal = 1e-1 * np.exp(4 * signal)
-    #signal += prng.uniform(0, SMOOTHDIST/Pmax, signal.shape)
-    signal += prng.uniform(0, smoothdist, signal.shape)
-    #signal += np.random.uniform(0, smoothdist, signal.shape) #older version - to be removed
+    signal += smooth_noise
 
     # signal *= 0.95
     signal[signal < 0.] = 0.
     signal = smooth(signal)
     wind_series = Pmax * signal
-    wind_series[wind_series > 0.95 * Pmax] = 0.95 * Pmax
-    return wind_series
+    return np.minimum(wind_series, 0.95 * Pmax)
+
+def compute_wind_seasonal_pattern(params):
+    """
+    Yearly variation of the wind at each time step of the scenario
+    """
+    Nt_inter = int(params['T'] // params['dt'] + 1)
+    t = np.linspace(0, params['T'], Nt_inter, endpoint=True)
+    start_min = int(
+        pd.Timedelta(params['start_date'] - pd.to_datetime('2018/01/01', format='%Y-%m-%d')).total_seconds() // 60)
+    return np.cos((2 * np.pi / (365 * 24 * 60)) * (t - 30 * 24 * 60 - start_min))
 
-def compute_solar_series(prng, locations, Pmax, solar_noise, params, solar_pattern, smoothdist, time_scale, add_dim, scale_solar_coord_for_correlation=None):
+def compute_solar_series(prng, locations, Pmax, solar_noise, params, solar_pattern, smoothdist, time_scale, add_dim, scale_solar_coord_for_correlation=None,
+                         final_noise=None, pattern_id=None):
 
-    # Compute noise at desired locations
-    if scale_solar_coord_for_correlation is not None:
-        locations = [float(scale_solar_coord_for_correlation) * float(locations[0]), float(scale_solar_coord_for_correlation) * float(locations[1])]
-    final_noise = utils.interpolate_noise(solar_noise, params, locations, time_scale, add_dim=add_dim)
+    # Compute noise at desired locations (unless it has already been interpolated for all the generators)
+    if final_noise is None:
+        if scale_solar_coord_for_correlation is not None:
+            locations = [float(scale_solar_coord_for_correlation) * float(locations[0]), float(scale_solar_coord_for_correlation) * float(locations[1])]
+        final_noise = utils.interpolate_noise(solar_noise, params, locations, time_scale, add_dim=add_dim)
 
+    return compute_solar_series_from_noise(Pmax, final_noise, params, solar_pattern, pattern_id=pattern_id)
+
+def compute_solar_series_from_noise(Pmax, final_noise, params, solar_pattern, pattern_id=None):
+    """
+    Solar production from the interpolated noise (see :func:`compute_solar_series`).
+    The noise may have leading (scenario, generator) axes, Pmax being broadcast against them.
+    """
     # Compute solar pattern
-    solar_pattern = compute_solar_pattern(params, solar_pattern)
+    solar_pattern = compute_solar_pattern(params, solar_pattern, pattern_id=pattern_id)
 
     # Compute solar time series
     std_solar_noise = float(params['std_solar_noise'])
@@ -87,10 +119,9 @@ def compute_solar_series(prng, locations, Pmax, solar_noise, params, solar_patte
     signal = smooth(signal)
     solar_series = Pmax * signal
     # solar_series[np.isclose(solar_series, 0.)] = 0
-    solar_series[solar_series > 0.95 * Pmax] = 0.95 * Pmax
-    return solar_series
+    return np.minimum(solar_series, 0.95 * Pmax)
 
-def compute_solar_pattern(params, solar_pattern):
+def compute_solar_pattern(params, solar_pattern, pattern_id=None):
     """
     Loads a typical hourly pattern, and interpolates it to generate
     a smooth solar generation pattern between 0 and 1
@@ -99,19 +130,25 @@ def compute_solar_pattern(params, solar_pattern):
         computation_params: (dict) Defines the mesh dimensions and
             precision. Also define the correlation scales
         interpolation_params: (dict) params of the interpolation
+        pattern_id: (str) identifier of solar_pattern in the cache of the patterns, computed if None
 
     Output:
-        (np.array) A smooth solar pattern
+        (np.array) A smooth solar pattern (read-only, shared by all the solar generators)
     """
+    if pattern_id is None:
+        pattern_id = pattern_source(solar_pattern)
+    return PATTERN_CACHE.get(('solar', pattern_id) + period_key(params),
+                             lambda: _interpolate_solar_pattern(params, solar_pattern))
+
+
+def _interpolate_solar_pattern(params, solar_pattern):
 
     start_year = pd.to_datetime(str(params['start_date'].year) + '/01/01', format='%Y-%m-%d')
     end_min = int(pd.Timedelta(params['end_date'] - start_year).total_seconds() // 60)
 
     Nt_inter_hr = int(end_min // 60 + 1)
     N_repet = int((Nt_inter_hr - 1) // len(solar_pattern) + 1)
-    stacked_solar_pattern = solar_pattern
-    for i in range(N_repet - 1):
-        stacked_solar_pattern = np.append(stacked_solar_pattern, solar_pattern)
+    stacked_solar_pattern = np.tile(solar_pattern, N_repet)
 
     # The time is in minutes
     t_pattern = 60 * np.linspace(0, 8760 * N_repet, 8760 * N_repet, endpoint=False)
@@ -163,29 +200,21 @@ def smooth(x, alpha=0.5, beta=None):
 
 
 def create_csv(prng, dict_, path, reordering=True, noise=None, shift=False,
-               write_results=True, index=False):
-    if type(dict_) is dict:
-        df = pd.DataFrame.from_dict(dict_)
+               write_results=True, index=False, output_format=cst.DEFAULT_OUTPUT_FORMAT):
+    if isinstance(dict_, ChronicsBlock):
+        block = dict_.reordered() if reordering else dict_
+    elif type(dict_) is dict:
+        block = ChronicsBlock.from_dict(dict_, reordering=reordering)
     else:
-        df = dict_.copy()
-    df.set_index('datetime', inplace=True)
-    df = df.sort_index(ascending=True)
-    df = df.head(len(df ) -1)
-    if reordering:
-        value = []
-        for name in list(df):
-            value.append(utils.natural_keys(name))
-        new_ordering = [x for _ ,x in sorted(zip(value ,list(df)))]
-        df = df[new_ordering]
+        block = ChronicsBlock.from_dict({name: dict_[name].values for name in dict_}, reordering=reordering)
+    values = block.values[:-1]
     if noise is not None:
-        df *= ( 1 +noise * prng.normal(0, 1, df.shape))
+        values = values * ( 1 +noise * prng.normal(0, 1, values.shape))
         #df *= (1 + noise * np.random.normal(0, 1, df.shape)) #older version - to be removed
     if shift:
-        df = df.shift(-1)
-        df = df.fillna(0)
+        values = utils.shift_values(values)
+    df = block.to_frame(values, block.index[:-1])
     if write_results:
-        df.to_csv(path, index=index, sep=';',
-                  float_format=cst.FLOATING_POINT_PRECISION_FORMAT)
+        write_chronics(df, path, output_format, index=index)
 
     return df
-
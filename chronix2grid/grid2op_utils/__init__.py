@@ -6,7 +6,8 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
-__all__ = ["add_data", "generate_one_episode"]
+__all__ = ["add_data", "generate_one_episode", "GeneratedChronics"]
 
 from chronix2grid.grid2op_utils.add_data import add_data
 from chronix2grid.grid2op_utils.generate_one_episode import generate_one_episode
+from chronix2grid.grid2op_utils.generated_chronics import GeneratedChronics
@@ -8,21 +8,81 @@
 import os
 import numpy as np
 import json
+from functools import partial
 from multiprocessing import Pool
 
 import grid2op
 from chronix2grid.grid2op_utils.utils import generate_a_scenario, get_last_scenario_id
+from chronix2grid.run_manifest import RunManifest, run_scenario_task
 from numpy.random import default_rng
 
-import pdb
+# parameters of the last run of `add_data` in the chronics folder, to resume it
+ADD_DATA_RUN_FILE_NAME = "add_data_run.json"
+# manifest of the months generated by `add_data`, in the chronics folder
+ADD_DATA_MANIFEST_FILE_NAME = "add_data_manifest.jsonl"
+
+
+def _task_name(start_dates, scen_ids, task_id):
+    return f"{start_dates[task_id]}_{scen_ids[task_id]}"
+
+
+def _generate_task(path_env, name_gen, gen_type, output_dir, dt, handle_loss, start_dates, scen_ids, seeds, task_id):
+    """Generates the scenario of one task of `add_data` (raises the error returned by `generate_a_scenario`)"""
+    res_gen = generate_a_scenario(path_env, name_gen, gen_type, output_dir, start_dates[task_id], dt, scen_ids[task_id],
+                                  seeds["load_seed"][task_id], seeds["renew_seed"][task_id],
+                                  seeds["gen_p_forecast_seed"][task_id], handle_loss)
+    error_, *_ = res_gen
+    if error_ is not None:
+        raise error_
+
+
+def _is_generated(this_scen_path):
+    # generation_quality.json is written after the data of the scenario
+    return os.path.exists(os.path.join(this_scen_path, "generation_quality.json"))
+
+
+def _collect_records(iter_records, nb_task, output_dir, manifest, errors, path_json_error):
+    """Writes the record of each task in the manifest (and its error in errors.json) as soon as it is done"""
+    records = []
+    for n_done, record in enumerate(iter_records, start=1):
+        name = record["scenario_name"]
+        if record["success"]:
+            with open(os.path.join(output_dir, name, "generation_quality.json"), "r", encoding="utf-8") as f:
+                quality = json.load(f)
+            record["quality"] = {k: quality[k] for k in ["iter_num", "avg", "percent_95", "percent_99", "max"]}
+            errors_changed = errors.pop(name, None) is not None
+            print(f"[{n_done}/{nb_task}] {name} done in {record['wall_time']:.1f} seconds")
+        else:
+            print("=============================")
+            print(f"     Error for {name}        ")
+            print(f"{record['error']}")
+            print("=============================")
+            errors[name] = record["error"].strip().splitlines()[-1]
+            errors_changed = True
+        manifest.append(record)
+        records.append(record)
+        
+        if errors_changed:
+            # write the log
+            with open(path_json_error, "w", encoding="utf-8") as f:
+                json.dump(errors, fp=f)
+    return records
+
 
 def add_data(env: grid2op.Environment.Environment,
              seed=None,
              nb_scenario=1,
-             nb_core=1,  # TODO
-             with_loss=True):
+             nb_core=1,
+             with_loss=True,
+             resume=False):
     """This function adds some data to already existing scenarios.
     
+    The scenarios are generated one month (one date of "all_dates" in scenario_params.json) at a time, possibly
+    by `nb_core` processes. The seeds of each (scenario, month) are drawn before the generation, so they do not
+    depend on the number of cores. As soon as a month is generated (or fails), a record is appended to the
+    manifest "add_data_manifest.jsonl" in the chronics folder (see :class:`chronix2grid.run_manifest.RunManifest`)
+    and the errors are written in "errors.json".
+    
     .. warning::
         You should not start this function twice. Before starting a new run, make sure the previous one has terminated (otherwise you might
         erase some previously generated scenario)
@@ -40,85 +100,83 @@ def add_data(env: grid2op.Environment.Environment,
     with_loss: ``bool``
         Do you make sure that the generated data will not be modified too much when running with grid2op (default = True).
         Setting it to False will speed up (by quite a lot) the generation process, but will degrade the data quality.
-        
+    resume: ``bool``
+        Whether to resume the last (interrupted) run: the scenario ids, seed and `with_loss` of this run are used
+        (other arguments but `nb_core` are ignored) and the months already generated are skipped. 
+        The months that failed are generated again.
+    
+    Returns
+    -------
+    ``list``
+        records of the months generated by this call (see :func:`chronix2grid.run_manifest.run_scenario_task`)
     """
     # required parameters
-    env_name = type(env).env_name
     output_dir = os.path.join(env.get_path_env(), "chronics")
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
-        
-    last_scen = get_last_scenario_id(output_dir)
-    scen_ids = [f"{el}" for el in range(last_scen +1, last_scen + 1 + nb_scenario)]
+    
+    path_run = os.path.join(output_dir, ADD_DATA_RUN_FILE_NAME)
+    if resume and os.path.exists(path_run):
+        with open(path_run, "r", encoding="utf-8") as f:
+            run_info = json.load(f)
+        print(f"Resuming the generation of {run_info['nb_scenario']} scenario(s) (seed {run_info['seed']})")
+    else:
+        if seed is None:
+            # a seed is drawn so that the run can be resumed
+            seed = int(default_rng().integers(2**32 - 1))
+        run_info = {"seed": int(seed),
+                    "first_scen_id": get_last_scenario_id(output_dir) + 1,
+                    "nb_scenario": int(nb_scenario),
+                    "with_loss": bool(with_loss)}
+        with open(path_run, "w", encoding="utf-8") as f:
+            json.dump(run_info, fp=f)
+    
+    first_scen_id = run_info["first_scen_id"]
+    scen_ids = [f"{el}" for el in range(first_scen_id, first_scen_id + run_info["nb_scenario"])]
     with open(os.path.join(env.get_path_env(), "scenario_params.json"), "r", encoding="utf-8") as f:
         dict_ref = json.load(f)
         
     dt = dict_ref["dt"]
     li_months = dict_ref["all_dates"]
 
-    # generate the seeds
-    if seed is not None:
-        prng = default_rng(seed)
-    else:
-        prng = default_rng()
-        
-    load_seeds = []
-    renew_seeds = []
-    gen_p_forecast_seeds = []
+    # generate the seeds (in the order of the tasks, whatever the number of cores)
+    prng = default_rng(run_info["seed"])
+    tasks_start_date = []
+    tasks_scen_id = []
+    seeds = {"load_seed": [], "renew_seed": [], "gen_p_forecast_seed": []}
     for scen_id in scen_ids:
         for start_date in li_months:
             load_seed, renew_seed, gen_p_forecast_seed = prng.integers(2**32 - 1, size=3)
-            load_seeds.append(load_seed)
-            renew_seeds.append(renew_seed)
-            gen_p_forecast_seeds.append(gen_p_forecast_seed)
+            tasks_start_date.append(start_date)
+            tasks_scen_id.append(scen_id)
+            seeds["load_seed"].append(load_seed)
+            seeds["renew_seed"].append(renew_seed)
+            seeds["gen_p_forecast_seed"].append(gen_p_forecast_seed)
+    
+    # skip the months already generated
+    task_names = partial(_task_name, tasks_start_date, tasks_scen_id)
+    task_ids = [task_id for task_id in range(len(tasks_scen_id))
+                if not _is_generated(os.path.join(output_dir, task_names(task_id)))]
+    if len(task_ids) < len(tasks_scen_id):
+        print(f"{len(tasks_scen_id) - len(task_ids)} month(s) already generated are skipped")
     
     # generate the data
-    # TODO multi proc
-    path_env = env.get_path_env()
-    name_gen = env.name_gen
-    gen_type = env.gen_type
+    task_func = partial(run_scenario_task,
+                        partial(_generate_task, env.get_path_env(), env.name_gen, env.gen_type, output_dir, dt,
+                                run_info["with_loss"], tasks_start_date, tasks_scen_id, seeds),
+                        task_names,
+                        seeds)
+    manifest = RunManifest(output_dir, file_name=ADD_DATA_MANIFEST_FILE_NAME)
+    path_json_error = os.path.join(output_dir, "errors.json")
     errors = {}
-    argss = []
-    for j, scen_id in enumerate(scen_ids):
-        for i, start_date in enumerate(li_months):
-            seed_num = i + j * len(li_months)
-            argss.append((path_env,
-                          name_gen,
-                          gen_type,
-                          output_dir,
-                          start_date,
-                          dt,
-                          scen_id,
-                          load_seeds[seed_num],
-                          renew_seeds[seed_num],
-                          gen_p_forecast_seeds[seed_num],
-                          with_loss
-                          ))
+    if os.path.exists(path_json_error):
+        with open(path_json_error, "r", encoding="utf-8") as f:
+            errors = json.load(f)
+    
     if nb_core == 1:
-        for args in argss:
-            path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id, load_seed, renew_seed, \
-                gen_p_forecast_seed, handle_loss = args
-            res_gen = generate_a_scenario(path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id, load_seed, renew_seed, 
-                                          gen_p_forecast_seed, handle_loss)
-            error_, *_ = res_gen
-            if error_ is not None:
-                print("=============================")
-                print(f"     Error for {start_date} {scen_id}        ")
-                print(f"{error_}")
-                print("=============================")
-                errors[f'{start_date}_{scen_id}'] = f"{error_}"
-                
-                # load previous data
-                path_json_error = os.path.join(output_dir, "errors.json")
-                if os.path.exists(path_json_error):
-                    with open(path_json_error, "r", encoding="utf-8") as f:
-                        err_tmp = json.load(f)
-                    for k in err_tmp:
-                        errors[k] = err_tmp[k]
-                    
-                # write the log
-                with open(path_json_error, "w", encoding="utf-8") as f:
-                    json.dump(errors, fp=f)
+        records = _collect_records(map(task_func, task_ids), len(task_ids), output_dir, manifest, errors, path_json_error)
     else:
-        with Pool(nb_core) as p:
-            p.starmap(generate_a_scenario, argss)
+        with Pool(nb_core) as pool:
+            records = _collect_records(pool.imap_unordered(task_func, task_ids, chunksize=1), len(task_ids),
+                                       output_dir, manifest, errors, path_json_error)
+    return records
@@ -0,0 +1,256 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+import os
+import json
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from grid2op.Chronics import FromNPY
+from numpy.random import default_rng
+
+from chronix2grid.grid2op_utils import utils as g2op_utils
+
+
+def _generate_scenario(path_env, name_gen, gen_type, start_date, dt, seeds, with_loss, nb_steps):
+    """Generates a scenario without saving it (run in the background worker of :class:`GeneratedChronics`)"""
+    load_seed, renew_seed, gen_p_forecast_seed = seeds
+    return g2op_utils.generate_a_scenario(path_env, name_gen, gen_type, None, start_date, dt, "0",
+                                          load_seed, renew_seed, gen_p_forecast_seed, with_loss, nb_steps=nb_steps)
+
+
+class GeneratedChronics(FromNPY):
+    """Chronics of a grid2op environment generated by chronix2grid each time the environment is reset.
+
+    Each call to `env.reset()` uses a new scenario made by :func:`chronix2grid.grid2op_utils.utils.generate_a_scenario`
+    (with `output_dir=None`): its load_p, load_q, prod_p and their forecasts are given to the environment
+    as numpy arrays (see :class:`grid2op.Chronics.FromNPY`), nothing is written on the disk nor read from it.
+    With `prefetch=True`, the next scenario is generated by a background process while the current one is used.
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+        import grid2op
+        from lightsim2grid import LightSimBackend
+        from chronix2grid.grid2op_utils import GeneratedChronics
+
+        env = grid2op.make(env_name,
+                           backend=LightSimBackend(),
+                           chronics_class=GeneratedChronics,
+                           data_feeding_kwargs={"path_env": path_env, "seed": 0})
+        for _ in range(nb_episode):
+            obs = env.reset()  # a new scenario
+            ...
+        env.chronics_handler.real_data.close()
+
+    .. warning::
+        The environment at `path_env` should be usable by :func:`chronix2grid.grid2op_utils.add_data`
+        (params.json, scenario_params.json, loads_charac.csv, prods_charac.csv...). A copy of the environment
+        (`env.copy()`) generates its scenarios without background process.
+
+    Parameters
+    ----------
+    path_env : str
+        path of the grid2op environment, by default the parent folder of `path` (its "chronics" folder)
+    seed : int, optional
+        seed of the scenarios (the same seed gives the same sequence of scenarios)
+    start_date : str, optional
+        first day of the scenarios ("%Y-%m-%d"), by default the scenarios use the dates of "all_dates"
+        in scenario_params.json one after the other
+    dt : int, optional
+        duration of a step (in minutes), by default the "dt" of scenario_params.json
+    nb_steps : int, optional
+        number of steps of a scenario, by default one week (see :func:`generate_a_scenario`)
+    with_loss : bool
+        whether the losses are computed with an AC power flow (see :func:`generate_a_scenario`)
+    prefetch : bool
+        whether the next scenario is generated in a background process
+    max_retry : int
+        number of scenarios generated (with other seeds) before raising an error when the generation fails
+    name_gen, gen_type : np.ndarray, optional
+        name and type of the generators, by default the ones of prods_charac.csv
+    """
+    def __init__(self,
+                 path_env=None,
+                 seed=None,
+                 start_date=None,
+                 dt=None,
+                 nb_steps=None,
+                 with_loss=True,
+                 prefetch=False,
+                 max_retry=10,
+                 name_gen=None,
+                 gen_type=None,
+                 path=None,
+                 **kwargs):
+        if path_env is None:
+            if path is None:
+                raise RuntimeError("GeneratedChronics: you need to provide the path of the environment (path_env)")
+            path_env = os.path.dirname(os.path.abspath(path))
+        self.path_env = path_env
+        if name_gen is None or gen_type is None:
+            gens_charac = pd.read_csv(os.path.join(path_env, "prods_charac.csv"), sep=",")
+            name_gen = gens_charac["name"].values
+            gen_type = gens_charac["type"].values
+        self.name_gen = np.array(name_gen).astype(str)
+        self.gen_type = np.array(gen_type).astype(str)
+
+        if start_date is None or dt is None:
+            with open(os.path.join(path_env, "scenario_params.json"), "r", encoding="utf-8") as f:
+                dict_ref = json.load(f)
+            if dt is None:
+                dt = dict_ref["dt"]
+        self.all_dates = [start_date] if start_date is not None else list(dict_ref["all_dates"])
+        self.dt = int(dt)
+        self.nb_steps = nb_steps
+        self.with_loss = with_loss
+        self.max_retry = int(max_retry)
+        self.prefetch = prefetch
+        self._prng = default_rng(seed)
+        self._nb_scenario = 0
+        self._executor = None
+        self._future = None
+        self._order_backend_loads = None
+        self._order_backend_prods = None
+
+        self._scenario = self._get_scenario()
+        # the first reset of the environment uses this scenario, unless the environment was stepped before
+        self._first_scenario = True
+        load_p, load_p_forecasted, load_q, load_q_forecasted, prod_p, prod_p_forecasted = self._scenario["data"]
+        for el in ["load_p", "load_q", "prod_p", "prod_v",
+                   "load_p_forecast", "load_q_forecast", "prod_p_forecast", "prod_v_forecast",
+                   "time_interval", "start_datetime"]:
+            # would be ignored: the data come from the generated scenarios
+            kwargs.pop(el, None)
+        FromNPY.__init__(self,
+                         load_p=load_p.values,
+                         load_q=load_q.values,
+                         prod_p=prod_p.values,
+                         load_p_forecast=load_p_forecasted.values,
+                         load_q_forecast=load_q_forecasted.values,
+                         prod_p_forecast=prod_p_forecasted.values,
+                         time_interval=timedelta(minutes=self.dt),
+                         start_datetime=self._scenario["start_datetime"],
+                         **kwargs)
+
+    def _next_args(self):
+        start_date = self.all_dates[self._nb_scenario % len(self.all_dates)]
+        seeds = self._prng.integers(2**32 - 1, size=3)
+        scenario_id = f"{start_date}_{self._nb_scenario}"
+        self._nb_scenario += 1
+        return scenario_id, (self.path_env, self.name_gen, self.gen_type, start_date, self.dt, seeds,
+                             self.with_loss, self.nb_steps)
+
+    def _submit(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1)
+        scenario_id, args = self._next_args()
+        return scenario_id, args, self._executor.submit(_generate_scenario, *args)
+
+    def _get_scenario(self):
+        """Returns the next scenario generated without error (the prefetched one if any)"""
+        errors = []
+        for _ in range(self.max_retry):
+            if self._future is not None:
+                scenario_id, args, future = self._future
+                self._future = None
+                res_gen = future.result()
+            else:
+                scenario_id, args = self._next_args()
+                res_gen = _generate_scenario(*args)
+            if self.prefetch:
+                self._future = self._submit()
+            error_, quality_, *data = res_gen
+            start_date, seeds = args[3], args[5]
+            if error_ is None:
+                break
+            warnings.warn(f"GeneratedChronics: error for the scenario starting at {start_date} (seeds {seeds}), "
+                          f"another one is generated: {error_}", UserWarning)
+            errors.append(f"{error_}")
+        else:
+            raise RuntimeError(f"GeneratedChronics: no scenario could be generated in {self.max_retry} "
+                               f"trials, errors: {errors}")
+        load_seed, renew_seed, gen_p_forecast_seed = seeds
+        return {"id": scenario_id,
+                "start_datetime": datetime.strptime(start_date, "%Y-%m-%d") - timedelta(minutes=self.dt),
+                "seeds": {"load_seed": int(load_seed),
+                          "renew_seed": int(renew_seed),
+                          "gen_p_forecast_seed": int(gen_p_forecast_seed)},
+                "quality": quality_,
+                "data": data}
+
+    def _change_data(self):
+        """Gives the data of the current scenario, in the order of the backend if it is known, to
+        :func:`grid2op.Chronics.FromNPY.change_chronics` and :func:`grid2op.Chronics.FromNPY.change_forecasts`
+        (they are used from the next call to `FromNPY.next_chronics`)
+        """
+        load_p, load_p_forecasted, load_q, load_q_forecasted, prod_p, prod_p_forecasted = self._scenario["data"]
+        if self._order_backend_loads is not None:
+            order_loads = self._order_backend_loads
+            order_prods = self._order_backend_prods
+            load_p, load_p_forecasted = load_p[order_loads], load_p_forecasted[order_loads]
+            load_q, load_q_forecasted = load_q[order_loads], load_q_forecasted[order_loads]
+            prod_p, prod_p_forecasted = prod_p[order_prods], prod_p_forecasted[order_prods]
+        self.change_chronics(load_p.values, load_q.values, prod_p.values)
+        self.change_forecasts(load_p_forecasted.values, load_q_forecasted.values, prod_p_forecasted.values)
+
+    def initialize(self,
+                   order_backend_loads,
+                   order_backend_prods,
+                   order_backend_lines,
+                   order_backend_subs,
+                   names_chronics_to_backend=None):
+        order_backend_loads_str = [str(el) for el in order_backend_loads]
+        order_backend_prods_str = [str(el) for el in order_backend_prods]
+        if order_backend_loads_str != self._order_backend_loads or order_backend_prods_str != self._order_backend_prods:
+            # the data given so far are in the order of the generated scenario
+            self._order_backend_loads = order_backend_loads_str
+            self._order_backend_prods = order_backend_prods_str
+            self._change_data()
+            FromNPY.next_chronics(self)
+        super().initialize(order_backend_loads,
+                           order_backend_prods,
+                           order_backend_lines,
+                           order_backend_subs,
+                           names_chronics_to_backend)
+
+    def next_chronics(self):
+        # the scenario generated in __init__ is kept if only its first step was loaded (when the environment was made)
+        if not self._first_scenario or self.curr_iter > 1:
+            self._scenario = self._get_scenario()
+            self.start_datetime = self._scenario["start_datetime"]
+            self._change_data()
+        self._first_scenario = False
+        super().next_chronics()
+
+    def get_id(self) -> str:
+        return self._scenario["id"]
+
+    @property
+    def scenario_info(self):
+        """id, seeds and quality (see :func:`generate_a_scenario`) of the current scenario"""
+        return {k: v for k, v in self._scenario.items() if k != "data"}
+
+    def close(self):
+        """Stops the background process generating the next scenario"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._future = None
+
+    def __getstate__(self):
+        # the background process is not copied
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["_future"] = None
+        state["prefetch"] = False
+        return state
@@ -0,0 +1,106 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import numpy as np
+
+LOSS_SOLVERS = ["fixed_point", "anderson"]
+
+
+class LossFixedPoint:
+    """Update of the losses between two iterations of the loss adjustment (see `_adjust_gens`).
+
+    The loss adjustment looks for the losses `L` such that the AC power flow of the generators dispatched
+    with `L` gives back `L`: `L = G(L)`. At each iteration, knowing the losses `L_k` used by the dispatch and
+    the ones `G(L_k)` given by the power flow, this class computes the losses of the next iteration:
+
+    - *fixed_point*: `L_k+1 = L_k + relaxation * (G(L_k) - L_k)`, with a relaxation of 1 (the default)
+      this is `L_k+1 = G(L_k)`
+    - *anderson*: Anderson acceleration, which combines the last `memory` iterations so that
+      the residual `G(L) - L` is minimal (in the least squares sense) and relaxes this combination.
+      The history is cleared when the residual increases too much, the next update being a plain
+      (relaxed) fixed point one.
+
+    The history reported by the loss adjustment (*max_diff_history* of generation_quality.json) is the one of the
+    deviations of the generators, not the one of the loss residuals kept here to restart *anderson*.
+
+    Parameters
+    ----------
+    method : str
+        one of :attr:`LOSS_SOLVERS`
+    memory : int
+        number of previous iterations used by *anderson*
+    relaxation : float
+        relaxation (damping) factor, in ]0, 1]
+    restart_ratio : float
+        *anderson* history is cleared when the residual is larger than `restart_ratio` times the smallest one
+
+    Attributes
+    ----------
+    n_restart : int
+        number of times the history of *anderson* has been cleared
+    """
+    def __init__(self, method="fixed_point", memory=5, relaxation=1., restart_ratio=10.):
+        if method not in LOSS_SOLVERS:
+            raise RuntimeError(f"Unknown loss solver \"{method}\", it should be one of {LOSS_SOLVERS}")
+        if not 0. < relaxation <= 1.:
+            raise RuntimeError(f"The relaxation of the loss solver should be in ]0, 1], found {relaxation}")
+        self.method = method
+        self.memory = int(memory)
+        self.relaxation = float(relaxation)
+        self.restart_ratio = float(restart_ratio)
+        self.n_restart = 0
+        self._residual_maxs = []
+        self._losses = []
+        self._residuals = []
+
+    @classmethod
+    def from_params(cls, params):
+        """Loss solver configured by the *loss_solver*, *loss_anderson_memory* and *loss_relaxation*
+        keys of `params` (params_opf.json), plain fixed point iteration by default"""
+        return cls(method=params.get("loss_solver", "fixed_point"),
+                   memory=params.get("loss_anderson_memory", 5),
+                   relaxation=params.get("loss_relaxation", 1.))
+
+    def next_loss(self, loss, loss_pf):
+        """Losses to use at the next iteration
+
+        Parameters
+        ----------
+        loss : np.ndarray
+            losses used by the dispatch at this iteration (one per step)
+        loss_pf : np.ndarray
+            losses computed by the power flow at this iteration
+
+        Returns
+        -------
+        np.ndarray
+            losses of the next iteration
+        """
+        loss = np.asarray(loss, dtype=float)
+        residual = np.asarray(loss_pf, dtype=float) - loss
+        residual_max = float(np.max(np.abs(residual)))
+        self._residual_maxs.append(residual_max)
+        if self.method == "fixed_point" or self.memory <= 0:
+            return loss + self.relaxation * residual
+
+        if self._residuals and residual_max > self.restart_ratio * min(self._residual_maxs):
+            self._losses.clear()
+            self._residuals.clear()
+            self.n_restart += 1
+        self._losses.append(loss)
+        self._residuals.append(residual)
+        if len(self._losses) > self.memory + 1:
+            del self._losses[0]
+            del self._residuals[0]
+        if len(self._losses) == 1:
+            return loss + self.relaxation * residual
+
+        delta_loss = np.diff(np.array(self._losses), axis=0).T
+        delta_residual = np.diff(np.array(self._residuals), axis=0).T
+        gamma, *_ = np.linalg.lstsq(delta_residual, residual, rcond=None)
+        return loss + self.relaxation * residual - (delta_loss + self.relaxation * delta_residual) @ gamma
@@ -22,6 +22,7 @@ from grid2op.Chronics import ChangeNothing, FromNPY
 from grid2op.Action import DontAct
 from grid2op.Opponent import NeverAttackBudget, BaseOpponent
 from lightsim2grid import LightSimBackend
+from lightsim2grid.timeSerie import TimeSeriesCPP
 import numpy as np
 from numpy.random import default_rng
 
@@ -30,6 +31,10 @@ from chronix2grid.generation.renewable import RenewableBackend
 from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
 from chronix2grid.getting_started.example.input.generation.patterns import ref_pattern_path
 from chronix2grid.generation.dispatch.EconomicDispatch import ChroniXScenario
+from chronix2grid.generation.loss.loss_surrogate import LossSurrogate, LOSS_SURROGATE_FILE_NAME
+from chronix2grid.chronics_io import CSV_FORMAT, write_chronics
+from chronix2grid import profiling
+from chronix2grid.grid2op_utils.loss_fixed_point import LossFixedPoint
 
 import warnings
 
@@ -185,6 +190,11 @@ def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_
     
     It does not consider limit on powerline, nor contigencies etc. The power network does not exist here. Only the ramps and
     pmin / pmax are important.
+    
+    The losses are a percentage ("losses_pct" of params_opf.json) of the load, unless a loss surrogate
+    (:class:`chronix2grid.generation.loss.loss_surrogate.LossSurrogate`) has been saved for this grid in `path_env`.
+    In this case they are predicted at each step from the load and the renewable productions, which makes the 
+    generated data usable without loss adjustment for draft runs (`handle_loss=False` in :func:`generate_a_scenario`).
 
     Parameters
     ----------
@@ -251,7 +261,14 @@ def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_
                                                          )
     economic_dispatch.read_hydro_guide_curves(os.path.join(ref_pattern_path, 'hydro_french.csv'))
     hydro_constraints = economic_dispatch.make_hydro_constraints_from_res_load_scenario()
-    res_dispatch = economic_dispatch.run(load * (1.0 + 0.01 * float(opf_params["losses_pct"])),
+    if os.path.exists(os.path.join(path_env, LOSS_SURROGATE_FILE_NAME)):
+        # losses predicted at each step by the surrogate fitted on previous simulations of this grid
+        # (the loss adjustment then starts close to the losses of the AC power flow)
+        loss = LossSurrogate.load(path_env).predict(load_p, prod_solar, prod_wind)
+        load_with_losses = load + loss.values.reshape(-1, 1)
+    else:
+        load_with_losses = load * (1.0 + 0.01 * float(opf_params["losses_pct"]))
+    res_dispatch = economic_dispatch.run(load_with_losses,
                                          total_solar,
                                          total_wind,
                                          opf_params,
@@ -283,6 +300,157 @@ def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_
     return final_gen_p, total_wind_curt, total_solar_curt, None
 
 
+# environments used to compute the losses, one per grid and per process (see get_env_for_loss)
+_ENVS_FOR_LOSS = {}
+
+
+def get_env_for_loss(env_path, env_param, load_p, load_q, prod_p, prod_v, start_datetime=None, time_interval=None):
+    """Returns a grid2op environment (with lightsim2grid) of the grid at `env_path` reading the given data.
+    
+    The environment is created once per process and per grid: the next calls only swap the arrays of its
+    :class:`grid2op.Chronics.FromNPY` chronics, which avoids to read the grid, build the backend
+    and the action / observation spaces again (that takes more time than the power flows for short scenarios).
+    
+    .. warning::
+        As for :func:`grid2op.Chronics.FromNPY.change_chronics`, the new data are used after `env.reset()` is called.
+
+    Parameters
+    ----------
+    env_path : str
+        path of the grid2op environment
+    env_param : grid2op.Parameters.Parameters
+        parameters of the environment
+    load_p, load_q, prod_p, prod_v : np.ndarray
+        data of the loads and generators, one row per step
+    start_datetime : datetime, optional
+        date of the first step, by default the one of FromNPY (or of the previous call)
+    time_interval : timedelta, optional
+        duration of a step, by default 5 minutes. The environment is created again if it changes.
+
+    Returns
+    -------
+    grid2op.Environment.Environment
+        the environment
+    """
+    env = _ENVS_FOR_LOSS.get(env_path)
+    if env is not None and time_interval is not None and time_interval != env.chronics_handler.real_data.time_interval:
+        env.close()
+        env = None
+        
+    if env is None:
+        data_feeding_kwargs = {"load_p": load_p,
+                               "load_q": load_q,
+                               "prod_p": 1.0 * prod_p,
+                               "prod_v": prod_v}
+        if start_datetime is not None:
+            data_feeding_kwargs["start_datetime"] = start_datetime
+        if time_interval is not None:
+            data_feeding_kwargs["time_interval"] = time_interval
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            env = grid2op.make(
+                env_path,
+                test=True,
+                param=env_param,
+                backend=LightSimBackend(),
+                chronics_class=FromNPY,
+                data_feeding_kwargs=data_feeding_kwargs,
+                opponent_budget_per_ts=0.,
+                opponent_init_budget=0.,
+                opponent_class=BaseOpponent,
+                opponent_budget_class=NeverAttackBudget,
+                opponent_action_class=DontAct,
+                )
+        _ENVS_FOR_LOSS[env_path] = env
+    else:
+        env.change_parameters(env_param)
+        real_data = env.chronics_handler.real_data
+        real_data.change_chronics(load_p, load_q, prod_p, prod_v)
+        if start_datetime is not None:
+            real_data.start_datetime = start_datetime
+    return env
+
+
+def _same_voltage_setpoints(prod_v):
+    """Whether the voltage setpoints `prod_v` (one row per step) are the same at every step. As for the
+    injections of grid2op, a Nan keeps the setpoint of the previous step.
+    """
+    prod_v = pd.DataFrame(prod_v).ffill().values
+    return bool(np.all((prod_v == prod_v[0]) | (np.isnan(prod_v) & np.isnan(prod_v[0]))))
+
+
+def _batched_gen_p(env, load_p, load_q, prod_p):
+    """Active power of the generators after an AC power flow at each step, all the steps being
+    computed at once by the time series solver of lightsim2grid (on the current topology of `env`,
+    with the voltage setpoints of its current step for all the steps, see :func:`_same_voltage_setpoints`).
+
+    Returns None if the installed lightsim2grid does not give the generators results. Steps after a
+    divergence are Nans.
+    """
+    computer = TimeSeriesCPP(env.backend._grid)
+    if not hasattr(computer, "compute_gen_results"):
+        return None
+    computer.compute_gen_results = True
+    n_step = prod_p.shape[0]
+    status = computer.compute_Vs(np.asarray(prod_p, dtype=float),
+                                 np.zeros((n_step, 0)),  # no static generators
+                                 np.asarray(load_p, dtype=float),
+                                 np.asarray(load_q, dtype=float),
+                                 env.backend.V,
+                                 env.backend.max_it,
+                                 env.backend.tol)
+    gen_p = 1.0 * computer.get_gen_results()[:, :, 0]
+    if status != 1:
+        gen_p[computer.nb_solved():] = np.NaN
+    return gen_p
+
+
+def evaluate_losses(env_path, env_param, load_p, load_q, prod_p, prod_v):
+    """Runs an AC power flow at each step of a scenario to compute the losses and the deviation of the
+    generators from their setpoints (the slack compensates the losses).
+
+    The power flows are computed in one batch by lightsim2grid when possible, instead of stepping a grid2op
+    environment with "do nothing" actions, which builds an observation at each step. The batch keeps the
+    voltage setpoints of the first step: the environment (see :func:`get_env_for_loss`) is stepped instead
+    when the setpoints of `prod_v` change over time, or when lightsim2grid does not give the generators results.
+
+    Parameters
+    ----------
+    env_path : str
+        path of the grid2op environment
+    env_param : grid2op.Parameters.Parameters
+        parameters of the environment
+    load_p, load_q, prod_p, prod_v : np.ndarray
+        data of the loads and generators, one row per step
+
+    Returns
+    -------
+    all_loss : np.ndarray
+        losses at each step (MW), Nans for the steps that could not be computed
+    diff_ : np.ndarray
+        difference between the production of each generator after the power flow and `prod_p` (MW)
+    """
+    env = get_env_for_loss(env_path, env_param, load_p, load_q, prod_p, prod_v)
+    obs = env.reset()
+    n_step = env.max_episode_duration()
+    gen_p = None
+    if _same_voltage_setpoints(prod_v[:n_step]):
+        gen_p = _batched_gen_p(env, load_p[:n_step], load_q[:n_step], prod_p[:n_step])
+    if gen_p is None:
+        gen_p = np.full((n_step, env.n_gen), fill_value=np.NaN)
+        i = 0
+        gen_p[i] = obs.gen_p
+        done = False
+        while not done:
+            obs, reward, done, info = env.step(env.action_space())
+            i += 1
+            if done:
+                break
+            gen_p[i] = obs.gen_p
+    all_loss = np.sum(gen_p, axis=1) - np.sum(load_p[:n_step], axis=1)
+    diff_ = gen_p - prod_p[:n_step]
+    return all_loss, diff_
+
 def _adjust_gens_old(all_loss_orig,
                  env_for_loss,
                  datetimes,
@@ -493,6 +661,9 @@ def _adjust_gens(all_loss_orig,
     Like its main one (see handle_losses) it is here to make sure that if you run an AC model with the data generated, 
     then the generator setpoints will not change too much 
     (less than `threshold_stop` MW)
+    
+    The losses used by the next iteration are computed by a :class:`LossFixedPoint` configured by the
+    *loss_solver*, *loss_anderson_memory* and *loss_relaxation* keys of `params`.
 
     Parameters
     ----------
@@ -542,6 +713,7 @@ def _adjust_gens(all_loss_orig,
     all_loss = all_loss_orig
     res_gen_p = 1.0 * gen_p
     iter_num = 0
+    max_diff_history = []
     hydro_constraints = economic_dispatch.make_hydro_constraints_from_res_load_scenario()
     
     # defined some global variable (used for all optimization problems)
@@ -573,32 +745,40 @@ def _adjust_gens(all_loss_orig,
                             total_step - 1,
                             axis=0)
     p_max[:, ids_hyrdo] = 1.0 * hydro_constraints["p_max_pu"].values
-     
+    scale_for_loads =  np.repeat(scaling_factor.reshape(1,-1), total_step, axis=0)
+    
+    #### cvxpy
+    # only the target and the load to meet change between iterations: the problem is
+    # compiled once with them as parameters and each iteration starts from the last solution
+    target_vector = cp.Parameter(shape=(total_step,total_gen))
+    load = cp.Parameter(shape=total_step)
+    p_t = cp.Variable(shape=(total_step,total_gen), pos=True)
+    real_p = cp.multiply(p_t, scale_for_loads)
+    
+    constraints = [p_t >= p_min,
+                   p_t <= p_max,
+                   p_t[1:,:] - p_t[:-1,:] >= ramp_min,
+                   p_t[1:,:] - p_t[:-1,:] <= ramp_max,
+                   cp.sum(real_p, axis=1) == load,
+                  ]
+    cost = cp.sum_squares(p_t - target_vector) + cp.norm1(cp.multiply(p_t, turned_off_orig))
+    prob = cp.Problem(cp.Minimize(cost), constraints)
+    
+    # update of the losses between iterations (plain fixed point by default)
+    loss_solver = LossFixedPoint.from_params(params)
+    
     while True:
         iter_num += 1
-        load = load_without_loss + all_loss
-        load = pd.DataFrame(load.ravel(), index=datetimes)
+        loss_used = 1.0 * all_loss
         
         # "never" decrease (during iteration) some generators
         min__ = diff_.min()  # this is negative
-        load = load_without_loss + all_loss - np.sum(res_gen_p[:,~env_for_loss.gen_redispatchable], axis=1)
-        scale_for_loads =  np.repeat(scaling_factor.reshape(1,-1), total_step, axis=0)
-        target_vector = res_gen_p[:,env_for_loss.gen_redispatchable] / scaling_factor         
+        load.value = (load_without_loss + all_loss - np.sum(res_gen_p[:,~env_for_loss.gen_redispatchable], axis=1)).reshape(-1)
+        target_vector.value = res_gen_p[:,env_for_loss.gen_redispatchable] / scaling_factor         
         
-        #### cvxpy
-        p_t = cp.Variable(shape=(total_step,total_gen), pos=True)
-        real_p = cp.multiply(p_t, scale_for_loads)
-        
-        constraints = [p_t >= p_min,
-                       p_t <= p_max,
-                       p_t[1:,:] - p_t[:-1,:] >= ramp_min,
-                       p_t[1:,:] - p_t[:-1,:] <= ramp_max,
-                       cp.sum(real_p, axis=1) == load.reshape(-1),
-                      ]
-        cost = cp.sum_squares(p_t - target_vector) + cp.norm1(cp.multiply(p_t, turned_off_orig))
-        prob = cp.Problem(cp.Minimize(cost), constraints)
         try:
-            prob.solve()
+            with profiling.stage('loss_iteration_opt'):
+                prob.solve(solver=cp.OSQP, warm_start=True)
         except cp.error.SolverError as exc_:
             error_ = RuntimeError(f"cvxpy failed to find a solution at iteration {iter_num}, error {exc_}")
             res_gen_p = None
@@ -620,44 +800,18 @@ def _adjust_gens(all_loss_orig,
                 id_redisp += 1
         
         # re evaluate the losses
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            env_fixed = grid2op.make(
-                env_path,
-                test=True,
-                # grid_path=grid_path, # assign it the 118 grid
-                param=env_param,
-                backend=LightSimBackend(),
-                chronics_class=FromNPY,
-                # chronics_path=path_chronix2grid,
-                data_feeding_kwargs={"load_p": load_p,
-                                     "load_q": load_q,
-                                     "prod_p": 1.0 * res_gen_p,
-                                     "prod_v": gen_v},
-                opponent_budget_per_ts=0.,
-                opponent_init_budget=0.,
-                opponent_class=BaseOpponent,
-                opponent_budget_class=NeverAttackBudget,
-                opponent_action_class=DontAct,
-                )
-        diff_ = np.full((env_fixed.max_episode_duration(), env_fixed.n_gen), fill_value=np.NaN)
-        all_loss[:] = np.NaN
-        
-        i = 0
-        obs = env_fixed.reset()
-        all_loss[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
-        diff_[i] = obs.gen_p - res_gen_p[i]
-
-        done = False
-        while not done:
-            obs, reward, done, info = env_fixed.step(env_fixed.action_space())
-            i += 1
-            if done:
-                break
-            all_loss[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
-            diff_[i] = obs.gen_p - res_gen_p[i]
+        with profiling.stage('loss_iteration_pf'):
+            loss_pf, diff_ = evaluate_losses(env_path,
+                                             env_param,
+                                             load_p,
+                                             load_q,
+                                             res_gen_p,
+                                             gen_v)
+            all_loss[:] = np.NaN
+            all_loss[:loss_pf.shape[0]] = loss_pf
         
         max_diff_ = np.abs(diff_).max()
+        max_diff_history.append(float(max_diff_))
         print(f"{iter_num = } : {max_diff_ = :.2f}")
         if not np.isfinite(max_diff_):
             error_ = RuntimeError(f"Some nans were found in the generated data at iteration {iter_num}")
@@ -670,7 +824,8 @@ def _adjust_gens(all_loss_orig,
                         float(np.mean(np.abs(diff_))),
                         float(np.percentile(np.abs(diff_), 95)),
                         float(np.percentile(np.abs(diff_), 99)),
-                        float(max_diff_)
+                        float(max_diff_),
+                        max_diff_history
             )
             break
         
@@ -681,16 +836,20 @@ def _adjust_gens(all_loss_orig,
                             float(np.mean(np.abs(diff_))),
                             float(np.percentile(np.abs(diff_), 95)),
                             float(np.percentile(np.abs(diff_), 99)),
-                            float(np.max(np.abs(diff_)))
+                            float(np.max(np.abs(diff_))),
+                            max_diff_history
                 )
                 break
                     
         if iter_num >= max_iter:
-            error_ = RuntimeError("Too much iterations performed when adjusting for the losses")
+            error_ = RuntimeError("Too much iterations performed when adjusting for the losses "
+                                  f"(max differences: {[round(el, 2) for el in max_diff_history]})")
             res_gen_p = None
             quality_ = None
             break
         
+        all_loss[:] = loss_solver.next_loss(loss_used, all_loss)
+        
     return res_gen_p, error_, quality_
 
 
@@ -735,6 +894,9 @@ def _fix_losses_one_scenario(env_for_loss,
     _type_
         _description_
     """
+    env_for_loss.set_id(scenario_id)
+    obs = env_for_loss.reset()
+    
     gen_p_orig = np.full((env_for_loss.max_episode_duration(), env_for_loss.n_gen), fill_value=np.NaN, dtype=np.float32)
     final_gen_v = np.full((env_for_loss.max_episode_duration(), env_for_loss.n_gen), fill_value=np.NaN, dtype=np.float32)
     final_load_p = np.full((env_for_loss.max_episode_duration(), env_for_loss.n_load), fill_value=np.NaN, dtype=np.float32)
@@ -743,9 +905,6 @@ def _fix_losses_one_scenario(env_for_loss,
     max_diff_orig = np.zeros(env_for_loss.max_episode_duration())
     datetimes = np.zeros(env_for_loss.max_episode_duration(), dtype=datetime)
     
-    env_for_loss.set_id(scenario_id)
-    obs = env_for_loss.reset()
-    
     i = 0
     all_loss_orig[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
     final_gen_v[i] = obs.gen_v
@@ -842,6 +1001,10 @@ def handle_losses(path_env,
                   ):
     """This function is here to make sure that if you run an AC model with the data generated, then the generator setpoints will not change too much 
     (less than `threshold_stop` MW)
+    
+    The iterations are configured in the params_opf.json file of the environment: *loss_solver* ("fixed_point", the default, 
+    or "anderson" to accelerate the iterations), *loss_anderson_memory* (5 by default) and *loss_relaxation* (1. by default), 
+    see :class:`chronix2grid.grid2op_utils.loss_fixed_point.LossFixedPoint`.
 
     Parameters
     ----------
@@ -895,24 +1058,14 @@ def handle_losses(path_env,
     env_param.NO_OVERFLOW_DISCONNECTION = True
     gen_v = np.tile(np.array([float(gens_charac.loc[gens_charac["name"] == nm_gen].V) for nm_gen in name_gen ]),
                     load_p.shape[0]).reshape(-1, n_gen)
-    with warnings.catch_warnings():
-        warnings.filterwarnings("ignore")
-        env_for_loss = grid2op.make(
-            path_env,
-            test=True,
-            # grid_path=grid_path, # assign it the 118 grid
-            param=env_param,
-            backend=LightSimBackend(),
-            chronics_class=FromNPY,
-            # chronics_path=path_chronix2grid,
-            data_feeding_kwargs={"load_p": load_p.values,  # np.concatenate([load_p.values[0].reshape(1,-1), load_p.values]),
-                                 "load_q": load_q.values,  # np.concatenate([load_q.values[0].reshape(1,-1), load_q.values]),
-                                 "prod_p": 1.0 * final_gen_p.values,  # 1.0 * np.concatenate([final_gen_p.values[0].reshape(1,-1), final_gen_p.values]),
-                                 "prod_v": gen_v,  # np.concatenate([gen_v[0].reshape(1,-1), gen_v])}
-                                 "start_datetime": start_date_dt,
-                                 "time_interval": dt_dt,
-            }
-            )
+    env_for_loss = get_env_for_loss(path_env,
+                                    env_param,
+                                    load_p.values,
+                                    load_q.values,
+                                    final_gen_p.values,
+                                    gen_v,
+                                    start_datetime=start_date_dt,
+                                    time_interval=dt_dt)
     res_gen_p, error_, quality_ = _fix_losses_one_scenario(env_for_loss,
                                                            scenario_id,
                                                            loss_param,
@@ -945,7 +1098,8 @@ def save_generated_data(this_scen_path,
                         prod_p_forecasted,
                         debug,
                         sep=';',
-                        float_prec=FLOATING_POINT_PRECISION_FORMAT):
+                        float_prec=FLOATING_POINT_PRECISION_FORMAT,
+                        output_format=CSV_FORMAT):
     """This function saves the data that have been generated by this script.
 
     Parameters
@@ -970,6 +1124,9 @@ def save_generated_data(this_scen_path,
         _description_, by default ';'
     float_prec : _type_, optional
         _description_, by default FLOATING_POINT_PRECISION_FORMAT
+    output_format : str, optional
+        format of the files (see :mod:`chronix2grid.chronics_io`), by default "csv.bz2" which is the only one
+        grid2op can read
     """
     li_dfs = [load_p, load_p_forecasted, load_q, load_q_forecasted, prod_p, prod_p_forecasted]
     li_nms = ["load_p", "load_p_forecasted", "load_q", "load_q_forecasted", "prod_p", "prod_p_forecasted"]
@@ -979,11 +1136,12 @@ def save_generated_data(this_scen_path,
         li_dfs.append(prod_p_after_dispatch)
         li_nms.append("prod_p_after_dispatch")
     for df, nm in zip(li_dfs, li_nms):
-        df.to_csv(os.path.join(this_scen_path, f'{nm}.csv.bz2'),
-                  sep=sep,
-                  float_format=float_prec,
-                  header=True,
-                  index=False)       
+        write_chronics(df,
+                       os.path.join(this_scen_path, f'{nm}.csv.bz2'),
+                       output_format,
+                       sep=sep,
+                       float_format=float_prec,
+                       index=False)
 
 
 def save_meta_data(this_scen_path,
@@ -1038,12 +1196,14 @@ def save_meta_data(this_scen_path,
         json.dump(obj={"load_seed": int(load_seed), "renew_seed": int(renew_seed), "gen_p_forecast_seed": int(gen_p_forecast_seed)},
                   fp=f)
     with open(os.path.join(this_scen_path, "generation_quality.json"), "w", encoding="utf-8") as f:
-        iter_num, mean_, percent_95, percent_99, max_ = quality
+        iter_num, mean_, percent_95, percent_99, max_ = quality[:5]
+        max_diff_history = list(quality[5]) if len(quality) > 5 else []
         json.dump(obj={"iter_num": int(iter_num),
                        "avg": float(mean_),
                        "percent_95": float(percent_95),
                        "percent_99": float(percent_99),
                        "max": float(max_), 
+                       "max_diff_history": [float(el) for el in max_diff_history],
                        "info": ("avg, percent_95, percent_99, max: this 'quality' is the difference between the DC solver and the AC solver. This is the number of "
                                 "MW that will differ from the grid2op observation compared to the generated data by chronix2grid.",
                                 "total_load, total_gen: total amount of energy consumed / produced for the generated scenario.",
@@ -1053,6 +1213,7 @@ def save_meta_data(this_scen_path,
                                 "wind_curtailed_losses: total (in energy) wind power curtailed by the loss",
                                 "solar_curtailed_opf: total (in energy) solar power curtailed by the OPF",
                                 "iter_num: number of iteration of the loss algorithm",
+                                "max_diff_history: max difference between the DC solver and the AC solver at each iteration of the loss algorithm (the last one is 'max')",
                                 "generation_time: total time spent to generate these data (in seconds)",
                                 "saving_time: total time spent to save the generated data (in seconds), this excludes the metadata saving time",
                                 ),
@@ -1093,7 +1254,9 @@ def generate_a_scenario(path_env,
                         RampErrorCorrRatio=0.95,
                         threshold_stop=0.05,
                         max_iter=100,
-                        debug=True  # TODO more feature !
+                        debug=True,  # TODO more feature !
+                        output_format=CSV_FORMAT,
+                        profile=False
                         ):
     """This function generates and save the data for a scenario.
     
@@ -1128,12 +1291,51 @@ def generate_a_scenario(path_env,
         _description_
     gen_p_forecast_seed : _type_
         _description_
+    output_format : str, optional
+        format of the saved files, by default "csv.bz2" (see :func:`save_generated_data`)
+    profile : bool, optional
+        whether to record the wall time, cpu time and memory of the generation steps (and of each iteration of the
+        loss adjustment), written in profile.json in the folder of the scenario, by default False
+        (see :mod:`chronix2grid.profiling`)
 
     Returns
     -------
     _type_
         _description_
     """
+    profiler = profiling.StageProfiler() if profile else None
+    with profiling.activated(profiler):
+        res = _generate_a_scenario(path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id, load_seed,
+                                   renew_seed, gen_p_forecast_seed, handle_loss=handle_loss, nb_steps=nb_steps,
+                                   PmaxErrorCorrRatio=PmaxErrorCorrRatio, RampErrorCorrRatio=RampErrorCorrRatio,
+                                   threshold_stop=threshold_stop, max_iter=max_iter, debug=debug,
+                                   output_format=output_format)
+    this_scen_path = os.path.join(output_dir, f"{start_date}_{scen_id}") if output_dir is not None else None
+    if profiler is not None and this_scen_path is not None and os.path.exists(this_scen_path):
+        profiler.save(this_scen_path)
+    return res
+
+
+def _generate_a_scenario(path_env,
+                         name_gen,
+                         gen_type,
+                         output_dir, 
+                         start_date,
+                         dt,
+                         scen_id,
+                         load_seed,
+                         renew_seed,
+                         gen_p_forecast_seed,
+                         handle_loss=True,
+                         nb_steps=None,
+                         PmaxErrorCorrRatio=0.9,
+                         RampErrorCorrRatio=0.95,
+                         threshold_stop=0.05,
+                         max_iter=100,
+                         debug=True,  # TODO more feature !
+                         output_format=CSV_FORMAT
+                         ):
+    """Generation of :func:`generate_a_scenario`, with its stages marked for the active profiler"""
     beg_ = time.perf_counter()
     scenario_id = f"{start_date}_{scen_id}"
     dt_dt = timedelta(minutes=int(dt))
@@ -1149,18 +1351,20 @@ def generate_a_scenario(path_env,
     gens_charac = pd.read_csv(os.path.join(path_env, "prods_charac.csv"), sep=",")
     
     # conso generation
-    load_p, load_q, load_p_forecasted, load_q_forecasted = generate_loads(path_env,
-                                                                          load_seed,
-                                                                          start_date_dt,
-                                                                          end_date_dt,
-                                                                          dt,
-                                                                          number_of_minutes,
-                                                                          generic_params,
-                                                                          day_lag=6  # TODO 6 because it's 2050
-                                                                          )
+    with profiling.stage('loads'):
+        load_p, load_q, load_p_forecasted, load_q_forecasted = generate_loads(path_env,
+                                                                              load_seed,
+                                                                              start_date_dt,
+                                                                              end_date_dt,
+                                                                              dt,
+                                                                              number_of_minutes,
+                                                                              generic_params,
+                                                                              day_lag=6  # TODO 6 because it's 2050
+                                                                              )
     
     # renewable energy sources generation
-    res_renew = generate_renewable_energy_sources(path_env,renew_seed, start_date_dt, end_date_dt, dt, number_of_minutes, generic_params, gens_charac)
+    with profiling.stage('renewables'):
+        res_renew = generate_renewable_energy_sources(path_env,renew_seed, start_date_dt, end_date_dt, dt, number_of_minutes, generic_params, gens_charac)
     prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = res_renew
 
     if prod_solar.isna().any().any():
@@ -1180,8 +1384,9 @@ def generate_a_scenario(path_env,
     final_gen_p = final_gen_p[name_gen]
     
     # generate economic dispatch
-    res_disp = generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_of_minutes, generic_params,
-                                          load_p, prod_solar, prod_wind, name_gen, gen_type, scenario_id, final_gen_p, gens_charac)
+    with profiling.stage('dispatch'):
+        res_disp = generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_of_minutes, generic_params,
+                                              load_p, prod_solar, prod_wind, name_gen, gen_type, scenario_id, final_gen_p, gens_charac)
     gen_p_after_dispatch, total_wind_curt_opf, total_solar_curt_opf, error_ = res_disp
     
     if error_ is not None:
@@ -1191,20 +1396,21 @@ def generate_a_scenario(path_env,
     # now try to move the generators so that when I run an AC powerflow, the setpoint of generators does not change "too much"
     if handle_loss:
         n_gen = len(name_gen)
-        res_gen_p_df, error_, quality_ = handle_losses(path_env,
-                                                       n_gen,
-                                                       name_gen,
-                                                       gens_charac,
-                                                       load_p,
-                                                       load_q,
-                                                       gen_p_after_dispatch,
-                                                       start_date_dt,
-                                                       dt_dt,
-                                                       scenario_id, 
-                                                       PmaxErrorCorrRatio=PmaxErrorCorrRatio,
-                                                       RampErrorCorrRatio=RampErrorCorrRatio,
-                                                       threshold_stop=threshold_stop,
-                                                       max_iter=max_iter)
+        with profiling.stage('losses'):
+            res_gen_p_df, error_, quality_ = handle_losses(path_env,
+                                                           n_gen,
+                                                           name_gen,
+                                                           gens_charac,
+                                                           load_p,
+                                                           load_q,
+                                                           gen_p_after_dispatch,
+                                                           start_date_dt,
+                                                           dt_dt,
+                                                           scenario_id, 
+                                                           PmaxErrorCorrRatio=PmaxErrorCorrRatio,
+                                                           RampErrorCorrRatio=RampErrorCorrRatio,
+                                                           threshold_stop=threshold_stop,
+                                                           max_iter=max_iter)
         if error_ is not None:
             # TODO log that !
             return error_, None, None, None, None, None, None, None
@@ -1222,16 +1428,18 @@ def generate_a_scenario(path_env,
         this_scen_path = os.path.join(output_dir, scenario_id)
         if not os.path.exists(this_scen_path):
             os.mkdir(this_scen_path)
-        save_generated_data(this_scen_path,
-                            load_p,
-                            load_p_forecasted,
-                            load_q,
-                            load_q_forecasted,
-                            final_gen_p,  # generated, before economic dispatch
-                            gen_p_after_dispatch,  # generated, after economic dispatch (and possibly curtailment)
-                            res_gen_p_df,
-                            res_gen_p_forecasted_df,
-                            debug=debug)
+        with profiling.stage('save'):
+            save_generated_data(this_scen_path,
+                                load_p,
+                                load_p_forecasted,
+                                load_q,
+                                load_q_forecasted,
+                                final_gen_p,  # generated, before economic dispatch
+                                gen_p_after_dispatch,  # generated, after economic dispatch (and possibly curtailment)
+                                res_gen_p_df,
+                                res_gen_p_forecasted_df,
+                                debug=debug,
+                                output_format=output_format)
         total_load = float(load_p.sum().sum())
         total_gen = float(res_gen_p_df.sum().sum())
         gen_p_per_step = res_gen_p_df.sum(axis=1)
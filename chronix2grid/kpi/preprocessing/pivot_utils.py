@@ -13,6 +13,7 @@ import numpy as np
 import pandas as pd
 
 import chronix2grid.constants as cst
+from chronix2grid.chronics_io import read_chronics
 import chronix2grid.default_backend as def_bk
 
 def usa_gan_trainingset_to_kpi(kpi_case_input_folder, timestep, prods_charac, loads_charac, params,year):
@@ -346,22 +347,22 @@ def chronics_to_kpi(chronics_repo, timestep, params, thermal = True):
         ## Format when all dispatch is generated
 
         # Read generated chronics after dispatch phase
-        prod_p = pd.read_csv(os.path.join(chronics_repo, 'prod_p.csv.bz2'),
-                             sep=';', decimal='.')
-        load_p = pd.read_csv(os.path.join(chronics_repo, 'load_p.csv.bz2'),
-                             sep=';', decimal='.')
-        price = pd.read_csv(os.path.join(chronics_repo, 'prices.csv.bz2'),
-                            sep=';', decimal='.')
+        prod_p = read_chronics(os.path.join(chronics_repo, 'prod_p.csv.bz2'),
+                               sep=';', decimal='.')
+        load_p = read_chronics(os.path.join(chronics_repo, 'load_p.csv.bz2'),
+                               sep=';', decimal='.')
+        price = read_chronics(os.path.join(chronics_repo, 'prices.csv.bz2'),
+                              sep=';', decimal='.')
 
         price['Time'] = datetime_index[:len(price)]
 
     else:
         ## Format synthetic chronics when no dispatch has been done
-        solar_p = pd.read_csv(os.path.join(chronics_repo, 'solar_p.csv.bz2'), sep=';', decimal='.')
-        wind_p = pd.read_csv(os.path.join(chronics_repo, 'wind_p.csv.bz2'), sep=';', decimal='.')
+        solar_p = read_chronics(os.path.join(chronics_repo, 'solar_p.csv.bz2'), sep=';', decimal='.')
+        wind_p = read_chronics(os.path.join(chronics_repo, 'wind_p.csv.bz2'), sep=';', decimal='.')
         prod_p = pd.concat([solar_p, wind_p], axis=1)
 
-        load_p = pd.read_csv(os.path.join(chronics_repo, 'load_p.csv.bz2'), sep=';', decimal='.')
+        load_p = read_chronics(os.path.join(chronics_repo, 'load_p.csv.bz2'), sep=';', decimal='.')
 
     prod_p['Time'] = datetime_index[:len(prod_p)]
     load_p['Time'] = datetime_index[:len(load_p)]
@@ -18,15 +18,22 @@ from numpy.random import default_rng
 
 from chronix2grid.GeneratorBackend import GeneratorBackend
 from chronix2grid import constants as cst
+from chronix2grid import dispatch_sweep as sweep
+from chronix2grid.chronics_io import export_to_csv, set_n_workers
+from chronix2grid.profiling import aggregate_profiles
 from chronix2grid.generation import generate_chronics as gen
 from chronix2grid.generation import generation_utils as gu
 from chronix2grid.kpi import main as kpis
+from chronix2grid.run_manifest import RunManifest, order_longest_first, run_scenario_task
 from chronix2grid.output_processor import (
     output_processor_to_chunks, write_start_dates_for_chunks)
 from chronix2grid.seed_manager import (parse_seed_arg, generate_default_seed,
                                        dump_seeds)
 from chronix2grid import utils as ut
 
+# GeneratorBackend of a worker process of generate_mp_core, with the configuration of the case loaded once
+_worker_generator = None
+
 
 @click.command()
 @click.option('--case', default='case118_l2rpn_neurips_1x', help='case folder to base generation on')
@@ -54,18 +61,76 @@ from chronix2grid import utils as ut
                    'in the chosen output directory.')
 @click.option('--scenario_name', default='', help='subname to add to the generated scenario output folder, as Scenario_subname_i')
 @click.option('--nb_core', default=1, help='number of cores to parallelize the number of scenarios')
+@click.option('--max-tasks-per-child', default=None, type=int,
+              help='number of scenarios after which a worker process is replaced (limits memory growth of the dispatch)')
+@click.option('--output-format', default=cst.DEFAULT_OUTPUT_FORMAT, type=click.Choice(cst.OUTPUT_FORMATS),
+              help='Format of the generated chronics. Only csv.bz2 can be read by grid2op, '
+                   'use chronix2grid-export-csv to convert the other ones')
+@click.option('--profile', is_flag=True,
+              help='Record the time and memory used by each generation stage, per scenario and for the whole run')
+@click.option('--cache-folder', default=None,
+              help='Folder where the outputs of the L, R, D and T stages are cached: a rerun only runs the stages '
+                   'whose inputs changed')
 def generate_mp(case, start_date, weeks, by_n_weeks, n_scenarios, mode,
              input_folder, output_folder, scenario_name,
-             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings):
+             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings, max_tasks_per_child,
+             output_format, profile, cache_folder):
     prng = default_rng()
     generate_mp_core(prng, case, start_date, weeks, by_n_weeks, n_scenarios, mode,
                      input_folder, output_folder, scenario_name,
-                     seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings)
+                     seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings,
+                     output_format=output_format, max_tasks_per_child=max_tasks_per_child, profile=profile,
+                     cache_folder=cache_folder)
+
+
+@click.command()
+@click.argument('folder')
+@click.option('--remove-source', is_flag=True, help='Remove the converted files')
+def export_csv(folder, remove_source):
+    """Converts the chronics generated in FOLDER (recursively) into the grid2op compatible csv.bz2 format"""
+    exported = export_to_csv(folder, remove_source=remove_source)
+    print(f'{len(exported)} files exported in csv.bz2')
+
+
+@click.command()
+@click.option('--case', default='case118_l2rpn_neurips_1x', help='case folder the scenarios were generated on')
+@click.option('--start-date', default='2012-01-01', help='Start date of the generated scenarios')
+@click.option('--weeks', default=4, help='Number of weeks of the generated scenarios')
+@click.option('--input-folder',
+              default=os.path.join(pathlib.Path(__file__).parent.absolute(),
+                                   cst.DEFAULT_INPUT_FOLDER_NAME),
+              help='Directory to read input files from.')
+@click.option('--output-folder',
+              default=os.path.join(os.path.normpath(os.getcwd()),
+                                   cst.DEFAULT_OUTPUT_FOLDER_NAME),
+              help='Directory where the scenarios were generated.')
+@click.option('--variants', required=True,
+              help='json file of the variants: variant name -> params_opf.json values to override '
+                   '(and marginal_costs by carrier)')
+@click.option('--scenario', 'scenarios', multiple=True,
+              help='scenario to dispatch (can be repeated), all the generated scenarios by default')
+@click.option('--sweep-folder', default=None,
+              help='Directory to store the results of the sweep, dispatch_sweep in the generation folder by default')
+@click.option('--nb_core', default=1, help='number of cores to parallelize the dispatches')
+@click.option('--output-format', default=cst.DEFAULT_OUTPUT_FORMAT, type=click.Choice(cst.OUTPUT_FORMATS),
+              help='Format of the dispatched chronics')
+def dispatch_sweep(case, start_date, weeks, input_folder, output_folder, variants, scenarios, sweep_folder,
+                   nb_core, output_format):
+    """Dispatches each variant of params_opf.json on the load and renewable scenarios already generated"""
+    generation_output_folder = os.path.join(output_folder, cst.GENERATION_FOLDER_NAME, case, start_date)
+    generator = GeneratorBackend(output_format=output_format)
+    try:
+        sweep.sweep_dispatch(generator, case, os.path.join(input_folder, cst.GENERATION_FOLDER_NAME),
+                             generation_output_folder, gu.time_parameters(weeks, start_date), variants,
+                             scenario_names=list(scenarios) or None, sweep_folder=sweep_folder, nb_core=nb_core)
+    finally:
+        rm_temporary_folders(input_folder, case)
 
 
 def generate_mp_core(prng, case, start_date, weeks, by_n_weeks, n_scenarios, mode,
              input_folder, output_folder, scenario_name,
-             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings):
+             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings,
+             output_format=cst.DEFAULT_OUTPUT_FORMAT, max_tasks_per_child=None, profile=False, cache_folder=None):
 
     start_time = time.time()
     print(case)
@@ -112,21 +177,63 @@ def generate_mp_core(prng, case, start_date, weeks, by_n_weeks, n_scenarios, mod
         seeds_for_res = [seed_for_res]
         seeds_for_disp = [seed_for_dispatch]
 
-    # multi-processing
-    pool = multiprocessing.Pool(nb_core)
-    iterable = [i for i in range(n_scenarios)]
+    # multi-processing: each worker reads the case configuration once, then only receives scenario ids.
+    # Scenarios are dispatched one by one (longest expected first) and their completion is streamed to the manifest
+    manifest = RunManifest(generation_output_folder)
+    iterable = order_longest_first(range(n_scenarios), scen_names, manifest.expected_durations())
     multiprocessing_func = partial(
         generate_per_scenario,
         case, start_date, weeks, by_n_weeks, mode, input_folder,
         kpi_output_folder, generation_output_folder, scen_names,
-        seeds_for_loads, seeds_for_res, seeds_for_disp, ignore_warnings)
-
-    pool.map(multiprocessing_func, iterable)
-    pool.close()
+        seeds_for_loads, seeds_for_res, seeds_for_disp, ignore_warnings,
+        output_format=output_format, profile=profile, cache_folder=cache_folder)
+    task_func = partial(
+        run_scenario_task, multiprocessing_func, scen_names,
+        dict(loads=seeds_for_loads, renewables=seeds_for_res, dispatch=seeds_for_disp))
+
+    failed = []
+    with multiprocessing.Pool(nb_core, initializer=init_worker,
+                              initargs=(case, input_folder, generation_output_folder, mode, output_format, profile,
+                                        cache_folder, nb_core),
+                              maxtasksperchild=max_tasks_per_child) as pool:
+        for n_done, record in enumerate(pool.imap_unordered(task_func, iterable, chunksize=1), start=1):
+            manifest.append(record)
+            status = 'done' if record['success'] else 'FAILED'
+            print(f"[{n_done}/{n_scenarios}] {record['scenario_name']} {status} in {record['wall_time']:.1f} seconds")
+            if not record['success']:
+                print(record['error'])
+                failed.append(record['scenario_name'])
     print('multiprocessing done')
     print('Time taken = {} seconds'.format(time.time() - start_time))
+    if profile:
+        summary = aggregate_profiles(
+            [os.path.join(generation_output_folder, scen_names(i), cst.PROFILE_FILE_NAME) for i in range(n_scenarios)])
+        summary_path = os.path.join(generation_output_folder, cst.PROFILE_SUMMARY_FILE_NAME)
+        summary.to_csv(summary_path, index=False)
+        print(f'Profile of the generation stages written in {summary_path}')
     print('removing temporary folders if exist:')
     rm_temporary_folders(input_folder, case)
+    if failed:
+        raise RuntimeError(f"Generation failed for scenarios {', '.join(failed)}, see {manifest.path}")
+
+def init_worker(case, input_folder, generation_output_folder, mode, output_format=cst.DEFAULT_OUTPUT_FORMAT,
+                profile=False, cache_folder=None, nb_core=None):
+    """
+    Initializer of the worker processes of :func:`generate_mp_core`. It creates the :class:`GeneratorBackend` of the
+    worker and loads the configuration of ``case`` once, so that it is reused by all the scenarios of this worker.
+    If the configuration can not be loaded here, it is read again by each scenario (and the error raised there).
+    ``nb_core`` is the number of workers of the pool, among which the cpus of the csv writer are shared.
+    """
+    global _worker_generator
+    set_n_workers(nb_core)
+    generator = GeneratorBackend(output_format=output_format, profile=profile, cache_folder=cache_folder)
+    try:
+        generator.load_case(case, os.path.join(input_folder, cst.GENERATION_FOLDER_NAME),
+                            generation_output_folder, mode)
+    except Exception as e:
+        print(f'Case configuration could not be loaded once for all scenarios: {e}')
+    _worker_generator = generator
+
 
 def rm_temporary_folders(input_folder, case):
     grid2op_tempo = os.path.join(input_folder, cst.GENERATION_FOLDER_NAME, case, 'chronics')
@@ -136,7 +243,8 @@ def rm_temporary_folders(input_folder, case):
 
 def generate_per_scenario(case, start_date, weeks, by_n_weeks, mode,
              input_folder, kpi_output_folder, generation_output_folder, scen_names,
-             seeds_for_loads, seeds_for_res, seeds_for_dispatch, ignore_warnings, scenario_id):
+             seeds_for_loads, seeds_for_res, seeds_for_dispatch, ignore_warnings, scenario_id,
+             output_format=cst.DEFAULT_OUTPUT_FORMAT, profile=False, cache_folder=None):
     
     n_scenarios_sub_p = 1  # one scenario to compute per process``
     scenario_name = scen_names(scenario_id)
@@ -168,13 +276,15 @@ def generate_per_scenario(case, start_date, weeks, by_n_weeks, mode,
     generate_inner(
         case, start_date, weeks, by_n_weeks, n_scenarios_sub_p, mode,
         input_folder, kpi_output_folder, generation_output_folder,
-        scen_names, seed_for_loads, seed_for_res, seed_for_dispatch, scenario_id)
+        scen_names, seed_for_loads, seed_for_res, seed_for_dispatch, scenario_id,
+        output_format=output_format, profile=profile, cache_folder=cache_folder)
     
 
 def generate_inner(case, start_date, weeks, by_n_weeks, n_scenarios, mode,
                    input_folder, kpi_output_folder, generation_output_folder,
                    scen_names, seed_for_loads, seed_for_res,
-                   seed_for_dispatch, scenario_id=None):
+                   seed_for_dispatch, scenario_id=None, output_format=cst.DEFAULT_OUTPUT_FORMAT, profile=False,
+                   cache_folder=None):
 
     ut.check_scenario(n_scenarios, scenario_id)
     time_parameters = gu.time_parameters(weeks, start_date)
@@ -190,7 +300,13 @@ def generate_inner(case, start_date, weeks, by_n_weeks, n_scenarios, mode,
 
     # Chronic generation
     if 'L' in mode or 'R' in mode:
-        generator = GeneratorBackend()
+        generator = _worker_generator
+        if cache_folder is not None:
+            cache_folder = os.path.abspath(cache_folder)
+        cache_changed = generator is not None and cache_folder != (
+            generator.stage_cache.folder if generator.stage_cache is not None else None)
+        if generator is None or generator.output_format != output_format or generator.profile != profile or cache_changed:
+            generator = GeneratorBackend(output_format=output_format, profile=profile, cache_folder=cache_folder)
         params, loads_charac, prods_charac = gen.main(generator,
             case, n_scenarios, generation_input_folder,
             generation_output_folder, scen_names, time_parameters,
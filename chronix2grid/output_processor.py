@@ -15,6 +15,7 @@ import pathlib
 
 from .generation import generation_utils as gu
 from chronix2grid import constants as cst
+from chronix2grid.chronics_io import CSV_FORMAT, chronics_format, read_chronics, write_chronics
 
 
 def write_start_dates_for_chunks(output_path, scenario_name, n_weeks, by_n_weeks,
@@ -85,8 +86,13 @@ def output_processor_to_chunks(output_path, scenario_name, by_n_weeks, n_scenari
 
 def generate_chunks(csv_files_to_process, chunk_size, sep=','):
     for csv_file in csv_files_to_process:
-        cut_df = cut_csv_file_into_chunks(csv_file, chunk_size, sep=sep)
-        save_chunks(cut_df, csv_file, index=False)
+        output_format = chronics_format(csv_file)
+        if output_format is None or output_format == CSV_FORMAT:
+            cut_df = cut_csv_file_into_chunks(csv_file, chunk_size, sep=sep)
+            save_chunks(cut_df, csv_file, index=False)
+        else:
+            cut_df = dataframe_cutter(read_chronics(csv_file), chunk_size)
+            save_chunks(cut_df, csv_file, output_format=output_format)
 
 
 def cut_csv_file_into_chunks(csv_file_path, chunk_size, **kwargs):
@@ -94,17 +100,18 @@ def cut_csv_file_into_chunks(csv_file_path, chunk_size, **kwargs):
     return dataframe_cutter(df, chunk_size)
 
 
-def save_chunks(chunks, original_file_path, **kwargs):
+def save_chunks(chunks, original_file_path, output_format=None, **kwargs):
     parent_dir = pathlib.Path(original_file_path).parent.absolute()
     original_file_name = pathlib.Path(original_file_path).name
     chunk_folder_name_generator = gu.folder_name_pattern('chunk', len(chunks))
     for i, chunk in enumerate(chunks):
         chunk_folder_name = chunk_folder_name_generator(i)
         os.makedirs(os.path.join(parent_dir, chunk_folder_name), exist_ok=True)
-        chunk.to_csv(
-            os.path.join(parent_dir, chunk_folder_name, original_file_name),
-            **kwargs
-        )
+        chunk_file_path = os.path.join(parent_dir, chunk_folder_name, original_file_name)
+        if output_format is None:
+            chunk.to_csv(chunk_file_path, **kwargs)
+        else:
+            write_chronics(chunk, chunk_file_path, output_format, **kwargs)
 
 
 def dataframe_cutter(df, chunk_size):
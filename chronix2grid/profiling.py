@@ -0,0 +1,175 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Instrumentation of the generation process: wall time, cpu time and memory of each stage and sub stage.
+
+The generation code marks its stages with :func:`stage`. This is a no-op unless a :class:`StageProfiler` has been
+activated (see :func:`activated`), which is what :class:`chronix2grid.GeneratorBackend.GeneratorBackend` does for
+each scenario when it is created with ``profile=True``.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from chronix2grid import constants as cst
+
+try:
+    import resource
+except ImportError:
+    # not available on windows: peak memory is not recorded
+    resource = None
+
+_active_profiler = None
+
+
+def rss_mb():
+    """
+    Current resident memory of the current process, in MB (None if it can not be measured)
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            n_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        # only available on linux
+        return None
+    return n_pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+
+def process_peak_rss_mb():
+    """
+    Peak resident memory of the current process since its start, in MB (None if it can not be measured). It is
+    cumulative: a stage can not lower it, and a stage run after a more demanding one reports the peak of the latter
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss / 1024 ** 2  # bytes
+    return max_rss / 1024  # kilobytes
+
+
+class StageProfiler:
+    """
+    Records the resources used by nested stages.
+
+    Each record contains the full name of the stage (names of the enclosing stages joined by "/"), its start time
+    relative to the creation of the profiler, its wall time and cpu time in seconds and, in MB, the resident memory of
+    the process at its end, the variation of the resident memory during the stage and the peak resident memory of the
+    process since its start (see :func:`process_peak_rss_mb`). A stage run several times (*e.g.* loss iterations) gives
+    one record per run.
+
+    Attributes
+    ----------
+    records: ``list``
+        one ``dict`` per completed stage
+    """
+    def __init__(self):
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        self._stack.append(str(name))
+        full_name = '/'.join(self._stack)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rss_start = rss_mb()
+        try:
+            yield
+        finally:
+            rss_end = rss_mb()
+            self.records.append(dict(
+                stage=full_name,
+                depth=len(self._stack) - 1,
+                start=wall_start - self._origin,
+                wall_time=time.perf_counter() - wall_start,
+                cpu_time=time.process_time() - cpu_start,
+                rss_mb=rss_end,
+                rss_delta_mb=rss_end - rss_start if rss_end is not None and rss_start is not None else None,
+                process_peak_rss_mb=process_peak_rss_mb()
+            ))
+            self._stack.pop()
+
+    def to_frame(self):
+        columns = ['stage', 'depth', 'start', 'wall_time', 'cpu_time', 'rss_mb', 'rss_delta_mb',
+                   'process_peak_rss_mb']
+        return pd.DataFrame(self.records, columns=columns).sort_values('start', kind='stable')
+
+    def save(self, folder, file_name=cst.PROFILE_FILE_NAME):
+        """
+        Writes the records in json in ``folder``
+        """
+        path = os.path.join(folder, file_name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_frame().to_dict(orient='records'), f, indent=1)
+        return path
+
+
+@contextmanager
+def activated(profiler):
+    """
+    Makes ``profiler`` record the stages marked with :func:`stage` (nothing is recorded if it is None)
+    """
+    global _active_profiler
+    previous = _active_profiler
+    _active_profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _active_profiler = previous
+
+
+@contextmanager
+def stage(name):
+    """
+    Marks a stage of the generation process for the active profiler, if any
+    """
+    if _active_profiler is None:
+        yield
+    else:
+        with _active_profiler.stage(name):
+            yield
+
+
+def aggregate_profiles(profile_paths):
+    """
+    Aggregates the profiles written by :meth:`StageProfiler.save` for several scenarios
+
+    Returns
+    -------
+    summary: :class:`pandas.DataFrame`
+        number of runs, total, mean and max wall time, total and mean cpu time, max resident memory, max variation of
+        resident memory and max process peak memory of each stage
+    """
+    frames = []
+    for path in profile_paths:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                frames.append(pd.DataFrame(json.load(f)))
+    if not frames:
+        return pd.DataFrame()
+    profiles = pd.concat(frames, ignore_index=True)
+    summary = profiles.groupby('stage', sort=False).agg(
+        n_runs=('wall_time', 'size'),
+        wall_time_total=('wall_time', 'sum'),
+        wall_time_mean=('wall_time', 'mean'),
+        wall_time_max=('wall_time', 'max'),
+        cpu_time_total=('cpu_time', 'sum'),
+        cpu_time_mean=('cpu_time', 'mean'),
+        rss_mb_max=('rss_mb', 'max'),
+        rss_delta_mb_max=('rss_delta_mb', 'max'),
+        process_peak_rss_mb_max=('process_peak_rss_mb', 'max'),
+    )
+    return summary.reset_index()
@@ -0,0 +1,111 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import time
+import traceback
+from datetime import datetime
+
+from chronix2grid import constants as cst
+
+
+class RunManifest:
+    """
+    Journal of a multi-scenario run, stored as one json record per line in the output folder.
+
+    Records are appended (and flushed) as soon as a scenario completes, so that the manifest can be followed
+    during the run and is still meaningful if the run is interrupted.
+
+    Attributes
+    ----------
+    path: ``str``
+        path of the manifest file
+    """
+    def __init__(self, output_folder, file_name=cst.RUN_MANIFEST_FILE_NAME):
+        self.path = os.path.join(output_folder, file_name)
+
+    def read(self):
+        """
+        Returns the records already written in the manifest (an empty list if there is none)
+        """
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # last line of an interrupted run
+                        pass
+        return records
+
+    def append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+
+    def expected_durations(self):
+        """
+        Wall time of the last successful run of each scenario name found in the manifest
+        """
+        return {record['scenario_name']: record['wall_time'] for record in self.read()
+                if record.get('success') and record.get('wall_time') is not None}
+
+
+def order_longest_first(scenario_ids, scenario_names, expected_durations):
+    """
+    Orders ``scenario_ids`` by decreasing expected duration, so that the longest scenarios do not end up in the
+    tail of the run. Scenarios without known duration are considered the longest, and ties keep their order.
+    """
+    def expected(scenario_id):
+        return expected_durations.get(scenario_names(scenario_id), float('inf'))
+    return sorted(scenario_ids, key=lambda scenario_id: -expected(scenario_id))
+
+
+def run_scenario_task(func, scen_names, seeds, scenario_id):
+    """
+    Runs ``func(scenario_id)`` and returns its completion record for the run manifest. Exceptions are caught and
+    reported in the record so that one failing scenario does not stop the others.
+
+    Parameters
+    ----------
+    func: ``callable``
+        generation of one scenario
+    scen_names: ``callable``
+        gives the name of a scenario from its id
+    seeds: ``dict``
+        lists of seeds of all the scenarios, by generation step
+    scenario_id: ``int``
+
+    Returns
+    -------
+    record: ``dict``
+    """
+    record = dict(
+        scenario_id=int(scenario_id),
+        scenario_name=scen_names(scenario_id),
+        seeds={step: int(step_seeds[scenario_id]) for step, step_seeds in seeds.items()},
+        pid=os.getpid(),
+        start=datetime.now().isoformat(timespec='seconds')
+    )
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        func(scenario_id)
+        record['success'] = True
+        record['error'] = None
+    except Exception:
+        record['success'] = False
+        record['error'] = traceback.format_exc()
+    record['wall_time'] = time.perf_counter() - wall_start
+    record['cpu_time'] = time.process_time() - cpu_start
+    return record
@@ -0,0 +1,213 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Content-addressed cache of the outputs of the generation stages (L, R, D, T) of a scenario.
+
+The key of a stage is a hash of everything its output depends on: the content of its input files in the case and
+patterns folders, its parameters, its seed, the period generated, the output format, the class of its backend and the
+keys of the stages it uses (a new load invalidates the loss and the dispatch). An entry contains the files written by
+the stage in the folder of the scenario and the (pickled) value it returned, so that a rerun with the same inputs
+copies them back instead of running the stage again, and only runs the stages whose inputs changed
+(*e.g.* only T when params_opf.json is tuned).
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+# bump to invalidate the entries written by previous versions of the generation
+CACHE_VERSION = 1
+
+# input files of each stage: (folder, file name) with folder 'case' or 'patterns', file name None for the whole folder
+STAGE_INPUT_FILES = {
+    'L': [('case', 'params.json'), ('case', 'params_load.json'), ('case', 'loads_charac.csv'),
+          ('patterns', 'load_weekly_pattern.csv')],
+    'R': [('case', 'params.json'), ('case', 'params_res.json'), ('case', 'prods_charac.csv'),
+          ('patterns', 'solar_pattern.npy')],
+    'D': [('case', 'params.json'), ('case', 'params_loss.json'), ('case', 'loss_surrogate.json'),
+          ('patterns', None)],
+    'T': [('case', None), ('patterns', 'hydro_french.csv')],
+}
+
+# not inputs of the stages (temporary grid2op environment, byte code)
+IGNORED_INPUT_FOLDERS = ('chronics', '__pycache__')
+
+RESULT_FILE_NAME = 'result.pkl'
+INFO_FILE_NAME = 'info.json'
+FILES_FOLDER_NAME = 'files'
+
+
+def _file_digest(path):
+    if not os.path.isfile(path):
+        return 'missing'
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _folder_digests(folder):
+    digests = {}
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_INPUT_FOLDERS)
+        for file_name in sorted(files):
+            path = os.path.join(root, file_name)
+            digests[os.path.relpath(path, folder)] = _file_digest(path)
+    return digests
+
+
+def class_name(cls):
+    """
+    Full name of a class (None if cls is None), to be used in the keys
+    """
+    if cls is None:
+        return None
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def snapshot(folder):
+    """
+    Modification time and size of each file of ``folder`` (recursively), to find the files written by a stage
+    """
+    state = {}
+    if os.path.isdir(folder):
+        for root, _, files in os.walk(folder):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                state[os.path.relpath(path, folder)] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+class StageCache:
+    """
+    Cache of the stage outputs, stored in ``folder``/<stage>/<key>
+
+    Parameters
+    ----------
+    folder: ``str``
+        folder of the cache, shared by all the runs (and processes) that should reuse the same stage outputs
+
+    Attributes
+    ----------
+    hits, misses: ``dict``
+        number of stage outputs found in the cache / computed, by stage
+    """
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.hits = {}
+        self.misses = {}
+        self._input_digests = {}
+
+    def input_digests(self, stage, input_folder, case):
+        """
+        Digests of the input files of ``stage`` (see :data:`STAGE_INPUT_FILES`), computed once per cache object
+        """
+        key = (stage, os.path.abspath(input_folder), case)
+        if key not in self._input_digests:
+            folders = dict(case=os.path.join(input_folder, case), patterns=os.path.join(input_folder, 'patterns'))
+            digests = {}
+            for folder, file_name in STAGE_INPUT_FILES[stage]:
+                if file_name is None:
+                    digests.update({f'{folder}/{name}': digest
+                                    for name, digest in _folder_digests(folders[folder]).items()})
+                else:
+                    digests[f'{folder}/{file_name}'] = _file_digest(os.path.join(folders[folder], file_name))
+            self._input_digests[key] = digests
+        return self._input_digests[key]
+
+    def key(self, stage, input_folder, case, **inputs):
+        """
+        Key of the output of ``stage``: hash of its input files and of ``inputs`` (parameters, seed, period, backend
+        class, keys of the upstream stages...), that must be serializable in json (dates and other objects are
+        converted with ``str``)
+        """
+        content = dict(version=CACHE_VERSION, stage=stage,
+                       files=self.input_digests(stage, input_folder, case), inputs=inputs)
+        serialized = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.blake2b(serialized.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _entry(self, stage, key):
+        return os.path.join(self.folder, stage, key)
+
+    def load(self, stage, key, scenario_folder_path):
+        """
+        Copies the files of the entry (``stage``, ``key``) in ``scenario_folder_path``
+
+        Returns
+        -------
+        found: ``bool``
+            whether the entry is in the cache
+        result:
+            value returned by the stage when it was run (None if not found)
+        """
+        entry = self._entry(stage, key)
+        result_path = os.path.join(entry, RESULT_FILE_NAME)
+        if not os.path.isfile(result_path):
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            return False, None
+        with open(result_path, 'rb') as f:
+            result = pickle.load(f)
+        files_folder = os.path.join(entry, FILES_FOLDER_NAME)
+        for relative_path in snapshot(files_folder):
+            destination = os.path.join(scenario_folder_path, relative_path)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(os.path.join(files_folder, relative_path), destination)
+        self.hits[stage] = self.hits.get(stage, 0) + 1
+        return True, result
+
+    def store(self, stage, key, scenario_folder_path, result, before):
+        """
+        Stores the files of ``scenario_folder_path`` written since the ``before`` :func:`snapshot` and ``result`` as
+        the entry (``stage``, ``key``). Nothing is stored if ``result`` can not be pickled.
+        """
+        entry = self._entry(stage, key)
+        if os.path.isdir(entry):
+            return
+        try:
+            pickled_result = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f'The output of stage {stage} can not be cached: {e}')
+            return
+        after = snapshot(scenario_folder_path)
+        written = sorted(path for path, state in after.items() if before.get(path) != state)
+
+        # written in a temporary folder then renamed, so that an interrupted run leaves no partial entry
+        tmp_entry = f'{entry}.tmp-{os.getpid()}'
+        files_folder = os.path.join(tmp_entry, FILES_FOLDER_NAME)
+        os.makedirs(files_folder, exist_ok=True)
+        for relative_path in written:
+            destination = os.path.join(files_folder, relative_path)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(os.path.join(scenario_folder_path, relative_path), destination)
+        with open(os.path.join(tmp_entry, INFO_FILE_NAME), 'w', encoding='utf-8') as f:
+            json.dump(dict(stage=stage, key=key, files=written), f, indent=1)
+        with open(os.path.join(tmp_entry, RESULT_FILE_NAME), 'wb') as f:
+            f.write(pickled_result)
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # stored meanwhile by another process
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    def cached(self, stage, key, scenario_folder_path, compute):
+        """
+        Output of ``stage``: loaded from the cache if it is there, else computed by ``compute()`` and stored
+        """
+        found, result = self.load(stage, key, scenario_folder_path)
+        if found:
+            print(f'Stage {stage} loaded from the cache ({key})')
+            return result
+        before = snapshot(scenario_folder_path)
+        result = compute()
+        self.store(stage, key, scenario_folder_path, result, before)
+        return result
@@ -19,6 +19,7 @@ import json
 from lightsim2grid import LightSimBackend
 from chronix2grid.generation.dispatch.EconomicDispatch import ChroniXScenario
 from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
+from chronix2grid.grid2op_utils.utils import get_env_for_loss
 
 from scipy.optimize import lsq_linear
 from scipy.sparse import identity, csr_matrix, vstack
@@ -150,27 +151,13 @@ def adjust_gens(all_loss_orig,
         # print(f"max diff vs prev: {diff_plan.max():.2f}")
         
         # re evaluate the losses
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            env_fixed = grid2op.make(
-                env_path,
-                test=True,
-                # grid_path=grid_path, # assign it the 118 grid
-                param=env_param,
-                backend=LightSimBackend(),
-                chronics_class=FromNPY,
-                chronics_path=path_chronix2grid,
-                data_feeding_kwargs={"load_p": load_p,
-                                     "load_q": load_q,
-                                     "prod_p": 1.0 * res_gen_p,
-                                     "prod_v": gen_v}
-                )
+        env_fixed = get_env_for_loss(env_path, env_param, load_p, load_q, res_gen_p, gen_v)
+        obs = env_fixed.reset()
         
         diff_ = np.full((env_fixed.max_episode_duration(), env_fixed.n_gen), fill_value=np.NaN)
         all_loss[:] = np.NaN
         
         i = 0
-        obs = env_fixed.reset()
         all_loss[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
         diff_[i] = obs.gen_p - res_gen_p[i]
         
@@ -70,7 +70,8 @@ setup(name='Chronix2Grid',
                         ],
       extras_require = {
                         "optional": [
-                            "ligthsim2grid"
+                            "ligthsim2grid",
+                            "pyarrow"
                         ],
                         "docs": [
                             "numpydoc>=0.9.2",
@@ -87,5 +88,7 @@ setup(name='Chronix2Grid',
                                     'getting_started/example/input/kpi/case118_l2rpn_neurips_1x/paramsKPI.json',
                                     'getting_started/example/input/kpi/case118_l2rpn_neurips_1x/France/eco2mix/*.csv',
                                     'getting_started/example/input/kpi/case118_l2rpn_neurips_1x/France/renewable_ninja/*.csv']},
-      entry_points={'console_scripts': ['chronix2grid=chronix2grid.main:generate_mp']}
+      entry_points={'console_scripts': ['chronix2grid=chronix2grid.main:generate_mp',
+                                        'chronix2grid-export-csv=chronix2grid.main:export_csv',
+                                        'chronix2grid-dispatch-sweep=chronix2grid.main:dispatch_sweep']}
 )
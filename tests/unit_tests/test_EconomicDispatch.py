@@ -20,7 +20,12 @@ import chronix2grid.constants as cst
 import chronix2grid.default_backend as def_bk
 from chronix2grid.generation.dispatch.EconomicDispatch import (
             ChroniXScenario, init_dispatcher_from_config)
-from chronix2grid.generation.dispatch.utils import modify_hydro_ramps, modify_slack_characs
+from chronix2grid.generation.dispatch.utils import RampMode, modify_hydro_ramps, modify_slack_characs
+from chronix2grid.generation.dispatch.hydro_guide_curves import HydroGuideCurves, minute_of_year
+from chronix2grid.generation._dispatch._PypsaDispatchBackend._EDispatch_L2RPN2020.utils import (
+            boundary_ramp_violations, pin_boundary_steps, refinement_bounds, marginal_unit_prices)
+from chronix2grid.generation._dispatch._PypsaDispatchBackend._EDispatch_L2RPN2020.lp_model import CopperPlateLP
+from chronix2grid.generation.dispatch.LPDispatchBackend import LPDispatcher
 import grid2op
 from grid2op.Chronics import ChangeNothing
 
@@ -114,6 +119,32 @@ class TestDispatch(unittest.TestCase):
                                0.482099426, places=5)
 
 
+class TestHydroGuideCurves(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.hydro_file_path = os.path.join(self.tmp_dir.name, 'hydro.csv')
+        pd.DataFrame({'date': ['2007-01-01 00:00', '2007-02-28 12:00', '2007-03-01 00:00', '2007-12-31 23:00'],
+                      'dummy': 0.,
+                      'p_min_u': [0.1, 0.2, 0.3, 0.4],
+                      'p_max_u': [0.5, 0.6, 0.7, 0.8]}).to_csv(self.hydro_file_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_minute_of_year(self):
+        # counted in a leap year whatever the year of the dates
+        minutes = minute_of_year(pd.to_datetime(['2012-01-01 00:05', '2012-02-29 00:00', '2013-03-01 00:00']))
+        np.testing.assert_array_equal(minutes, [5, 59 * 1440, 60 * 1440])
+
+    def test_lookup(self):
+        guide_curves = HydroGuideCurves.from_csv(self.hydro_file_path)
+        dates = pd.to_datetime(['2012-01-01 00:00', '2012-01-15 10:05', '2012-02-29 06:00', '2012-03-01 00:00',
+                                '2012-12-31 23:55', '2013-02-28 12:00'])
+        p_min_pu, p_max_pu = guide_curves.lookup(dates)
+        np.testing.assert_array_almost_equal(p_min_pu, [0.1, 0.1, 0.2, 0.3, 0.4, 0.2])
+        np.testing.assert_array_almost_equal(p_max_pu, [0.5, 0.5, 0.6, 0.7, 0.8, 0.6])
+
+
 class TestChronixScenario(unittest.TestCase):
     def setUp(self):
         self.input_folder = os.path.join(
@@ -175,5 +206,132 @@ class TestChronixScenario(unittest.TestCase):
         self.assertEqual(float(simplified_chronix.solar_p.iloc[0]), 6)
 
 
+class TestOpfWindows(unittest.TestCase):
+    def setUp(self):
+        self.ramp_up = pd.Series({'gen_0': 10., 'gen_1': np.nan})
+        self.ramp_down = pd.Series({'gen_0': 5., 'gen_1': np.nan})
+
+    def test_boundary_ramp_violations(self):
+        last = pd.Series({'gen_0': 50., 'gen_1': 0.})
+        self.assertListEqual(boundary_ramp_violations(last, last + 10., self.ramp_up, self.ramp_down), [])
+        self.assertListEqual(boundary_ramp_violations(last, last - 10., self.ramp_up, self.ramp_down), ['gen_0'])
+
+    def test_pin_boundary_steps(self):
+        dispatch = pd.DataFrame({'gen_0': [50., 30., 20., 40.], 'gen_1': [0., 0., 0., 0.]})
+        p_nom = pd.Series({'gen_0': 100., 'gen_1': 0.})
+        gen_min_pu_t, gen_max_pu_t = pin_boundary_steps(dispatch, p_nom,
+                                                        pd.Series({'gen_0': 0., 'gen_1': 0.}),
+                                                        pd.Series({'gen_0': 1., 'gen_1': 1.}), tol=0.)
+        self.assertListEqual(list(gen_min_pu_t), ['gen_0'])
+        np.testing.assert_array_almost_equal(gen_min_pu_t['gen_0'], [0.5, 0., 0., 0.4])
+        np.testing.assert_array_almost_equal(gen_max_pu_t['gen_0'], [0.5, 1., 1., 0.4])
+
+    def test_refinement_bounds(self):
+        coarse = pd.DataFrame({'gen_0': [50., 60., 95.], 'gen_1': [0., 0., 0.], 'gen_2': [0., 5., 10.]})
+        p_nom = pd.Series({'gen_0': 100., 'gen_1': 0., 'gen_2': 10.})
+        p_min_pu = pd.Series({'gen_0': 0., 'gen_1': 0., 'gen_2': 0.})
+        p_max_pu = pd.Series({'gen_0': 1., 'gen_1': 1., 'gen_2': 0.8})
+        gen_min_pu_t, gen_max_pu_t = refinement_bounds(coarse, p_nom, p_min_pu, p_max_pu, band_pu=0.1)
+        self.assertListEqual(list(gen_min_pu_t), ['gen_0', 'gen_2'])
+        np.testing.assert_array_almost_equal(gen_min_pu_t['gen_0'], [0.4, 0.5, 0.85])
+        np.testing.assert_array_almost_equal(gen_max_pu_t['gen_0'], [0.6, 0.7, 1.])
+        # beyond its static max, the coarse dispatch is brought back to it
+        np.testing.assert_array_almost_equal(gen_min_pu_t['gen_2'], [0., 0.4, 0.8])
+        np.testing.assert_array_almost_equal(gen_max_pu_t['gen_2'], [0.1, 0.6, 0.8])
+
+        gen_min_pu_t, gen_max_pu_t = refinement_bounds(coarse, p_nom, p_min_pu, p_max_pu)
+        np.testing.assert_array_equal(gen_min_pu_t['gen_0'], [0., 0., 0.])
+        np.testing.assert_array_equal(gen_max_pu_t['gen_2'], [0.8, 0.8, 0.8])
+
+    def test_marginal_unit_prices(self):
+        dispatch = pd.DataFrame({'gen_0': [50., 0., 10.], 'gen_1': [10., 0., 0.], 'gen_2': [5., 0., 1.]})
+        marginal_costs = pd.Series({'gen_0': 20., 'gen_1': 30., 'gen_2': np.nan})
+        prices = marginal_unit_prices(dispatch, marginal_costs)
+        expected = dispatch.apply(lambda row: marginal_costs[row[row > 0].index].max(), axis=1)
+        np.testing.assert_array_equal(prices.values, expected.values)
+        np.testing.assert_array_equal(prices.values, [30., np.nan, 20.])
+
+
+class TestCopperPlateLP(unittest.TestCase):
+    def setUp(self):
+        # a cheap generator with slow ramps and an expensive one without ramp constraint
+        self.lp_model = CopperPlateLP(['cheap', 'expensive'], p_nom=[100., 100.], marginal_cost=[1., 10.],
+                                      ramp_up=[10., np.nan], ramp_down=[10., np.nan],
+                                      p_min_pu=[0., 0.], p_max_pu=[1., 1.])
+
+    def test_solve(self):
+        demand = np.array([0., 50., 50., 50., 50., 50.])
+        p_min = np.zeros((6, 2))
+        p_max = np.full((6, 2), 100.)
+        dispatch, termination_condition = self.lp_model.solve(demand, p_min, p_max)
+        self.assertEqual(termination_condition, 'optimal')
+        np.testing.assert_array_almost_equal(dispatch[:, 0], [0., 10., 20., 30., 40., 50.])
+        np.testing.assert_array_almost_equal(dispatch.sum(axis=1), demand)
+
+        # the model of this window length is reused, only the bounds change
+        model = self.lp_model.model(6)
+        p_max[:, 0] = 20.
+        dispatch, _ = self.lp_model.solve(demand, p_min, p_max)
+        self.assertIs(self.lp_model.model(6), model)
+        np.testing.assert_array_almost_equal(dispatch[:, 0], [0., 10., 20., 20., 20., 20.])
+
+    def test_prices(self):
+        demand = np.array([0., 50., 50., 50., 50., 50.])
+        dispatch, _, prices = self.lp_model.solve(demand, np.zeros((6, 2)), np.full((6, 2), 100.), return_prices=True)
+        # the expensive generator is marginal while the cheap one ramps up
+        np.testing.assert_array_almost_equal(prices[1:5], [10., 10., 10., 10.])
+
+        self.lp_model.solver = 'CLARABEL'
+        _, _, prices = self.lp_model.solve(demand, np.zeros((6, 2)), np.full((6, 2), 100.), return_prices=True)
+        np.testing.assert_array_almost_equal(prices[1:5], [10., 10., 10., 10.], decimal=4)
+
+    def test_infeasible(self):
+        dispatch, _ = self.lp_model.solve(np.array([0., 150.]), np.zeros((2, 2)), np.full((2, 2), 100.))
+        self.assertIsNone(dispatch)
+
+    def test_solve_cvxpy(self):
+        self.lp_model.solver = 'CLARABEL'
+        demand = np.array([0., 50., 50., 50., 50., 50.])
+        dispatch, _ = self.lp_model.solve(demand, np.zeros((6, 2)), np.full((6, 2), 100.))
+        np.testing.assert_array_almost_equal(dispatch[:, 0], [0., 10., 20., 30., 40., 50.], decimal=4)
+
+
+class TestLPDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.env_df = pd.DataFrame({'name': ['gen_nuclear', 'gen_thermal', 'gen_solar', 'gen_wind'],
+                                    'type': ['nuclear', 'thermal', 'solar', 'wind'],
+                                    'pmax': [101., 101., 50., 50.],
+                                    'max_ramp_up': [10.1, 100.1, 0., 0.],
+                                    'max_ramp_down': [10.1, 100.1, 0., 0.],
+                                    'cost_per_mw': [1., 10., 0., 0.]})
+
+    def test_from_dataframe(self):
+        dispatcher = LPDispatcher.from_dataframe(self.env_df)
+        self.assertListEqual(list(dispatcher.generators.index),
+                             ['gen_nuclear', 'gen_thermal', 'agg_solar', 'agg_wind'])
+        self.assertAlmostEqual(dispatcher.generators.loc['gen_nuclear', 'p_nom'], 100.)
+        self.assertAlmostEqual(dispatcher.generators.loc['gen_nuclear', 'ramp_limit_up'], 10. / 101.)
+        self.assertTrue(np.isnan(dispatcher.generators.loc['agg_solar', 'ramp_limit_up']))
+        self.assertAlmostEqual(dispatcher.generators.loc['agg_wind', 'p_nom'], 50.)
+
+    def test_run(self):
+        dispatcher = LPDispatcher.from_dataframe(self.env_df)
+        index = pd.date_range('2012-01-01', periods=2 * 288, freq='5min')
+        load = pd.DataFrame({'load_0': 120. + 40. * np.sin(np.arange(len(index)) / 30.)}, index=index)
+        prods = pd.DataFrame({'gen_solar': 10., 'gen_wind': 10.}, index=index)
+        dispatcher.chronix_scenario = ChroniXScenario(load, prods, dict(solar=['gen_solar'], wind=['gen_wind']),
+                                                      'scenario')
+        net_load = dispatcher.net_load(0., name=dispatcher.loads.index[0], include_renewable=True)
+        params = {'step_opf_min': 5, 'mode_opf': 'day', 'reactive_comp': 1., 'losses_pct': 0.}
+        results = dispatcher.run(net_load, None, None, params, ramp_mode=RampMode.hard)
+
+        dispatch = results.chronix.prods_dispatch[['gen_nuclear', 'gen_thermal']]
+        np.testing.assert_array_almost_equal(dispatch.sum(axis=1).values, net_load.values.ravel(), decimal=3)
+        # the cheap nuclear is limited by its ramps (10 MW every 5 minutes), the thermal completes it
+        self.assertLessEqual(dispatch['gen_nuclear'].diff().abs().max(), 10. + 1e-3)
+        self.assertGreater(dispatch['gen_nuclear'].sum(), dispatch['gen_thermal'].sum())
+        self.assertEqual(results.chronix.marginal_prices.shape[0], len(index))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,97 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+import grid2op
+from grid2op.Chronics import ChangeNothing
+import pathlib
+
+import chronix2grid.constants as cst
+import chronix2grid.grid2op_utils.add_data
+from chronix2grid.run_manifest import RunManifest
+
+# the module, not the function "add_data" exported by chronix2grid.grid2op_utils
+add_data_module = sys.modules['chronix2grid.grid2op_utils.add_data']
+
+
+def fake_generate_a_scenario(path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id,
+                             load_seed, renew_seed, gen_p_forecast_seed, handle_loss=True):
+    scenario_id = f"{start_date}_{scen_id}"
+    if os.path.exists(os.path.join(path_env, f"fail_{scenario_id}")):
+        return (RuntimeError("Nan generated in solar data"), ) + (None, ) * 7
+    os.mkdir(os.path.join(output_dir, scenario_id))
+    with open(os.path.join(output_dir, scenario_id, "generation_quality.json"), "w", encoding="utf-8") as f:
+        json.dump({"iter_num": 3, "avg": 0.1, "percent_95": 0.2, "percent_99": 0.3, "max": 0.4}, fp=f)
+    return (None, ) * 8
+
+
+class TestAddData(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        case_path = os.path.join(pathlib.Path(__file__).parent.parent.absolute(),
+                                 'data', 'input', cst.GENERATION_FOLDER_NAME,
+                                 'case118_l2rpn_neurips_1x_original')
+        self.envs = []
+        for env_name in ["env_1", "env_2"]:
+            env_path = os.path.join(self.tmp_dir.name, env_name)
+            shutil.copytree(case_path, env_path)
+            with open(os.path.join(env_path, "scenario_params.json"), "w", encoding="utf-8") as f:
+                json.dump({"dt": 5, "all_dates": ["2050-01-03", "2050-01-10", "2050-01-17"]}, fp=f)
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore")
+                self.envs.append(grid2op.make(env_path, test=True, chronics_class=ChangeNothing,
+                                              chronics_path=env_path))
+
+    def tearDown(self):
+        for env in self.envs:
+            env.close()
+        self.tmp_dir.cleanup()
+
+    def test_parallel_and_resume(self):
+        env, env_parallel = self.envs
+        # this month fails during the first run
+        open(os.path.join(env_parallel.get_path_env(), "fail_2050-01-10_1"), "w").close()
+        with mock.patch.object(add_data_module, "generate_a_scenario", side_effect=fake_generate_a_scenario):
+            records = add_data_module.add_data(env, seed=0, nb_scenario=2, nb_core=1)
+            records_parallel = add_data_module.add_data(env_parallel, seed=0, nb_scenario=2, nb_core=2)
+        self.assertEqual(len(records), 6)
+        self.assertTrue(all(record["success"] for record in records))
+        self.assertEqual(records[0]["quality"]["iter_num"], 3)
+
+        # the seeds do not depend on the number of cores
+        seeds = {record["scenario_name"]: record["seeds"] for record in records}
+        seeds_parallel = {record["scenario_name"]: record["seeds"] for record in records_parallel}
+        self.assertDictEqual(seeds, seeds_parallel)
+
+        output_dir = os.path.join(env_parallel.get_path_env(), "chronics")
+        self.assertEqual(len(RunManifest(output_dir, add_data_module.ADD_DATA_MANIFEST_FILE_NAME).read()), 6)
+        with open(os.path.join(output_dir, "errors.json"), "r", encoding="utf-8") as f:
+            errors = json.load(f)
+        self.assertDictEqual(errors, {"2050-01-10_1": "RuntimeError: Nan generated in solar data"})
+
+        # only the month that failed is generated again
+        os.remove(os.path.join(env_parallel.get_path_env(), "fail_2050-01-10_1"))
+        with mock.patch.object(add_data_module, "generate_a_scenario", side_effect=fake_generate_a_scenario):
+            records_resume = add_data_module.add_data(env_parallel, nb_core=2, resume=True)
+        self.assertEqual([record["scenario_name"] for record in records_resume], ["2050-01-10_1"])
+        self.assertTrue(records_resume[0]["success"])
+        self.assertDictEqual(records_resume[0]["seeds"], seeds["2050-01-10_1"])
+        with open(os.path.join(output_dir, "errors.json"), "r", encoding="utf-8") as f:
+            self.assertDictEqual(json.load(f), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
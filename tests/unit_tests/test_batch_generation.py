@@ -0,0 +1,120 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid import constants as cst
+from chronix2grid.config import GeneralConfigManager, LoadsConfigManager, ResConfigManager
+from chronix2grid.generation import generation_utils as gu
+from chronix2grid.generation.consumption import generate_load
+from chronix2grid.generation.renewable import generate_solar_wind
+
+
+# sum and first, 1000th and last values of the first columns of each output of the seed 5, generated one week from
+# 2012-01-01 before the scenarios were generated in batch
+LOADS_REFERENCE = [
+    (6868100.762112676, {'load_0_0': [50.62339099850709, 57.621609357231776, 52.86296479075453],
+                         'load_1_1': [20.03727580877624, 23.317979445669312, 21.28157068026679],
+                         'load_2_2': [39.310973443245786, 44.970004104216116, 40.53396368052403]}),
+    (6864307.511247774, {'load_0_0': [49.64807086606034, 58.39787518503182, 0.0],
+                         'load_1_1': [19.75000597787565, 23.04513874694166, 0.0],
+                         'load_2_2': [38.51785425934244, 45.11194826616123, 0.0]}),
+]
+RENEWABLES_REFERENCE = [
+    (106713.19828758824, {'gen_10_4': [0.0, 11.375403789540123, 8.951197119978776e-06],
+                          'gen_10_5': [0.0, 11.433505607491929, 8.98258809492386e-06],
+                          'gen_14_7': [0.0, 11.741500296065734, 8.07270463992235e-06]}),
+    (106708.63538363, {'gen_10_4': [0.0, 11.516194009110974, 0.0],
+                       'gen_10_5': [0.0, 11.516194009110974, 0.0],
+                       'gen_14_7': [0.0, 11.730521473305044, 0.0]}),
+    (480501.323117025, {'gen_3_0': [4.58753014953074, 17.6835641728775, 11.814991510508563],
+                        'gen_3_1': [4.6641797914731775, 16.919166980966285, 11.800168375577439],
+                        'gen_24_12': [30.15339853255129, 27.097194082590732, 21.46805649777961]}),
+    (480289.89384258876, {'gen_3_0': [4.649441959587905, 17.227850587555718, 0.0],
+                          'gen_3_1': [4.630213732913913, 17.240187261973986, 0.0],
+                          'gen_24_12': [29.65827309266427, 26.838503175029686, 0.0]}),
+]
+REFERENCE_SEED = 5
+
+
+class TestBatchGeneration(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        input_folder = os.path.join(self.tmp_dir.name, 'input')
+        shutil.copytree(os.path.join(pathlib.Path(__file__).parent.parent.absolute(),
+                                     'data', 'input', cst.GENERATION_FOLDER_NAME), input_folder,
+                        ignore=shutil.ignore_patterns('__pycache__'))
+        patterns_folder = os.path.join(input_folder, 'patterns')
+        if not os.path.exists(os.path.join(patterns_folder, 'load_weekly_pattern.csv')):
+            shutil.copy(os.path.join(patterns_folder, 'load_weekly_pattern.csv.bk'),
+                        os.path.join(patterns_folder, 'load_weekly_pattern.csv'))
+        case = 'case118_l2rpn_neurips_1x'
+        config_args = dict(root_directory=input_folder, input_directories=dict(case=case, patterns='patterns'),
+                           required_input_files=dict(case=[], patterns=[]), output_directory=None)
+        params = GeneralConfigManager(name="Global Generation", **config_args).read_configuration()
+        params.update(gu.time_parameters(1, '2012-01-01'))
+        params = gu.updated_time_parameters_with_timestep(params, params['dt'])
+        load_config_manager = LoadsConfigManager(name="Loads Generation", **config_args)
+        self.params_load, self.loads_charac = load_config_manager.read_configuration()
+        self.params_load.update(params)
+        self.load_weekly_pattern = load_config_manager.read_specific()
+        self.params_res, self.prods_charac = ResConfigManager(name="Renewables Generation",
+                                                              **config_args).read_configuration()
+        self.params_res.update(params)
+        self.solar_pattern = np.load(os.path.join(patterns_folder, 'solar_pattern.npy'))
+        self.seeds = [REFERENCE_SEED, 3, 7]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _assert_reference(self, frames, reference):
+        self.assertEqual(len(frames), len(reference))
+        for frame, (total, columns) in zip(frames, reference):
+            np.testing.assert_allclose(frame.values.sum(), total, rtol=1e-12)
+            for column, values in columns.items():
+                np.testing.assert_allclose(frame[column].iloc[[0, 1000, -1]].values, values, rtol=1e-12, atol=1e-15)
+
+    def _assert_same(self, batch_results, single_results):
+        self.assertEqual(len(batch_results), len(single_results))
+        for batch_frames, single_frames in zip(batch_results, single_results):
+            for batch_frame, single_frame in zip(batch_frames, single_frames):
+                pd.testing.assert_frame_equal(batch_frame, single_frame, check_exact=True)
+
+    def test_loads(self):
+        batch_results = generate_load.main_batch([None] * len(self.seeds), self.seeds, self.params_load,
+                                                 self.loads_charac, self.load_weekly_pattern, write_results=False)
+        single_results = [generate_load.main(None, seed, self.params_load, self.loads_charac,
+                                             self.load_weekly_pattern, write_results=False)
+                          for seed in self.seeds]
+        self._assert_reference(single_results[0], LOADS_REFERENCE)
+        self._assert_reference(batch_results[0], LOADS_REFERENCE)
+        self._assert_same(batch_results, single_results)
+        # each scenario has its own noise
+        self.assertFalse(np.allclose(batch_results[0][0].values, batch_results[1][0].values))
+
+    def test_renewables(self):
+        batch_results = generate_solar_wind.main_batch([None] * len(self.seeds), self.seeds, self.params_res,
+                                                       self.prods_charac, self.solar_pattern, write_results=False)
+        single_results = [generate_solar_wind.main(None, seed, self.params_res, self.prods_charac,
+                                                   self.solar_pattern, write_results=False)
+                          for seed in self.seeds]
+        self._assert_reference(single_results[0], RENEWABLES_REFERENCE)
+        self._assert_reference(batch_results[0], RENEWABLES_REFERENCE)
+        self._assert_same(batch_results, single_results)
+        self.assertFalse(np.allclose(batch_results[0][2].values, batch_results[1][2].values))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation.chronics_block import ChronicsBlock
+
+
+class TestChronicsBlock(unittest.TestCase):
+    def setUp(self):
+        self.index = pd.date_range(start='2012-01-01', periods=4, freq='5min', name='datetime')
+        self.names = ['gen_10_2', 'gen_2_1', 'gen_1_0']
+
+    def test_natural_ordering(self):
+        block = ChronicsBlock.from_names(self.index, self.names)
+        self.assertListEqual(block.columns, ['gen_1_0', 'gen_2_1', 'gen_10_2'])
+        self.assertEqual(block.values.shape, (4, 3))
+
+    def test_from_dict_matches_dataframe(self):
+        dict_ = {name: np.arange(4) * (i + 1.) for i, name in enumerate(self.names)}
+        dict_['datetime'] = self.index
+        block = ChronicsBlock.from_dict(dict_)
+        np.testing.assert_array_equal(block['gen_10_2'], dict_['gen_10_2'])
+        df = block.to_frame()
+        self.assertEqual(df.index.name, 'datetime')
+        self.assertListEqual(list(df.columns), block.columns)
+        # the data frame is a view on the block
+        block['gen_1_0'] = -1.
+        self.assertTrue((df['gen_1_0'] == -1.).all())
+
+    def test_select(self):
+        block = ChronicsBlock.from_names(self.index, self.names)
+        block['gen_2_1'] = 2.
+        sub_block = block.select(['gen_10_2', 'gen_2_1'])
+        self.assertListEqual(sub_block.columns, ['gen_2_1', 'gen_10_2'])
+        np.testing.assert_array_equal(sub_block['gen_2_1'], 2.)
@@ -0,0 +1,107 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import bz2
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid import chronics_io
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+class TestChronicsIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'prod_p.csv.bz2')
+        index = pd.date_range(start='2012-01-01', periods=5, freq='5min', name='datetime')
+        self.df = pd.DataFrame({'gen_1_0': np.arange(5) * 1.25, 'gen_2_1': np.arange(5) * 10.},
+                               index=index)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def check_round_trip(self, output_format):
+        written = chronics_io.write_chronics(self.df, self.path, output_format)
+        self.assertTrue(written.endswith('prod_p.' + output_format))
+        # readers only know the historical name of the file
+        read = chronics_io.read_chronics(self.path)
+        self.assertListEqual(list(read.columns), list(self.df.columns))
+        np.testing.assert_array_equal(read.values, self.df.values)
+
+    def test_npz(self):
+        self.check_round_trip('npz')
+
+    @unittest.skipUnless(HAS_PYARROW, 'pyarrow is not installed')
+    def test_parquet_arrow(self):
+        for output_format in ['parquet', 'arrow']:
+            self.check_round_trip(output_format)
+            os.remove(chronics_io.chronics_file_path(self.path, output_format))
+
+    def test_index_written_as_column(self):
+        chronics_io.write_chronics(self.df['gen_1_0'], self.path, 'npz', index=True)
+        read = chronics_io.read_chronics(self.path)
+        self.assertListEqual(list(read.columns), ['datetime', 'gen_1_0'])
+
+    def test_export_to_csv(self):
+        chronics_io.write_chronics(self.df, self.path, 'npz')
+        exported = chronics_io.export_to_csv(self.tmp_dir.name, remove_source=True)
+        self.assertListEqual(exported, [self.path])
+        self.assertListEqual(os.listdir(self.tmp_dir.name), ['prod_p.csv.bz2'])
+        read = pd.read_csv(self.path, sep=';')
+        np.testing.assert_array_almost_equal(read.values, self.df.values, decimal=1)
+
+    def test_stale_format(self):
+        # a csv.bz2 left by a previous run does not shadow the chronics written since in another format
+        chronics_io.write_chronics(self.df * 2., self.path)
+        npz_path = chronics_io.write_chronics(self.df, self.path, 'npz')
+        os.utime(self.path, ns=(0, 0))
+        self.assertEqual(chronics_io.find_chronics_file(self.path), npz_path)
+        np.testing.assert_array_equal(chronics_io.read_chronics(self.path).values, self.df.values)
+
+    def test_no_path(self):
+        text = chronics_io.write_chronics(self.df, None, float_format='%.1f')
+        self.assertEqual(text, self.df.to_csv(None, sep=';', index=False, float_format='%.1f'))
+        with self.assertRaises(RuntimeError):
+            chronics_io.write_chronics(self.df, None, 'npz')
+
+    def test_parallel_csv_bz2(self):
+        df = pd.DataFrame(np.random.default_rng(0).normal(size=(103, 4)), columns=['a', 'b', 'c', 'd'])
+        ref_path = os.path.join(self.tmp_dir.name, 'ref.csv.bz2')
+        df.to_csv(ref_path, sep=';', index=False, float_format='%.1f')
+        chronics_io.write_csv_bz2(df, self.path, float_format='%.1f', n_threads=3, block_rows=10)
+        with bz2.open(ref_path) as ref, bz2.open(self.path) as written:
+            self.assertEqual(ref.read(), written.read())
+        self.assertEqual(pd.read_csv(self.path, sep=';').shape, (103, 4))
+
+    def test_csv_writer_n_threads(self):
+        with mock.patch.object(chronics_io.os, 'cpu_count', return_value=8):
+            self.assertEqual(chronics_io.csv_writer_n_threads(), 8)
+            worker = mock.Mock(daemon=True)
+            with mock.patch.object(chronics_io.multiprocessing, 'current_process', return_value=worker):
+                self.assertEqual(chronics_io.csv_writer_n_threads(), 1)
+                try:
+                    chronics_io.set_n_workers(3)
+                    self.assertEqual(chronics_io.csv_writer_n_threads(), 2)
+                    chronics_io.set_n_workers(16)
+                    self.assertEqual(chronics_io.csv_writer_n_threads(), 1)
+                finally:
+                    chronics_io.set_n_workers(None)
+
+    def test_unknown_format(self):
+        with self.assertRaises(RuntimeError):
+            chronics_io.write_chronics(self.df, self.path, 'xlsx')
@@ -0,0 +1,140 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from chronix2grid import constants as cst
+from chronix2grid import dispatch_sweep as sweep
+from chronix2grid.GeneratorBackend import GeneratorBackend
+from chronix2grid.chronics_io import read_chronics, write_chronics
+from chronix2grid.generation import generation_utils as gu
+
+
+class TestDispatchSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.params_opf = {'mode_opf': 'day', 'ramp_mode': 'hard', 'hydro_ramp_reduction_factor': 1.,
+                           'slack_p_max_reduction': 0., 'slack_ramp_max_reduction': 0., 'nameSlack': 'gen_0'}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_variants(self):
+        path = os.path.join(self.tmp_dir.name, 'variants.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'reference': {}, 'easy': {'ramp_mode': 'easy'},
+                       'hydro': {'hydro_ramp_reduction_factor': 2.},
+                       'cheap_gas': {'marginal_costs': {'gas': 40.}}}, f)
+        variants = sweep.read_variants(path)
+        self.assertEqual(list(variants), ['reference', 'easy', 'hydro', 'cheap_gas'])
+
+        params_opf, marginal_costs = sweep.variant_parameters(self.params_opf, variants['cheap_gas'])
+        self.assertEqual(params_opf, self.params_opf)
+        self.assertEqual(marginal_costs, {'gas': 40.})
+        easy_params_opf, marginal_costs = sweep.variant_parameters(self.params_opf, variants['easy'])
+        self.assertEqual(easy_params_opf['ramp_mode'], 'easy')
+        self.assertIsNone(marginal_costs)
+        self.assertEqual(self.params_opf['ramp_mode'], 'hard')
+
+        # only the parameters used to create the dispatcher need a new one
+        self.assertEqual(sweep.dispatcher_key(easy_params_opf), sweep.dispatcher_key(self.params_opf))
+        hydro_params_opf, _ = sweep.variant_parameters(self.params_opf, variants['hydro'])
+        self.assertNotEqual(sweep.dispatcher_key(hydro_params_opf), sweep.dispatcher_key(self.params_opf))
+
+        with self.assertRaises(RuntimeError):
+            sweep.read_variants({'reference': 1.})
+
+    def test_summary(self):
+        prods_charac = pd.DataFrame({'name': ['gas_0', 'wind_0'], 'type': ['thermal', 'wind'],
+                                     'marginal_cost': [50., 0.]})
+        folder = os.path.join(self.tmp_dir.name, 'reference', 'Scenario_0')
+        os.makedirs(folder)
+        write_chronics(pd.DataFrame({'gas_0': [10., 20.], 'wind_0': [5., 5.]}), os.path.join(folder, 'prod_p.csv.bz2'))
+        write_chronics(pd.DataFrame({'wind_0': [8., 5.]}), os.path.join(folder, 'prod_p_renew_orig.csv.bz2'))
+        write_chronics(pd.DataFrame({'price': [30., 50.]}), os.path.join(folder, 'prices.csv.bz2'))
+
+        summary = sweep.dispatch_summary(folder, prods_charac, dt=30)
+        self.assertEqual(summary['energy_thermal_mwh'], 15.)
+        self.assertEqual(summary['energy_wind_mwh'], 5.)
+        self.assertEqual(summary['curtailment_mwh'], 1.5)
+        self.assertEqual(summary['cost'], 750.)
+        self.assertEqual(summary['price_mean'], 40.)
+
+        records = pd.DataFrame([dict(variant='reference', scenario='Scenario_0', success=True, error=None, **summary),
+                                dict(variant='reference', scenario='Scenario_1', success=False, error='failed'),
+                                dict(variant='easy', scenario='Scenario_0', success=False, error='failed')])
+        comparison = sweep.compare_variants(records).set_index('variant')
+        self.assertEqual(comparison.loc['reference', 'n_scenarios'], 2)
+        self.assertEqual(comparison.loc['reference', 'n_success'], 1)
+        self.assertEqual(comparison.loc['reference', 'cost'], 750.)
+        self.assertEqual(comparison.loc['easy', 'n_success'], 0)
+        self.assertTrue(pd.isna(comparison.loc['easy', 'cost']))
+
+
+class TestDispatchSweepRun(unittest.TestCase):
+    # the case simulates the losses with grid2op (loss_grid2op_simulation)
+    CASE = 'case118_l2rpn_neurips_1x'
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        data_folder = os.path.join(pathlib.Path(__file__).parent.parent.absolute(), 'data')
+        self.input_folder = os.path.join(self.tmp_dir.name, 'input')
+        shutil.copytree(os.path.join(data_folder, 'input', cst.GENERATION_FOLDER_NAME), self.input_folder,
+                        ignore=shutil.ignore_patterns('__pycache__'))
+        patterns_folder = os.path.join(self.input_folder, 'patterns')
+        if not os.path.exists(os.path.join(patterns_folder, 'load_weekly_pattern.csv')):
+            # only checked by the configuration of the loads, not used by the dispatch
+            shutil.copy(os.path.join(patterns_folder, 'load_weekly_pattern.csv.bk'),
+                        os.path.join(patterns_folder, 'load_weekly_pattern.csv'))
+        if not os.path.exists(os.path.join(patterns_folder, 'hydro_french.csv')):
+            dates = pd.date_range('2012-01-01', '2012-12-31 23:00', freq='1h')
+            pd.DataFrame({'date': dates.strftime('%Y-%m-%d %H:%M'), 'x': 0, 'p_min_u': 0.1, 'p_max_u': 0.8}).to_csv(
+                os.path.join(patterns_folder, 'hydro_french.csv'), index=False)
+
+        # one day of a scenario generated with L and R
+        expected_folder = os.path.join(data_folder, 'output', cst.GENERATION_FOLDER_NAME,
+                                       'expected_case118_l2rpn_neurips_1x', 'Scenario_january_0')
+        self.generation_output_folder = os.path.join(self.tmp_dir.name, 'output')
+        scenario_folder = os.path.join(self.generation_output_folder, 'Scenario_0')
+        os.makedirs(scenario_folder)
+        for name in ['load_p', 'load_q', 'load_p_forecasted', 'load_q_forecasted', 'solar_p', 'wind_p']:
+            chronics = read_chronics(os.path.join(expected_folder, f'{name}.csv.bz2'), sep=';')
+            write_chronics(chronics.iloc[:288], os.path.join(scenario_folder, f'{name}.csv.bz2'))
+        for name in ['start_datetime.info', cst.TIME_STEP_FILE_NAME]:
+            shutil.copy(os.path.join(expected_folder, name), scenario_folder)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sweep_in_parallel(self):
+        # both variants of the scenario simulate its losses at the same time
+        variants = {'reference': {'opf_engine': 'lp'}, 'easy': {'opf_engine': 'lp', 'ramp_mode': 'easy'}}
+        summary = sweep.sweep_dispatch(GeneratorBackend(), self.CASE, self.input_folder,
+                                       self.generation_output_folder, gu.time_parameters(1, '2012-01-01'),
+                                       variants, nb_core=2)
+        self.assertListEqual(list(summary['variant']), ['easy', 'reference'])
+        self.assertTrue(summary['success'].all(), list(summary['error']))
+        for variant in variants:
+            folder = os.path.join(self.generation_output_folder, cst.SWEEP_FOLDER_NAME, variant)
+            self.assertTrue(os.path.isfile(os.path.join(folder, 'Scenario_0', 'adjusted_loss.csv.bz2')))
+            self.assertTrue(os.path.isdir(os.path.join(folder, 'agent_results', 'Scenario_0')))
+            self.assertEqual(read_chronics(os.path.join(folder, 'Scenario_0', 'prod_p.csv.bz2'), sep=';').shape[0],
+                             288)
+        # the temporary copies of the grid are removed
+        self.assertFalse([name for name in os.listdir(self.input_folder) if name.startswith(self.CASE + '_Scenario_0')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import unittest
+import warnings
+from unittest import mock
+
+import grid2op
+from grid2op.Chronics import ChangeNothing
+import numpy as np
+import pandas as pd
+import pathlib
+
+import chronix2grid.constants as cst
+from chronix2grid.grid2op_utils import utils as g2op_utils
+from chronix2grid.grid2op_utils import GeneratedChronics
+
+
+class TestGeneratedChronics(unittest.TestCase):
+    def setUp(self):
+        self.env_path = os.path.join(pathlib.Path(__file__).parent.parent.absolute(),
+                                     'data', 'input', cst.GENERATION_FOLDER_NAME,
+                                     'case118_l2rpn_neurips_1x_original')
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            env = grid2op.make(self.env_path, test=True, chronics_class=ChangeNothing,
+                               chronics_path=self.env_path)
+        obs = env.reset()
+        self.name_load = env.name_load
+        self.name_gen = env.name_gen
+        self.load_p = obs.load_p
+        self.load_q = obs.load_q
+        self.gen_p = obs.gen_p
+        env.close()
+        self.n_step = 10
+
+    def _fake_scenario(self, path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id,
+                       load_seed, renew_seed, gen_p_forecast_seed, handle_loss=True, nb_steps=None):
+        # the loads and generators are not in the order of the backend
+        scaling = 1. + 0.01 * default_rng_int(load_seed).uniform(size=(self.n_step, 1))
+        load_p = pd.DataFrame(self.load_p * scaling, columns=self.name_load).iloc[:, ::-1]
+        load_q = pd.DataFrame(self.load_q * scaling, columns=self.name_load).iloc[:, ::-1]
+        prod_p = pd.DataFrame(self.gen_p * scaling, columns=self.name_gen).iloc[:, ::-1]
+        return None, (1, 0., 0., 0., 0.), load_p, 1. * load_p, load_q, 1. * load_q, prod_p, 1. * prod_p
+
+    def _make_env(self, **kwargs):
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            env = grid2op.make(self.env_path, test=True, chronics_class=GeneratedChronics,
+                               chronics_path=self.env_path,
+                               data_feeding_kwargs=dict(path_env=self.env_path, start_date="2050-01-03", dt=5,
+                                                        seed=0, **kwargs))
+        return env
+
+    def test_reset(self):
+        with mock.patch.object(g2op_utils, "generate_a_scenario", side_effect=self._fake_scenario) as gen_mock:
+            env = self._make_env()
+            obs = env.reset()
+            real_data = env.chronics_handler.real_data
+            # the scenario generated when the environment is made is used by the first reset
+            self.assertEqual(gen_mock.call_count, 1)
+            self.assertIsNone(gen_mock.call_args.args[3])  # nothing is saved
+            data = real_data._scenario["data"]
+            np.testing.assert_allclose(obs.load_p, data[0][env.name_load].values[0], rtol=1e-5)
+            self.assertEqual(obs.get_time_stamp(), real_data.start_datetime + real_data.time_interval)
+            self.assertEqual(env.max_episode_duration(), self.n_step)
+
+            first_id = env.chronics_handler.get_id()
+            obs = env.reset()
+            self.assertEqual(gen_mock.call_count, 2)
+            self.assertNotEqual(env.chronics_handler.get_id(), first_id)
+            data = real_data._scenario["data"]
+            np.testing.assert_allclose(obs.load_p, data[0][env.name_load].values[0], rtol=1e-5)
+            # the forecasts are in the order of the backend too
+            sim_obs, *_ = obs.simulate(env.action_space())
+            np.testing.assert_allclose(sim_obs.load_p, data[1][env.name_load].values[0], rtol=1e-5)
+            env.close()
+
+    def test_retry(self):
+        scenarios = [self._fake_scenario(*args) for args in [(None,) * 7 + (seed, 0, 0) for seed in range(3)]]
+        scenarios[1] = (RuntimeError("diverged"),) + (None,) * 7
+        with mock.patch.object(g2op_utils, "generate_a_scenario", side_effect=scenarios):
+            env = self._make_env()
+            env.reset()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                obs = env.reset()
+            self.assertTrue(any("diverged" in str(el.message) for el in caught))
+            data = env.chronics_handler.real_data._scenario["data"]
+            np.testing.assert_allclose(obs.load_p, data[0][env.name_load].values[0], rtol=1e-5)
+            env.close()
+
+    def test_step_before_reset(self):
+        with mock.patch.object(g2op_utils, "generate_a_scenario", side_effect=self._fake_scenario) as gen_mock:
+            env = self._make_env()
+            first_id = env.chronics_handler.get_id()
+            env.step(env.action_space())
+            # the scenario was used by the steps made before the reset
+            env.reset()
+            self.assertEqual(gen_mock.call_count, 2)
+            self.assertNotEqual(env.chronics_handler.get_id(), first_id)
+            env.close()
+
+    def test_prefetch(self):
+        with mock.patch.object(g2op_utils, "generate_a_scenario", side_effect=self._fake_scenario):
+            env_prefetch = self._make_env(prefetch=True)
+            env = self._make_env()
+            for _ in range(2):
+                obs_prefetch = env_prefetch.reset()
+                obs = env.reset()
+                # same seed, same scenarios with or without the background process
+                np.testing.assert_allclose(obs_prefetch.load_p, obs.load_p)
+            env_prefetch.chronics_handler.real_data.close()
+            env_prefetch.close()
+            env.close()
+
+
+def default_rng_int(seed):
+    return np.random.default_rng(int(seed))
+
+
+if __name__ == '__main__':
+    unittest.main()
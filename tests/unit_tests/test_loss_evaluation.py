@@ -0,0 +1,127 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import unittest
+import warnings
+from unittest import mock
+
+import grid2op
+from grid2op.Chronics import ChangeNothing
+from grid2op.Parameters import Parameters
+import numpy as np
+import pathlib
+
+import chronix2grid.constants as cst
+from chronix2grid.grid2op_utils import utils as g2op_utils
+from chronix2grid.grid2op_utils.loss_fixed_point import LossFixedPoint
+
+
+class TestLossEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.env_path = os.path.join(pathlib.Path(__file__).parent.parent.absolute(),
+                                     'data', 'input', cst.GENERATION_FOLDER_NAME,
+                                     'case118_l2rpn_neurips_1x_original')
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            env = grid2op.make(self.env_path, test=True, chronics_class=ChangeNothing,
+                               chronics_path=self.env_path)
+        obs = env.reset()
+        env.close()
+        n_step = 12
+        scaling = 1. + 0.1 * np.sin(np.arange(n_step) / 3.).reshape(-1, 1)
+        self.load_p = obs.load_p * scaling
+        self.load_q = np.tile(obs.load_q, (n_step, 1))
+        self.prod_p = obs.gen_p * scaling
+        self.prod_v = np.tile(obs.gen_v, (n_step, 1))
+        self.env_param = Parameters()
+        self.env_param.NO_OVERFLOW_DISCONNECTION = True
+
+    def test_env_is_reused(self):
+        env = g2op_utils.get_env_for_loss(self.env_path, self.env_param, self.load_p, self.load_q,
+                                          self.prod_p, self.prod_v)
+        env_other_data = g2op_utils.get_env_for_loss(self.env_path, self.env_param, self.load_p[:5],
+                                                     self.load_q[:5], self.prod_p[:5], self.prod_v[:5])
+        self.assertIs(env, env_other_data)
+        env.reset()
+        self.assertEqual(env.max_episode_duration(), 5)
+
+    def test_batched_losses_as_steps(self):
+        all_loss, diff_ = g2op_utils.evaluate_losses(self.env_path, self.env_param, self.load_p, self.load_q,
+                                                     self.prod_p, self.prod_v)
+        with mock.patch.object(g2op_utils, '_batched_gen_p', return_value=None):
+            all_loss_steps, diff_steps = g2op_utils.evaluate_losses(self.env_path, self.env_param, self.load_p,
+                                                                    self.load_q, self.prod_p, self.prod_v)
+        self.assertEqual(all_loss.shape, (12,))
+        self.assertTrue(np.all(all_loss > 0.))
+        np.testing.assert_allclose(all_loss, all_loss_steps, atol=1e-3)
+        np.testing.assert_allclose(diff_, diff_steps, atol=1e-3)
+
+    def test_varying_voltage_setpoints(self):
+        prod_v = self.prod_v * (1. + 0.02 * np.sin(np.arange(12) / 2.)).reshape(-1, 1)
+        all_loss, diff_ = g2op_utils.evaluate_losses(self.env_path, self.env_param, self.load_p, self.load_q,
+                                                     self.prod_p, prod_v)
+        with mock.patch.object(g2op_utils, '_batched_gen_p', return_value=None):
+            all_loss_steps, diff_steps = g2op_utils.evaluate_losses(self.env_path, self.env_param, self.load_p,
+                                                                    self.load_q, self.prod_p, prod_v)
+            all_loss_constant, _ = g2op_utils.evaluate_losses(self.env_path, self.env_param, self.load_p,
+                                                              self.load_q, self.prod_p, self.prod_v)
+        # the setpoints change the losses, which are the ones of the steps
+        self.assertGreater(np.abs(all_loss_steps - all_loss_constant).max(), 1e-2)
+        np.testing.assert_allclose(all_loss, all_loss_steps, atol=1e-3)
+        np.testing.assert_allclose(diff_, diff_steps, atol=1e-3)
+
+    def test_same_voltage_setpoints(self):
+        self.assertTrue(g2op_utils._same_voltage_setpoints(self.prod_v))
+        prod_v = np.full(self.prod_v.shape, np.NaN)
+        prod_v[0] = self.prod_v[0]
+        self.assertTrue(g2op_utils._same_voltage_setpoints(prod_v))  # Nans keep the previous setpoints
+        prod_v[5, 0] = 1.01 * self.prod_v[0, 0]
+        self.assertFalse(g2op_utils._same_voltage_setpoints(prod_v))
+
+
+class TestLossFixedPoint(unittest.TestCase):
+    def setUp(self):
+        # a slowly contracting linear map, its fixed point is the solution of (I - A) x = b
+        prng = np.random.default_rng(0)
+        self.A = 0.9 * np.diag(prng.uniform(0.5, 1., 20)) + 0.005 * prng.standard_normal((20, 20))
+        self.b = prng.uniform(10., 20., 20)
+        self.solution = np.linalg.solve(np.eye(20) - self.A, self.b)
+
+    def _solve(self, loss_solver, max_iter=500):
+        loss = np.zeros(20)
+        for iter_num in range(1, max_iter + 1):
+            loss_pf = self.A @ loss + self.b
+            if np.max(np.abs(loss_pf - loss)) <= 1e-6:
+                break
+            loss = loss_solver.next_loss(loss, loss_pf)
+        return loss, iter_num
+
+    def test_fixed_point(self):
+        loss_solver = LossFixedPoint()
+        loss, _ = self._solve(loss_solver)
+        np.testing.assert_allclose(loss, self.solution, atol=1e-4)
+        # without relaxation, this is the plain iteration
+        np.testing.assert_array_equal(loss_solver.next_loss(loss, 2. * loss), 2. * loss)
+
+    def test_anderson(self):
+        _, iter_fixed_point = self._solve(LossFixedPoint())
+        loss_solver = LossFixedPoint.from_params({"loss_solver": "anderson", "loss_anderson_memory": 5})
+        loss, iter_anderson = self._solve(loss_solver)
+        np.testing.assert_allclose(loss, self.solution, atol=1e-4)
+        self.assertLess(iter_anderson, iter_fixed_point / 3)
+
+    def test_wrong_solver(self):
+        with self.assertRaises(RuntimeError):
+            LossFixedPoint(method="newton")
+        with self.assertRaises(RuntimeError):
+            LossFixedPoint(relaxation=0.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid import constants as cst
+from chronix2grid.GeneratorBackend import GeneratorBackend
+from chronix2grid.chronics_io import write_chronics
+from chronix2grid.generation import generation_utils as gu
+from chronix2grid.generation.loss.loss_surrogate import LossSurrogate, LOSS_SURROGATE_FILE_NAME
+
+
+class TestLossSurrogate(unittest.TestCase):
+    def setUp(self):
+        prng = np.random.default_rng(0)
+        n_step = 500
+        index = pd.date_range('2012-01-01', periods=n_step, freq='5min')
+        self.load = pd.DataFrame(prng.uniform(50., 150., (n_step, 4)), index=index,
+                                 columns=['load_0', 'load_1', 'load_2', 'load_3'])
+        self.prod_solar = pd.DataFrame(prng.uniform(0., 80., (n_step, 2)), index=index, columns=['solar_0', 'solar_1'])
+        self.prod_wind = pd.DataFrame(prng.uniform(0., 60., (n_step, 1)), index=index, columns=['wind_0'])
+        self.load_groups = {'R1': ['load_0', 'load_1'], 'R2': ['load_2', 'load_3']}
+        zone_1 = self.load[['load_0', 'load_1']].sum(axis=1).values / 1000.
+        zone_2 = self.load[['load_2', 'load_3']].sum(axis=1).values / 1000.
+        wind = self.prod_wind.sum(axis=1).values / 1000.
+        # losses growing with the square of the transfers between the zones
+        self.loss = 2. + 40. * zone_1 ** 2 + 60. * zone_2 ** 2 - 30. * zone_2 * wind
+
+    def test_fit_predict(self):
+        surrogate = LossSurrogate(load_groups=self.load_groups, alpha=0.)
+        surrogate.fit(self.load, self.prod_solar, self.prod_wind, self.loss)
+        predicted = surrogate.predict(self.load, self.prod_solar, self.prod_wind)
+        self.assertTrue(predicted.index.equals(self.load.index))
+        np.testing.assert_allclose(predicted.values, self.loss, atol=1e-6)
+        self.assertLess(surrogate.scores['max_error'], 1e-6)
+
+    def test_save_load(self):
+        surrogate = LossSurrogate(load_groups=self.load_groups).fit(self.load, self.prod_solar, self.prod_wind,
+                                                                     self.loss)
+        with tempfile.TemporaryDirectory() as case_folder:
+            path = surrogate.save(case_folder)
+            self.assertEqual(os.path.basename(path), LOSS_SURROGATE_FILE_NAME)
+            loaded = LossSurrogate.load(case_folder)
+        np.testing.assert_allclose(loaded.predict(self.load, self.prod_solar, self.prod_wind),
+                                   surrogate.predict(self.load, self.prod_solar, self.prod_wind))
+
+    def test_fit_scenarios(self):
+        prods_charac = pd.DataFrame({'name': ['solar_0', 'solar_1', 'wind_0', 'thermal_0'],
+                                     'type': ['solar', 'solar', 'wind', 'thermal']})
+        prod = pd.concat([self.prod_solar, self.prod_wind], axis=1)
+        prod['thermal_0'] = self.load.sum(axis=1) - prod.sum(axis=1) + self.loss
+        with tempfile.TemporaryDirectory() as scenario_folder:
+            write_chronics(self.load, os.path.join(scenario_folder, 'load_p.csv.bz2'), sep=';', index=False,
+                           float_format=None)
+            write_chronics(prod, os.path.join(scenario_folder, 'prod_p.csv.bz2'), sep=';', index=False,
+                           float_format=None)
+            surrogate = LossSurrogate(load_groups=self.load_groups, alpha=0.)
+            surrogate.fit_scenarios([scenario_folder], prods_charac)
+        self.assertLess(surrogate.scores['max_error'], 1e-3)
+
+
+class TestDispatchLosses(unittest.TestCase):
+    CASE = 'case118_l2rpn_neurips_1x'
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, 'input')
+        shutil.copytree(os.path.join(pathlib.Path(__file__).parent.parent.absolute(), 'data', 'input',
+                                     cst.GENERATION_FOLDER_NAME), self.input_folder,
+                        ignore=shutil.ignore_patterns('__pycache__'))
+        patterns_folder = os.path.join(self.input_folder, 'patterns')
+        if not os.path.exists(os.path.join(patterns_folder, 'load_weekly_pattern.csv')):
+            shutil.copy(os.path.join(patterns_folder, 'load_weekly_pattern.csv.bk'),
+                        os.path.join(patterns_folder, 'load_weekly_pattern.csv'))
+        self.output_folder = os.path.join(self.tmp_dir.name, 'output')
+        os.makedirs(self.output_folder)
+        self.loss = pd.Series([1., 2.])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _dispatched_loss(self):
+        """Losses given to the dispatch by a LRDT run (the stages are not computed)"""
+        generator = GeneratorBackend()
+        with mock.patch.object(generator, 'do_l', return_value=(None, None)), \
+                mock.patch.object(generator, 'do_r', return_value=(None, None, None, None)), \
+                mock.patch.object(generator, 'do_d', return_value=self.loss), \
+                mock.patch.object(generator, 'read_dispatch_configuration', return_value={}), \
+                mock.patch.object(generator, 'do_t') as do_t:
+            generator.run(self.CASE, 1, self.input_folder, self.output_folder,
+                          gu.folder_name_pattern(cst.SCENARIO_FOLDER_BASE_NAME, 1),
+                          gu.time_parameters(1, '2012-01-01'), mode='LRDT', scenario_id=0, seed_for_loads=1, seed_for_res=1,
+                          seed_for_disp=1)
+        return do_t.call_args.args[10]
+
+    def test_loss_pattern_not_dispatched(self):
+        # the dispatch keeps using losses_pct
+        self.assertIsNone(self._dispatched_loss())
+
+    def test_surrogate_dispatched(self):
+        with open(os.path.join(self.input_folder, self.CASE, 'params_loss.json'), 'w') as f:
+            json.dump({'loss_pattern': 'loss_pattern.csv', 'loss_surrogate': LOSS_SURROGATE_FILE_NAME}, f)
+        self.assertIs(self._dispatched_loss(), self.loss)
+
+
+if __name__ == '__main__':
+    unittest.main()
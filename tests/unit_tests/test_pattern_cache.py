@@ -0,0 +1,52 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation.consumption import consumption_utils as conso
+from chronix2grid.generation.pattern_cache import PATTERN_CACHE, PatternCache, pattern_source
+
+
+class TestPatternCache(unittest.TestCase):
+    def setUp(self):
+        PATTERN_CACHE.clear()
+        self.params = {'start_date': pd.Timestamp('2012-03-05'), 'end_date': pd.Timestamp('2012-03-12'),
+                       'dt': 5, 'T': 7 * 24 * 60}
+        t = np.arange(12 * 24 * 7 * 6)
+        self.weekly_pattern = 1. + 0.2 * np.sin(2 * np.pi * t / (12 * 24)) + 0.01 * (t // (12 * 24 * 7))
+
+    def test_lru(self):
+        cache = PatternCache(maxsize=2)
+        first = cache.get('a', lambda: np.zeros(3))
+        self.assertFalse(first.flags.writeable)
+        cache.get('b', lambda: np.ones(3))
+        self.assertIs(cache.get('a', lambda: np.ones(3)), first)
+        cache.get('c', lambda: np.ones(3))
+        # 'b' was the least recently used
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('b', lambda: np.full(3, 2.))[0], 2.)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+    def test_load_pattern(self):
+        source = self.weekly_pattern.copy()
+        pattern = conso.compute_load_pattern(self.params, source, index=1, day_lag=0)
+        # the source is not modified, and the loads using the same week of pattern share it
+        np.testing.assert_array_equal(source, self.weekly_pattern)
+        n_weeks = 5
+        self.assertIs(conso.compute_load_pattern(self.params, source, index=1 + n_weeks, day_lag=0,
+                                                 pattern_id=pattern_source(source)), pattern)
+        self.assertIsNot(conso.compute_load_pattern(self.params, source, index=2, day_lag=0), pattern)
+        self.assertEqual(pattern.shape, (12 * 24 * 7 + 1,))
+        self.assertAlmostEqual(pattern.mean(), 1., places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from chronix2grid import profiling
+from chronix2grid.grid2op_utils import utils as g2op_utils
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_stages(self):
+        with profiling.stage('L'):
+            with profiling.stage('noise'):
+                pass
+            with profiling.stage('write'):
+                pass
+
+    def test_nested_stages(self):
+        profiler = profiling.StageProfiler()
+        with profiling.activated(profiler):
+            self.run_stages()
+        frame = profiler.to_frame()
+        self.assertListEqual(list(frame['stage']), ['L', 'L/noise', 'L/write'])
+        self.assertListEqual(list(frame['depth']), [0, 1, 1])
+        self.assertTrue((frame['wall_time'] >= 0).all())
+
+    def test_inactive(self):
+        profiler = profiling.StageProfiler()
+        with profiling.activated(profiler):
+            pass
+        self.run_stages()
+        self.assertListEqual(profiler.records, [])
+
+    def test_memory(self):
+        if profiling.rss_mb() is None:
+            self.skipTest('resident memory can not be measured on this platform')
+        profiler = profiling.StageProfiler()
+        with profiling.activated(profiler):
+            with profiling.stage('alloc'):
+                data = np.ones(50 * 1024 ** 2 // 8)
+            del data
+            with profiling.stage('after'):
+                pass
+        frame = profiler.to_frame().set_index('stage')
+        self.assertGreater(frame.loc['alloc', 'rss_delta_mb'], 40.)
+        self.assertLess(frame.loc['after', 'rss_delta_mb'], 1.)
+        # the process peak is cumulative, the current memory is not
+        self.assertGreaterEqual(frame.loc['after', 'process_peak_rss_mb'], frame.loc['alloc', 'process_peak_rss_mb'])
+        self.assertLess(frame.loc['after', 'rss_mb'], frame.loc['alloc', 'rss_mb'])
+
+    def test_generate_a_scenario(self):
+        def fake_generate(path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id, *args, **kwargs):
+            with profiling.stage('losses'):
+                for _ in range(2):
+                    with profiling.stage('loss_iteration_opt'):
+                        pass
+                    with profiling.stage('loss_iteration_pf'):
+                        pass
+            os.mkdir(os.path.join(output_dir, f"{start_date}_{scen_id}"))
+            return (None,) * 8
+
+        with mock.patch.object(g2op_utils, "_generate_a_scenario", side_effect=fake_generate):
+            g2op_utils.generate_a_scenario(None, None, None, self.tmp_dir.name, "2050-01-03", 5, 0, 0, 1, 2,
+                                           profile=True)
+        with open(os.path.join(self.tmp_dir.name, "2050-01-03_0", "profile.json"), 'r', encoding='utf-8') as f:
+            stages = [record['stage'] for record in json.load(f)]
+        self.assertListEqual(stages, ['losses'] + ['losses/loss_iteration_opt', 'losses/loss_iteration_pf'] * 2)
+
+    def test_aggregate(self):
+        paths = []
+        for scenario in range(2):
+            profiler = profiling.StageProfiler()
+            with profiling.activated(profiler):
+                self.run_stages()
+            folder = os.path.join(self.tmp_dir.name, str(scenario))
+            os.mkdir(folder)
+            paths.append(profiler.save(folder))
+        paths.append(os.path.join(self.tmp_dir.name, 'missing', 'profile.json'))
+        summary = profiling.aggregate_profiles(paths).set_index('stage')
+        self.assertListEqual(list(summary.index), ['L', 'L/noise', 'L/write'])
+        self.assertListEqual(list(summary['n_runs']), [2, 2, 2])
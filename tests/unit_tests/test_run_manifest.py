@@ -0,0 +1,45 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import tempfile
+import unittest
+
+from chronix2grid.generation import generation_utils as gu
+from chronix2grid.run_manifest import RunManifest, order_longest_first, run_scenario_task
+
+
+def fail_on_odd(scenario_id):
+    if scenario_id % 2:
+        raise ValueError('odd scenario')
+
+
+class TestRunManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.scen_names = gu.folder_name_pattern('Scenario', 4)
+        self.seeds = dict(loads=[1, 2, 3, 4], renewables=[5, 6, 7, 8], dispatch=[9, 10, 11, 12])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_records(self):
+        manifest = RunManifest(self.tmp_dir.name)
+        for scenario_id in range(2):
+            manifest.append(run_scenario_task(fail_on_odd, self.scen_names, self.seeds, scenario_id))
+        records = manifest.read()
+        self.assertEqual(len(records), 2)
+        self.assertTrue(records[0]['success'])
+        self.assertDictEqual(records[0]['seeds'], dict(loads=1, renewables=5, dispatch=9))
+        self.assertFalse(records[1]['success'])
+        self.assertIn('odd scenario', records[1]['error'])
+        self.assertListEqual(list(manifest.expected_durations()), ['Scenario_0'])
+
+    def test_order_longest_first(self):
+        expected_durations = {'Scenario_0': 1., 'Scenario_1': 3., 'Scenario_3': 2.}
+        ordered = order_longest_first(range(4), self.scen_names, expected_durations)
+        self.assertListEqual(ordered, [2, 1, 3, 0])
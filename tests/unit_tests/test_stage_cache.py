@@ -0,0 +1,80 @@
+# Copyright (c) 2019-2022, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from chronix2grid.stage_cache import StageCache
+
+
+class TestStageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, 'input')
+        os.makedirs(os.path.join(self.input_folder, 'case'))
+        os.makedirs(os.path.join(self.input_folder, 'patterns'))
+        self._write(os.path.join(self.input_folder, 'case', 'params_load.json'), '{"dt": 5}')
+        self.n_runs = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _write(path, content):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def _stage(self, scenario_folder_path):
+        # writes one file in the scenario folder and returns a frame
+        self.n_runs += 1
+        os.makedirs(scenario_folder_path, exist_ok=True)
+        self._write(os.path.join(scenario_folder_path, 'load_p.csv'), f'run {self.n_runs}')
+        return pd.DataFrame({'load': [1., 2.]})
+
+    def test_rerun(self):
+        first_folder = os.path.join(self.tmp_dir.name, 'first', 'Scenario_0')
+        second_folder = os.path.join(self.tmp_dir.name, 'second', 'Scenario_0')
+        cache = StageCache(os.path.join(self.tmp_dir.name, 'cache'))
+        key = cache.key('L', self.input_folder, 'case', seed=1, start_date=pd.Timestamp('2012-01-01'))
+        result = cache.cached('L', key, first_folder, lambda: self._stage(first_folder))
+
+        # same inputs: the output is reloaded and its files copied, the stage is not run again
+        cache = StageCache(os.path.join(self.tmp_dir.name, 'cache'))
+        self.assertEqual(cache.key('L', self.input_folder, 'case', seed=1, start_date=pd.Timestamp('2012-01-01')), key)
+        reloaded = cache.cached('L', key, second_folder, lambda: self._stage(second_folder))
+        self.assertEqual(self.n_runs, 1)
+        self.assertEqual(cache.hits, {'L': 1})
+        pd.testing.assert_frame_equal(reloaded, result)
+        with open(os.path.join(second_folder, 'load_p.csv'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'run 1')
+
+    def test_invalidation(self):
+        cache = StageCache(os.path.join(self.tmp_dir.name, 'cache'))
+        key = cache.key('L', self.input_folder, 'case', seed=1)
+        self.assertNotEqual(cache.key('L', self.input_folder, 'case', seed=2), key)
+        # the input files of the stage are part of the key, not the ones of the other stages
+        self._write(os.path.join(self.input_folder, 'case', 'params_opf.json'), '{"mode": 1}')
+        self.assertEqual(StageCache(cache.folder).key('L', self.input_folder, 'case', seed=1), key)
+        self._write(os.path.join(self.input_folder, 'case', 'params_load.json'), '{"dt": 60}')
+        self.assertNotEqual(StageCache(cache.folder).key('L', self.input_folder, 'case', seed=1), key)
+
+    def test_hydro_guide_curves(self):
+        # read by the dispatcher of the T stage from the patterns folder
+        hydro_path = os.path.join(self.input_folder, 'patterns', 'hydro_french.csv')
+        self._write(hydro_path, 'date,x,p_min_u,p_max_u\n2012-01-01 00:00,0,0.1,0.9\n')
+        key = StageCache(os.path.join(self.tmp_dir.name, 'cache')).key('T', self.input_folder, 'case', seed=1)
+        self._write(hydro_path, 'date,x,p_min_u,p_max_u\n2012-01-01 00:00,0,0.2,0.8\n')
+        self.assertNotEqual(StageCache(os.path.join(self.tmp_dir.name, 'cache')).key('T', self.input_folder, 'case',
+                                                                                     seed=1), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,12 +5,34 @@ import unittest
 import numpy as np
 import pandas as pd
 import pathlib
+from scipy.interpolate import interp1d
 
 from chronix2grid.main import create_directory_tree
 import chronix2grid.constants as cst
 import chronix2grid.generation.generation_utils as gu
 
 
+def reference_interpolate_noise(computation_noise, params, location, time_scale, add_dim):
+    """Per-site interpolation of the coarse noise, as it was done before the sites were batched"""
+    T = params['T']
+    dx_corr = params['dx_corr']
+    dy_corr = params['dy_corr']
+    Nt_comp = int(T // time_scale + 1) + add_dim
+    Nt_inter = T // params['dt'] + 1
+    x, y = location
+    output = np.zeros(Nt_comp)
+    dist_tot = 0
+    for x_neighbor in [int(x // dx_corr), int(x // dx_corr + 1)]:
+        for y_neighbor in [int(y // dy_corr), int(y // dy_corr + 1)]:
+            dist = 1 / (np.sqrt((x - dx_corr * x_neighbor) ** 2 + (y - dy_corr * y_neighbor) ** 2) + 1)
+            output += dist * computation_noise[x_neighbor, y_neighbor, :]
+            dist_tot += dist
+    output /= dist_tot
+    t_comp = np.linspace(0, int(T), int(Nt_comp), endpoint=True)
+    t_inter = np.linspace(0, int(T), int(Nt_inter), endpoint=True)
+    return interp1d(t_comp, output, kind='cubic')(t_inter)
+
+
 class TestUtils(unittest.TestCase):
     def setUp(self) -> None:
         self.output_directory = tempfile.mkdtemp()
@@ -39,3 +61,42 @@ class TestUtils(unittest.TestCase):
                 'start_date2', scenario_name
             )
             self.assertTrue(os.path.isdir(path_to_check))
+
+    def test_interpolate_noise_batch(self):
+        prng = np.random.default_rng(0)
+        params = {'Lx': 1000, 'Ly': 1000, 'T': 60 * 24, 'dx_corr': 250, 'dy_corr': 250,
+                  'dt': 5, 'temperature_corr': 400}
+        locations = np.array([[30, -29], [86, 120], [512, 999], [0, 0]])
+        add_dim = 5
+        noise = gu.generate_coarse_noise(prng, params, 'temperature', add_dim=add_dim)
+        batch = gu.interpolate_noise_batch(noise, params, locations,
+                                           time_scale=params['temperature_corr'], add_dim=add_dim)
+        self.assertEqual(batch.shape, (len(locations), params['T'] // params['dt'] + 1))
+        for location, signal in zip(locations, batch):
+            expected = reference_interpolate_noise(noise, params, location,
+                                                   time_scale=params['temperature_corr'], add_dim=add_dim)
+            np.testing.assert_allclose(signal, expected)
+            np.testing.assert_allclose(
+                gu.interpolate_noise(noise, params, location, time_scale=params['temperature_corr'], add_dim=add_dim),
+                expected)
+
+    def test_lazy_noise(self):
+        params = {'Lx': 1000, 'Ly': 1000, 'T': 60 * 24, 'dx_corr': 250, 'dy_corr': 250,
+                  'dt': 5, 'temperature_corr': 400, 'lazy_noise': 1}
+        locations = np.array([[30, -29], [86, 120], [512, 999]])
+        add_dim = 5
+        noise = gu.generate_coarse_noise(np.random.default_rng(0), params, 'temperature', add_dim=add_dim)
+        self.assertIsInstance(noise, gu.CoarseNoiseField)
+        batch = gu.interpolate_noise_batch(noise, params, locations,
+                                           time_scale=params['temperature_corr'], add_dim=add_dim)
+        self.assertEqual(batch.shape, (len(locations), params['T'] // params['dt'] + 1))
+        self.assertEqual(noise.n_cells, 10)  # 4 cells per site, 2 shared
+
+        # the noise of a cell does not depend on the cells drawn before
+        other_noise = gu.generate_coarse_noise(np.random.default_rng(0), params, 'temperature', add_dim=add_dim)
+        other_noise.cell(3, 3)
+        np.testing.assert_array_equal(
+            gu.interpolate_noise(other_noise, params, locations[2], time_scale=params['temperature_corr'],
+                                 add_dim=add_dim),
+            batch[2])
+        self.assertEqual(other_noise[[0, 1], [0, 0], :].shape, (2, noise.shape[2]))